@@ -0,0 +1,279 @@
+import collections
+import concurrent.futures
+import queue
+import threading
+import time
+
+import numpy as np
+
+from embedding_cache import normalize_description
+from genai_categorization import ai_categorization_batch
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+AI_CACHE_MAX_ENTRIES = 10000
+AI_CACHE_TTL_SECONDS = 24 * 3600  # Re-ask the model about a description after a day
+NEAR_DUPLICATE_SIMILARITY = 0.98  # Cosine similarity at which a cached answer is reused
+AI_MAX_BATCH = 32  # Descriptions per ai_categorization_batch call
+AI_MAX_WAIT_MS = 20.0  # How long a miss waits for others to share its batch call
+AI_POLL_MS = 1.0  # Granularity of that wait
+AI_ERROR_TAG = "Uncategorized"
+
+
+class AIResultCache:
+    """LRU + TTL cache of AI categorization results
+
+    Entries are keyed by normalized description. When an embedding is
+    stored with an entry, lookups can also match near-duplicates: any live
+    entry whose embedding has cosine similarity >= near_duplicate with the
+    query's.
+    """
+
+    def __init__(self, max_entries=AI_CACHE_MAX_ENTRIES, ttl_seconds=AI_CACHE_TTL_SECONDS,
+                 near_duplicate=NEAR_DUPLICATE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.near_duplicate = near_duplicate
+        self.entries = collections.OrderedDict()  # key -> (tag, stored_at, slot)
+        self.vectors = None  # (max_entries, d) normalized embeddings, one row per slot
+        self.slot_keys = [None] * max_entries
+        self.live = np.zeros(max_entries, dtype=bool)
+        self.free_slots = list(range(max_entries - 1, -1, -1))  # Handed out lowest first
+        self.used_slots = 0  # Slots below this have held a vector; lookups scan only these
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def _drop(self, key):
+        tag, stored_at, slot = self.entries.pop(key)
+        if slot is not None:
+            self.slot_keys[slot] = None
+            self.live[slot] = False
+            self.free_slots.append(slot)
+
+    def get(self, key, embedding=None):
+        """Return (tag, kind) with kind 'exact' or 'near', or (None, None) on a miss"""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self.entries.move_to_end(key)
+                    return entry[0], "exact"
+                self._drop(key)
+
+            if embedding is None or not self.live.any():
+                return None, None
+            # One matmul over the preallocated rows (a view, no copy); dead slots are masked after
+            similarities = self.vectors[:self.used_slots] @ _normalized(embedding)
+            similarities[~self.live[:self.used_slots]] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.near_duplicate:
+                return None, None
+            match = self.slot_keys[best]
+            tag, stored_at, _ = self.entries[match]
+            if self._expired(stored_at, now):
+                self._drop(match)
+                return None, None
+            self.entries.move_to_end(match)
+            return tag, "near"
+
+    def put(self, key, tag, embedding=None):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            while len(self.entries) >= self.max_entries:
+                self._drop(next(iter(self.entries)))
+            slot = None
+            if embedding is not None:
+                vector = _normalized(embedding)
+                if self.vectors is None:
+                    self.vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+                slot = self.free_slots.pop()
+                self.used_slots = max(self.used_slots, slot + 1)
+                self.vectors[slot] = vector
+                self.slot_keys[slot] = key
+                self.live[slot] = True
+            self.entries[key] = (tag, time.time(), slot)
+
+
+def _normalized(embedding):
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class AIFallback:
+    """Memoizing, batching front for the AI categorization fallback
+
+    Cached answers are served from an AIResultCache. Misses from every
+    caller (and thread) are queued and coalesced into calls of
+    `batch_fn(descriptions, verbose=False)`, with at most `max_batch`
+    descriptions per call and at most `max_wait_ms` spent waiting to fill
+    one; a lone caller whose misses are all queued is not kept waiting,
+    since nobody could join its batch. Plugs into process_new_incident/process_incidents_batch as
+    `ai_fallback`.
+    """
+
+    def __init__(self, batch_fn=ai_categorization_batch, max_batch=AI_MAX_BATCH,
+                 max_wait_ms=AI_MAX_WAIT_MS, cache=None):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.cache = cache if cache is not None else AIResultCache()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.ai_calls = 0
+        self.ai_descriptions = 0
+        self._queue = queue.Queue()
+        self._worker = None
+        self._stats_lock = threading.Lock()
+        self._callers = 0  # categorize_many calls in progress
+        self._enqueuing = 0  # ... of which are still queueing their misses
+
+    def __call__(self, description, verbose=False, embedding=None):
+        """Categorize one description (the ai_categorization signature)"""
+        embeddings = None if embedding is None else [embedding]
+        return self.categorize_many([description], embeddings)[0]
+
+    def categorize_many(self, descriptions, embeddings=None):
+        """Categorize descriptions, asking the model only about cache misses"""
+        tags = [None] * len(descriptions)
+        with self._stats_lock:
+            self._callers += 1
+        try:
+            pending = self._lookup(descriptions, embeddings, tags)
+            for key, (future, rows) in pending.items():
+                try:
+                    tag = future.result()
+                except Exception as e:
+                    print(f"⚠️ AI categorization failed: {e}")
+                    tag = AI_ERROR_TAG
+                for row in rows:
+                    tags[row] = tag
+            return tags
+        finally:
+            with self._stats_lock:
+                self._callers -= 1
+
+    def _lookup(self, descriptions, embeddings, tags):
+        """Fill tags from the cache and queue the misses; returns {key: (future, rows)}"""
+        pending = {}
+        with self._stats_lock:
+            self._enqueuing += 1
+        try:
+            for row, description in enumerate(descriptions):
+                key = normalize_description(description)
+                embedding = None if embeddings is None else embeddings[row]
+                tag, kind = self.cache.get(key, embedding)
+                with self._stats_lock:
+                    self.lookups += 1
+                    self.exact_hits += kind == "exact"
+                    self.near_hits += kind == "near"
+                if tag is not None:
+                    tags[row] = tag
+                elif key in pending:
+                    pending[key][1].append(row)
+                else:
+                    pending[key] = (self._submit(key, description, embedding), [row])
+            return pending
+        finally:
+            with self._stats_lock:
+                self._enqueuing -= 1
+
+    def _submit(self, key, description, embedding):
+        future = concurrent.futures.Future()
+        with self._stats_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="ai-fallback", daemon=True)
+                self._worker.start()
+        self._queue.put((key, description, embedding, future))
+        return future
+
+    def _alone(self):
+        """True when one caller is in progress and has queued all its misses (nobody can join the batch)"""
+        with self._stats_lock:
+            return self._callers <= 1 and not self._enqueuing
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self._alone():
+                break
+            try:
+                # Short waits, so a caller that finishes queueing alone is noticed promptly
+                batch.append(self._queue.get(timeout=min(remaining, AI_POLL_MS / 1000)))
+            except queue.Empty:
+                pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            # The same description may be queued by several callers at once
+            unique = {}
+            for key, description, embedding, future in batch:
+                unique.setdefault(key, (description, embedding, []))[2].append(future)
+            keys = list(unique)
+            try:
+                tags = self.batch_fn([unique[key][0] for key in keys], verbose=False)
+                if len(tags) != len(keys):
+                    raise RuntimeError(f"model returned {len(tags)} tags for {len(keys)} descriptions")
+            except Exception as e:
+                for _, _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            with self._stats_lock:
+                self.ai_calls += 1
+                self.ai_descriptions += len(keys)
+            for key, tag in zip(keys, tags):
+                description, embedding, futures = unique[key]
+                self.cache.put(key, tag, embedding)
+                for future in futures:
+                    future.set_result(tag)
+
+    def hit_rate(self):
+        return (self.exact_hits + self.near_hits) / self.lookups if self.lookups else 0.0
+
+    def stats(self):
+        """Cache and batching counters"""
+        return {
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "near_duplicate_hits": self.near_hits,
+            "hit_rate": self.hit_rate(),
+            "ai_calls": self.ai_calls,
+            "ai_descriptions": self.ai_descriptions,
+            "mean_ai_batch": self.ai_descriptions / self.ai_calls if self.ai_calls else 0.0,
+            "cached": len(self.cache),
+        }
+
+
+class StubAIModel:
+    """Local stand-in for the AI model: deterministic tags, optional latency, call counting"""
+
+    def __init__(self, tag="Uncategorized", latency_ms=0.0, per_item_ms=0.0):
+        self.tag = tag
+        self.latency = latency_ms / 1000
+        self.per_item = per_item_ms / 1000
+        self.calls = []
+
+    def __call__(self, descriptions, verbose=False):
+        self.calls.append(len(descriptions))
+        if self.latency or self.per_item:
+            time.sleep(self.latency + self.per_item * len(descriptions))
+        return [self.tag] * len(descriptions)
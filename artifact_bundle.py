@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from embedding_cache import embedding_model_id
+from faiss_indexing import save_faiss_index, load_faiss_index
+from incident_store import IncidentStore, DESCRIPTION_OFFSETS_FILE
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+BUNDLE_DIR = "artifacts"
+BUNDLE_VERSION = 2  # 2: incident store description buffers
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+EMBEDDINGS_FILE = "embeddings.npy"
+CATEGORY_CODES_FILE = "category_codes.npy"
+
+
+def expected_manifest(db_config, faiss_indexer=None):
+    """Manifest fields a bundle must match to be reused for this CSV, model and index spec"""
+    expected = {
+        "version": BUNDLE_VERSION,
+        "csv_sha256": db_config.csv_checksum(),
+        "model": embedding_model_id(db_config.embedding_function),
+        "category_col": db_config.category_col,
+    }
+    if faiss_indexer is not None:
+        expected["index_build"] = faiss_indexer.build_params()
+    return expected
+
+
+def manifest_matches(manifest, expected):
+    """True when every expected field agrees with the stored manifest"""
+    return all(manifest.get(key) == value for key, value in expected.items())
+
+
+def save_artifact_bundle(bundle_dir, faiss_indexer, embeddings, category_codes,
+                         category_labels, manifest, store=None):
+    """Write index, normalized embeddings, category codes, descriptions and manifest to bundle_dir
+
+    `store` is the IncidentStore whose description buffers are saved
+    alongside, so a warm start does not parse the CSV at all.
+    The bundle is written to a temporary directory first and then swapped in,
+    so a reader never sees a half-written bundle.
+    """
+    print(f"\n[BUNDLE] Saving warm-start artifact bundle to {bundle_dir}...")
+    tmp_dir = f"{bundle_dir}.tmp-{os.getpid()}"
+    try:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        save_faiss_index(faiss_indexer, os.path.join(tmp_dir, INDEX_FILE))
+        if not os.path.exists(os.path.join(tmp_dir, INDEX_FILE)):
+            raise RuntimeError("FAISS index was not written")
+        np.save(os.path.join(tmp_dir, EMBEDDINGS_FILE), embeddings)
+        np.save(os.path.join(tmp_dir, CATEGORY_CODES_FILE),
+                np.asarray(category_codes, dtype=np.int32))
+        if store is not None:
+            store.save(tmp_dir)
+
+        manifest = dict(manifest)
+        manifest.update({
+            "dimension": int(embeddings.shape[1]),
+            "n_vectors": int(embeddings.shape[0]),
+            "index_type": type(faiss_indexer.index).__name__,
+            "category_labels": list(category_labels),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        })
+        with open(os.path.join(tmp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        old_dir = f"{bundle_dir}.old-{os.getpid()}"
+        if os.path.exists(bundle_dir):
+            os.replace(bundle_dir, old_dir)
+        os.replace(tmp_dir, bundle_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+        print(f"✅ Bundle saved ({manifest['n_vectors']} vectors, dim {manifest['dimension']})")
+        return manifest
+    except Exception as e:
+        print(f"⚠️ Error saving artifact bundle: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+
+
+def read_manifest(bundle_dir):
+    """Return the bundle manifest dict, or None if there is no readable bundle"""
+    try:
+        with open(os.path.join(bundle_dir, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_artifact_bundle(bundle_dir, expected=None, mmap=True, csv_file=None):
+    """Memory-map a bundle if its manifest matches `expected`
+
+    Returns a dict with 'index', 'embeddings', 'category_codes', 'store'
+    (an IncidentStore over the saved descriptions, reading other columns
+    from csv_file; None if the bundle has no descriptions) and 'manifest',
+    or None when the bundle is missing or stale.
+    """
+    print(f"\n[BUNDLE] Looking for warm-start artifact bundle in {bundle_dir}...")
+    manifest = read_manifest(bundle_dir)
+    if manifest is None:
+        print("ℹ️ No artifact bundle found")
+        return None
+
+    if expected is not None and not manifest_matches(manifest, expected):
+        stale = [key for key, value in expected.items() if manifest.get(key) != value]
+        print(f"ℹ️ Artifact bundle is stale (mismatch: {', '.join(stale)})")
+        return None
+
+    mmap_mode = "r" if mmap else None
+    try:
+        index = load_faiss_index(os.path.join(bundle_dir, INDEX_FILE), mmap=mmap)
+        if index is None:
+            return None
+        embeddings = np.load(os.path.join(bundle_dir, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+        category_codes = np.load(os.path.join(bundle_dir, CATEGORY_CODES_FILE), mmap_mode=mmap_mode)
+        store = None
+        if os.path.exists(os.path.join(bundle_dir, DESCRIPTION_OFFSETS_FILE)):
+            store = IncidentStore.load(bundle_dir, category_codes, manifest["category_labels"], csv_file,
+                                       manifest.get("category_col"), mmap=mmap)
+    except Exception as e:
+        print(f"⚠️ Error loading artifact bundle: {e}")
+        return None
+
+    if index.ntotal != manifest["n_vectors"] or len(category_codes) != manifest["n_vectors"]:
+        print("⚠️ Artifact bundle is inconsistent with its manifest")
+        return None
+
+    print(f"✅ Artifact bundle loaded ({manifest['n_vectors']} vectors, dim {manifest['dimension']})")
+    return {
+        "index": index,
+        "embeddings": embeddings,
+        "category_codes": category_codes,
+        "store": store,
+        "manifest": manifest,
+    }
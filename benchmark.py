@@ -0,0 +1,300 @@
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+import faiss
+
+from ai_fallback import AIFallback, StubAIModel
+from faiss_indexing import INDEX_SPECS, STORAGE_PRECISION, STORAGE_PRECISIONS
+from python_learn import initialize_system, process_incidents_batch, process_new_incident
+from streaming_build import peak_rss_mb
+from synthetic_corpus import StubEmbeddingFunction, sample_queries, write_corpus
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+BENCH_SIZES = (1000, 10000, 100000)  # Corpus rows; up to 1_000_000 works, given the time
+BENCH_DIR = "bench_data"  # Generated corpora and per-case artifact bundles
+RESULTS_FILE = "benchmark_results.json"
+N_SINGLE_QUERIES = 200
+N_BATCH_QUERIES = 4096
+BENCH_BATCH_SIZE = 256
+WARMUP_QUERIES = 10
+REGRESSION_THRESHOLD = 0.10  # Relative change in the wrong direction that counts as a regression
+CORPUS_SEED = 0
+QUERY_SEED = 1
+
+# Reported metric -> True when higher is better
+METRICS = {
+    "cold_start_s": False,
+    "warm_start_s": False,
+    "single_p50_ms": False,
+    "single_p95_ms": False,
+    "single_p99_ms": False,
+    "single_qps": True,
+    "batch_p50_ms": False,
+    "batch_p99_ms": False,
+    "batch_qps": True,
+    "peak_rss_mb": False,
+}
+
+
+def corpus_path(bench_dir, n_rows, seed=CORPUS_SEED):
+    return os.path.join(bench_dir, f"corpus-{n_rows}-seed{seed}.csv")
+
+
+def ensure_corpus(bench_dir, n_rows, seed=CORPUS_SEED):
+    """Generate the synthetic corpus for n_rows once and reuse it across runs"""
+    path = corpus_path(bench_dir, n_rows, seed)
+    if not os.path.exists(path):
+        os.makedirs(bench_dir, exist_ok=True)
+        print(f"ℹ️ Generating {n_rows}-row corpus: {path}")
+        write_corpus(path + ".tmp", n_rows, seed)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def percentiles(latencies_ms, prefix):
+    latencies_ms = np.asarray(latencies_ms)
+    return {f"{prefix}_p{p}_ms": float(np.percentile(latencies_ms, p)) for p in (50, 95, 99)}
+
+
+def run_case(csv_file, n_rows, index_spec, bundle_dir, n_single=N_SINGLE_QUERIES, n_batch=N_BATCH_QUERIES,
+             batch_size=BENCH_BATCH_SIZE, embed_workers=1, storage_precision=STORAGE_PRECISION):
+    """Benchmark one (corpus, index type) pair; meant to run in a fresh process
+
+    Measures a cold initialize_system (embed + index build + bundle save),
+    per-query latency of process_new_incident, per-batch latency of
+    process_incidents_batch, peak RSS after those, and then a warm start
+    from the saved bundle. Setup output is discarded. storage_precision
+    does not apply to ivf_pq, which always runs with its PQ codes.
+    """
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+    options = dict(bundle_dir=bundle_dir, index_spec=index_spec, wal_file=None, chroma_mode="skip",
+                   csv_file=csv_file, cache_file=None, embedding_factory=StubEmbeddingFunction,
+                   embed_workers=embed_workers)
+    if index_spec != "ivf_pq":
+        options["storage_precision"] = storage_precision
+    queries = sample_queries(WARMUP_QUERIES + n_single + n_batch, seed=QUERY_SEED, corpus_seed=CORPUS_SEED)
+    warmup, single, batch = (queries[:WARMUP_QUERIES], queries[WARMUP_QUERIES:WARMUP_QUERIES + n_single],
+                             queries[WARMUP_QUERIES + n_single:])
+    ai_fallback = AIFallback(StubAIModel())
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        db_config, faiss_indexer = initialize_system(**options)
+        cold_start = time.perf_counter() - started
+
+        for description in warmup:
+            process_new_incident(description, db_config, faiss_indexer, verbosity=0, ai_fallback=ai_fallback)
+
+        single_ms = []
+        for description in single:
+            started = time.perf_counter()
+            process_new_incident(description, db_config, faiss_indexer, verbosity=0, ai_fallback=ai_fallback)
+            single_ms.append((time.perf_counter() - started) * 1000)
+
+        batch_ms = []
+        for start in range(0, len(batch), batch_size):
+            chunk = batch[start:start + batch_size]
+            started = time.perf_counter()
+            process_incidents_batch(chunk, db_config, faiss_indexer, batch_size=batch_size, verbosity=0,
+                                    ai_fallback=ai_fallback)
+            batch_ms.append((time.perf_counter() - started) * 1000)
+
+        peak_rss = peak_rss_mb()
+        index_description = faiss_indexer.describe()
+        n_vectors = int(faiss_indexer.index.ntotal)
+        del db_config, faiss_indexer
+
+        started = time.perf_counter()
+        initialize_system(**options)
+        warm_start = time.perf_counter() - started
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+
+    result = {
+        "rows": n_rows,
+        "index": index_spec,
+        "index_description": index_description,
+        "n_vectors": n_vectors,
+        "cold_start_s": cold_start,
+        "warm_start_s": warm_start,
+        "single_qps": len(single_ms) / (sum(single_ms) / 1000) if single_ms else 0.0,
+        "batch_qps": len(batch) / (sum(batch_ms) / 1000) if batch_ms else 0.0,
+        "batch_size": batch_size,
+        "peak_rss_mb": peak_rss,
+        "ai_fallback": ai_fallback.stats(),
+    }
+    if single_ms:
+        result.update(percentiles(single_ms, "single"))
+    if batch_ms:
+        result.update(percentiles(batch_ms, "batch"))
+    return result
+
+
+def run_isolated(*args, **kwargs):
+    """run_case in a fresh spawned process, so peak RSS is the case's own"""
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_case, args, kwargs)
+
+
+def environment():
+    """Where the numbers came from"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", None),
+        "embedding": StubEmbeddingFunction.MODEL_NAME,
+    }
+
+
+def run_benchmarks(sizes=BENCH_SIZES, specs=INDEX_SPECS, bench_dir=BENCH_DIR, n_single=N_SINGLE_QUERIES,
+                   n_batch=N_BATCH_QUERIES, batch_size=BENCH_BATCH_SIZE, embed_workers=1,
+                   storage_precision=STORAGE_PRECISION):
+    """Run every (size, index type) case; returns {"environment": ..., "parameters": ..., "results": [...]}"""
+    results = []
+    for n_rows in sizes:
+        csv_file = ensure_corpus(bench_dir, n_rows)
+        for spec in specs:
+            print(f"\n[BENCH] {spec} on {n_rows} incidents...")
+            bundle_dir = os.path.join(bench_dir, f"bundle-{spec}-{n_rows}")
+            try:
+                result = run_isolated(csv_file, n_rows, spec, bundle_dir, n_single=n_single, n_batch=n_batch,
+                                      batch_size=batch_size, embed_workers=embed_workers,
+                                      storage_precision=storage_precision)
+            except Exception as e:
+                print(f"❌ {spec} on {n_rows} incidents failed: {e}")
+                results.append({"rows": n_rows, "index": spec, "error": str(e)})
+                continue
+            print(f"✅ cold {result['cold_start_s']:.2f}s, warm {result['warm_start_s']:.2f}s, "
+                  f"single p50 {result.get('single_p50_ms', 0):.2f} ms, "
+                  f"batch {result['batch_qps']:.0f} q/s, peak RSS {result['peak_rss_mb']:.0f} MB")
+            results.append(result)
+    return {
+        "environment": environment(),
+        "parameters": {"sizes": list(sizes), "indexes": list(specs), "n_single": n_single, "n_batch": n_batch,
+                       "batch_size": batch_size, "embed_workers": embed_workers,
+                       "storage_precision": storage_precision},
+        "results": results,
+    }
+
+
+def print_benchmark_report(report):
+    print("\n" + "="*100)
+    print("📈 BENCHMARK RESULTS")
+    print("="*100)
+    print(f"{'Rows':>8} {'Index':<9} {'Cold s':>8} {'Warm s':>8} {'1q p50':>8} {'1q p99':>8} "
+          f"{'B p50':>9} {'Batch q/s':>10} {'RSS MB':>8}")
+    for result in report["results"]:
+        if "error" in result:
+            print(f"{result['rows']:>8} {result['index']:<9} error: {result['error']}")
+            continue
+        print(f"{result['rows']:>8} {result['index']:<9} {result['cold_start_s']:>8.2f} "
+              f"{result['warm_start_s']:>8.2f} {result['single_p50_ms']:>8.2f} {result['single_p99_ms']:>8.2f} "
+              f"{result['batch_p50_ms']:>9.2f} {result['batch_qps']:>10.0f} {result['peak_rss_mb']:>8.0f}")
+    print("="*100)
+
+
+def compare_reports(baseline, candidate, threshold=REGRESSION_THRESHOLD):
+    """Per-case metric changes from baseline to candidate
+
+    Returns a list of dicts (rows, index, metric, baseline, candidate,
+    change, regression), change being relative (+0.1 = 10% higher);
+    regression is True when the metric got worse by more than threshold.
+    """
+    def by_case(report):
+        return {(r["rows"], r["index"]): r for r in report["results"] if "error" not in r}
+
+    old, new = by_case(baseline), by_case(candidate)
+    changes = []
+    for case in sorted(old.keys() & new.keys()):
+        for metric, higher_is_better in METRICS.items():
+            if metric not in old[case] or metric not in new[case]:
+                continue
+            before, after = old[case][metric], new[case][metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if higher_is_better else change
+            changes.append({"rows": case[0], "index": case[1], "metric": metric, "baseline": before,
+                            "candidate": after, "change": change, "regression": worse > threshold})
+    return changes
+
+
+def print_comparison(changes, threshold=REGRESSION_THRESHOLD):
+    print("\n" + "="*84)
+    print(f"📈 BENCHMARK COMPARISON (regression = more than {threshold:.0%} worse)")
+    print("="*84)
+    print(f"{'Rows':>8} {'Index':<9} {'Metric':<15} {'Baseline':>12} {'Candidate':>12} {'Change':>9}")
+    for change in changes:
+        flag = "  ❌ REGRESSION" if change["regression"] else ""
+        print(f"{change['rows']:>8} {change['index']:<9} {change['metric']:<15} {change['baseline']:>12.3f} "
+              f"{change['candidate']:>12.3f} {change['change']:>+9.1%}{flag}")
+    regressions = sum(change["regression"] for change in changes)
+    print("="*84)
+    print(f"{'❌' if regressions else '✅'} {regressions} regression(s) in {len(changes)} comparisons")
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Offline benchmarks of the incident categorization pipeline")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run the benchmark matrix and write the results as JSON")
+    run.add_argument('--sizes', default=",".join(str(size) for size in BENCH_SIZES),
+                     help="Comma-separated corpus sizes (rows)")
+    run.add_argument('--indexes', default=",".join(INDEX_SPECS), help="Comma-separated index types")
+    run.add_argument('--output', default=RESULTS_FILE)
+    run.add_argument('--bench-dir', default=BENCH_DIR)
+    run.add_argument('--single-queries', type=int, default=N_SINGLE_QUERIES)
+    run.add_argument('--batch-queries', type=int, default=N_BATCH_QUERIES)
+    run.add_argument('--batch-size', type=int, default=BENCH_BATCH_SIZE)
+    run.add_argument('--embed-workers', type=int, default=1)
+    run.add_argument('--precision', choices=STORAGE_PRECISIONS, default=STORAGE_PRECISION,
+                     help="Index storage precision (not applied to ivf_pq)")
+
+    compare = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                         help="Relative change that counts as a regression (0.1 = 10%%)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "run":
+        report = run_benchmarks(sizes=[int(size) for size in args.sizes.split(",")],
+                                specs=[spec.strip() for spec in args.indexes.split(",")],
+                                bench_dir=args.bench_dir, n_single=args.single_queries,
+                                n_batch=args.batch_queries, batch_size=args.batch_size,
+                                embed_workers=args.embed_workers, storage_precision=args.precision)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print_benchmark_report(report)
+        print(f"✅ Results written to {args.output}")
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.candidate) as f:
+            candidate = json.load(f)
+        changes = compare_reports(baseline, candidate, args.threshold)
+        print_comparison(changes, args.threshold)
+        sys.exit(1 if any(change["regression"] for change in changes) else 0)
@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+import weakref
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+EMBED_WORKERS = 1  # Worker processes for bulk embedding (1 = embed in this process, 0 = one per core)
+ONNX_THREADS = 0  # ONNX Runtime intra-op threads per process (0 = cores / workers)
+EMBED_BATCH_ROWS = 256  # Rows per worker task; fixed so results do not depend on the worker count
+MIN_PARALLEL_ROWS = 2000  # Smaller inputs are embedded in this process
+
+
+def default_embedding_function():
+    """Build the ChromaDB default embedding function (runs inside each worker)"""
+    from chromadb.utils import embedding_functions
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def limit_onnx_threads(n_threads):
+    """Make ONNX Runtime sessions created from now on use n_threads intra-op threads
+
+    The ChromaDB embedding function builds its own InferenceSession, so the
+    session class is wrapped to set the thread counts on its options.
+    """
+    if not n_threads:
+        return
+    os.environ["OMP_NUM_THREADS"] = str(n_threads)
+    try:
+        import onnxruntime
+    except ImportError:
+        return
+    base = getattr(onnxruntime.InferenceSession, "_unthreaded", onnxruntime.InferenceSession)
+
+    class ThreadLimitedSession(base):
+        _unthreaded = base
+
+        def __init__(self, path_or_bytes, sess_options=None, *args, **kwargs):
+            sess_options = sess_options or onnxruntime.SessionOptions()
+            sess_options.intra_op_num_threads = n_threads
+            sess_options.inter_op_num_threads = 1
+            super().__init__(path_or_bytes, sess_options, *args, **kwargs)
+
+    onnxruntime.InferenceSession = ThreadLimitedSession
+
+
+# Worker process state, set by _init_worker
+_worker_embedding_function = None
+
+
+def _init_worker(factory, onnx_threads):
+    global _worker_embedding_function
+    limit_onnx_threads(onnx_threads)
+    _worker_embedding_function = factory()
+
+
+def _embed_rows(shm_name, n_rows, dimension, start, texts):
+    """Embed texts into rows start.. of the shared (n_rows, dimension) matrix"""
+    vectors = np.asarray(_worker_embedding_function(texts), dtype=np.float32)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        matrix = np.ndarray((n_rows, dimension), dtype=np.float32, buffer=shm.buf)
+        matrix[start:start + len(texts)] = vectors
+        del matrix
+    finally:
+        shm.close()
+    return start, len(texts)
+
+
+class BulkEmbedder:
+    """Embeds large lists of texts with a pool of worker processes
+
+    Each worker loads its own copy of the model (from `factory`, with
+    worker_threads() ONNX intra-op threads) and writes float32 rows
+    straight into a shared-memory output matrix at their input positions,
+    so only the texts travel to the workers and row order never depends
+    on scheduling. The returned array is that matrix itself: its segment
+    is unlinked as soon as the workers are done and unmapped when the
+    array (and every view of it) is garbage collected, so the result is
+    never copied.
+    Inputs smaller than `min_parallel_rows`, or any input when workers is
+    1, go to `embedding_function` in this process. Callable like an
+    embedding function; returns a (len(texts), dim) float32 array.
+    """
+
+    def __init__(self, embedding_function, workers=EMBED_WORKERS, onnx_threads=ONNX_THREADS,
+                 factory=default_embedding_function, batch_rows=EMBED_BATCH_ROWS,
+                 min_parallel_rows=MIN_PARALLEL_ROWS):
+        self.embedding_function = embedding_function
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.onnx_threads = onnx_threads
+        self.factory = factory
+        self.batch_rows = batch_rows
+        self.min_parallel_rows = min_parallel_rows
+        self.dimension = None
+        self._pool = None
+
+    def worker_threads(self):
+        """ONNX intra-op threads per worker: configured, or the cores split evenly"""
+        return self.onnx_threads or max(1, (os.cpu_count() or 1) // self.workers)
+
+    def describe(self):
+        if self.workers <= 1:
+            return f"in-process, {self.onnx_threads or 'default'} ONNX thread(s)"
+        return f"{self.workers} worker processes, {self.worker_threads()} ONNX thread(s) each"
+
+    def __call__(self, texts):
+        texts = list(texts)
+        if self.workers <= 1 or len(texts) < max(self.min_parallel_rows, 2):
+            return np.asarray(self.embedding_function(texts), dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = len(self.embedding_function(texts[:1])[0])
+        return self._embed_parallel(texts)
+
+    def _start_pool(self):
+        if self._pool is None:
+            # spawn: a fresh interpreter per worker, never a fork of a process with ONNX threads running
+            context = multiprocessing.get_context("spawn")
+            self._pool = context.Pool(self.workers, initializer=_init_worker,
+                                      initargs=(self.factory, self.worker_threads()))
+        return self._pool
+
+    def _embed_parallel(self, texts):
+        n_rows, dimension = len(texts), self.dimension
+        pool = self._start_pool()
+        shm = shared_memory.SharedMemory(create=True, size=n_rows * dimension * 4)
+        try:
+            tasks = [(shm.name, n_rows, dimension, start, texts[start:start + self.batch_rows])
+                     for start in range(0, n_rows, self.batch_rows)]
+            pool.starmap(_embed_rows, tasks, chunksize=1)
+        except BaseException:
+            shm.close()
+            raise
+        finally:
+            # Only the name goes; the pages stay mapped in this process until closed
+            shm.unlink()
+        embeddings = np.ndarray((n_rows, dimension), dtype=np.float32, buffer=shm.buf)
+        # Unmap the segment once the caller has dropped the array and all views of it
+        weakref.finalize(embeddings, shm.close)
+        return embeddings
+
+    def close(self):
+        """Stop the worker processes (they are restarted on the next large call)"""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -0,0 +1,187 @@
+import argparse
+import json
+import time
+
+import numpy as np
+import faiss
+
+from voting import VOTING_STRATEGIES, vote
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+CALIBRATION_THRESHOLDS = (0.80, 0.85, 0.88, 0.90, 0.92, 0.94, 0.95, 0.96, 0.97, 0.98, 0.99)
+CALIBRATION_TOP_KS = (1, 3, 5, 10, 15, 20)
+TARGET_ACCURACY = 0.95  # Accuracy of the vector-search decisions the operating point must reach
+AI_LATENCY_MS = 1000.0  # Assumed cost of one ai_categorization call
+CALIBRATION_BATCH_ROWS = 4096  # Corpus rows searched per block
+LATENCY_SAMPLE = 200  # Single-query searches timed per k
+RESULTS_FILE = "calibration.json"
+
+
+def leave_one_out_neighbors(faiss_indexer, embeddings, k, rows=None, batch_rows=CALIBRATION_BATCH_ROWS):
+    """Top-k neighbors of corpus rows among the other rows, as (scores, indices, rows)
+
+    Every row is searched for k + 1 neighbors in blocks of batch_rows and
+    its own id is dropped (or the last neighbor, when an approximate index
+    did not return it), so each incident is judged by the rest of the
+    corpus only. Tombstoned rows are neither queries nor neighbors.
+    """
+    if rows is None:
+        rows = np.arange(len(embeddings))
+    if faiss_indexer.tombstones:
+        rows = np.setdiff1d(rows, np.fromiter(faiss_indexer.tombstones, dtype=np.int64))
+    scores = np.empty((len(rows), k), dtype=np.float32)
+    indices = np.empty((len(rows), k), dtype=np.int64)
+    for start in range(0, len(rows), batch_rows):
+        block = rows[start:start + batch_rows]
+        queries = np.array(embeddings[block], dtype=np.float32)
+        faiss.normalize_L2(queries)
+        block_scores, block_indices = faiss_indexer.search_normalized(queries, k + 1)
+        is_self = block_indices == block[:, None]
+        missing = ~is_self.any(axis=1)
+        is_self[missing, -1] = True
+        # A row can be returned once at most, so exactly one column per row is dropped
+        is_self &= np.cumsum(is_self, axis=1) == 1
+        keep = ~is_self
+        scores[start:start + len(block)] = block_scores[keep].reshape(len(block), k)
+        indices[start:start + len(block)] = block_indices[keep].reshape(len(block), k)
+    return scores, indices, rows
+
+
+def search_latency_ms(faiss_indexer, embeddings, top_ks, n_queries=LATENCY_SAMPLE, seed=0):
+    """Median single-query search time for each k, on a sample of corpus rows"""
+    rows = np.random.default_rng(seed).choice(len(embeddings), size=min(n_queries, len(embeddings)),
+                                              replace=False)
+    queries = np.array(embeddings[np.sort(rows)], dtype=np.float32)
+    faiss.normalize_L2(queries)
+    latencies = {}
+    for k in top_ks:
+        times = []
+        for query in queries:
+            started = time.perf_counter()
+            faiss_indexer.search_normalized(query[None, :], k)
+            times.append((time.perf_counter() - started) * 1000)
+        latencies[k] = float(np.median(times))
+    return latencies
+
+
+def calibrate(faiss_indexer, embeddings, category_codes, n_categories, thresholds=CALIBRATION_THRESHOLDS,
+              top_ks=CALIBRATION_TOP_KS, strategies=("frequency", "weighted"), ai_latency_ms=AI_LATENCY_MS,
+              n_queries=None, seed=0, batch_rows=CALIBRATION_BATCH_ROWS):
+    """Accuracy, AI fallback rate and expected latency of every (strategy, top_k, threshold)
+
+    One leave-one-out search for the largest k serves every setting: each
+    smaller k is a prefix of the same neighbor lists, each strategy votes
+    the whole block at once, and all thresholds are applied to the vote's
+    decision similarities together. A setting's accuracy is the share of
+    vector-search decisions (decision similarity >= threshold) that match
+    the incident's own category; the rest would fall back to AI.
+    Expected latency is the single-query search time for k plus the
+    fallback rate times ai_latency_ms. Returns one dict per setting.
+    """
+    category_codes = np.asarray(category_codes)
+    thresholds = np.asarray(sorted(thresholds), dtype=np.float64)
+    top_ks = sorted(top_ks)
+    rows = None
+    if n_queries is not None and n_queries < len(embeddings):
+        rows = np.sort(np.random.default_rng(seed).choice(len(embeddings), size=n_queries, replace=False))
+
+    started = time.perf_counter()
+    scores, indices, rows = leave_one_out_neighbors(faiss_indexer, embeddings, top_ks[-1], rows, batch_rows)
+    search_seconds = time.perf_counter() - started
+    truth = category_codes[rows]
+    neighbor_codes = np.where(indices >= 0, category_codes[np.clip(indices, 0, None)], -1)
+    latencies = search_latency_ms(faiss_indexer, embeddings, top_ks, seed=seed)
+
+    settings = []
+    for k in top_ks:
+        _, votes = vote(scores[:, :k], neighbor_codes[:, :k], n_categories, strategies=strategies)
+        for name, result in votes.items():
+            correct = result['winner'] == truth
+            accepted = result['decision_similarity'][:, None] >= thresholds[None, :] * 100
+            n_accepted = accepted.sum(axis=0)
+            n_correct = (accepted & correct[:, None]).sum(axis=0)
+            for threshold, accepted_count, correct_count in zip(thresholds, n_accepted, n_correct):
+                fallback_rate = 1 - accepted_count / max(1, len(rows))
+                settings.append({
+                    "strategy": name,
+                    "top_k": k,
+                    "threshold": float(threshold),
+                    "accuracy": float(correct_count / accepted_count) if accepted_count else None,
+                    "fallback_rate": float(fallback_rate),
+                    "ai_calls_per_1000": float(fallback_rate * 1000),
+                    "search_ms": latencies[k],
+                    "expected_ms": float(latencies[k] + fallback_rate * ai_latency_ms),
+                })
+    print(f"✅ Calibrated {len(settings)} settings on {len(rows)} incidents "
+          f"(one leave-one-out search, {search_seconds:.1f}s)")
+    return settings
+
+
+def operating_point(settings, target_accuracy=TARGET_ACCURACY):
+    """Setting with the fewest AI calls whose accuracy reaches target_accuracy (None if none does)"""
+    eligible = [s for s in settings if s["accuracy"] is not None and s["accuracy"] >= target_accuracy]
+    if not eligible:
+        return None
+    return min(eligible, key=lambda s: (s["fallback_rate"], s["expected_ms"], -s["accuracy"]))
+
+
+def print_calibration(settings, best=None, target_accuracy=TARGET_ACCURACY):
+    """Print the settings as a table, marking the operating point"""
+    print("\n" + "="*78)
+    print("📊 THRESHOLD / TOP_K CALIBRATION (leave-one-out over the corpus)")
+    print("="*78)
+    print(f"{'Strategy':<10} {'k':>3} {'Threshold':>9} {'Accuracy':>9} {'AI rate':>8} "
+          f"{'AI/1000':>8} {'Search ms':>9} {'Expected ms':>11}")
+    for s in settings:
+        accuracy = f"{s['accuracy'] * 100:8.2f}%" if s["accuracy"] is not None else f"{'-':>9}"
+        mark = "  ◀" if s is best else ""
+        print(f"{s['strategy']:<10} {s['top_k']:>3} {s['threshold'] * 100:>8.0f}% {accuracy} "
+              f"{s['fallback_rate'] * 100:>7.2f}% {s['ai_calls_per_1000']:>8.1f} {s['search_ms']:>9.3f} "
+              f"{s['expected_ms']:>11.2f}{mark}")
+    print("="*78)
+    if best is None:
+        print(f"⚠️ No setting reaches {target_accuracy:.0%} accuracy")
+    else:
+        print(f"✅ Operating point for {target_accuracy:.0%} accuracy: {best['strategy']} voting, "
+              f"top_k={best['top_k']}, threshold={best['threshold']:.2f} "
+              f"({best['fallback_rate']:.2%} AI fallback, {best['accuracy']:.2%} accurate)")
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    from faiss_indexing import INDEX_SPEC, INDEX_SPECS
+    parser = argparse.ArgumentParser(description="Calibrate the similarity threshold and top_k on the corpus")
+    parser.add_argument('--index', choices=INDEX_SPECS, default=INDEX_SPEC, help="FAISS index type")
+    parser.add_argument('--thresholds', default=",".join(str(t) for t in CALIBRATION_THRESHOLDS),
+                        help="Comma-separated similarity thresholds (0-1)")
+    parser.add_argument('--top-k', default=",".join(str(k) for k in CALIBRATION_TOP_KS),
+                        help="Comma-separated neighbor counts")
+    parser.add_argument('--voting', default="frequency,weighted",
+                        help=f"Comma-separated strategies ({', '.join(sorted(VOTING_STRATEGIES))})")
+    parser.add_argument('--target-accuracy', type=float, default=TARGET_ACCURACY)
+    parser.add_argument('--ai-latency-ms', type=float, default=AI_LATENCY_MS,
+                        help="Assumed latency of one AI categorization call")
+    parser.add_argument('--queries', type=int, help="Calibrate on a random sample of this many incidents")
+    parser.add_argument('--output', default=RESULTS_FILE, help="Where to write all settings as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    from python_learn import corpus_embeddings, initialize_system
+    args = parse_args()
+    db_config, faiss_indexer = initialize_system(index_spec=args.index, chroma_mode="skip")
+    category_codes, category_labels = db_config.get_category_codes()
+    settings = calibrate(faiss_indexer, corpus_embeddings(db_config, faiss_indexer), category_codes,
+                         len(category_labels), thresholds=[float(t) for t in args.thresholds.split(",")],
+                         top_ks=[int(k) for k in args.top_k.split(",")],
+                         strategies=[name.strip() for name in args.voting.split(",")],
+                         ai_latency_ms=args.ai_latency_ms, n_queries=args.queries)
+    best = operating_point(settings, args.target_accuracy)
+    print_calibration(settings, best, args.target_accuracy)
+    with open(args.output, "w") as f:
+        json.dump({"target_accuracy": args.target_accuracy, "operating_point": best, "settings": settings}, f,
+                  indent=2)
+    print(f"✅ Results written to {args.output}")
@@ -0,0 +1,109 @@
+import json
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+# Per-stage timing keys, in pipeline order
+TIMING_STAGES = ("embed_ms", "search_ms", "vote_ms", "ai_fallback_ms", "total_ms")
+
+
+@dataclass
+class CategorizationResult:
+    """Outcome of categorizing one incident
+
+    `details` holds the voting-strategy-specific fields (e.g. confidence,
+    category_stats for weighted voting; frequency_count, category_frequency
+    for frequency voting). Item access (result['assigned_tag']) reads both
+    the attributes and `details`, matching the dicts returned previously.
+    """
+    description: str
+    assigned_tag: str
+    method: str
+    voting: str
+    best_category: str
+    decision_similarity: float
+    similar_incidents: list = field(default_factory=list)
+    details: dict = field(default_factory=dict)
+    timings: dict = field(default_factory=dict)
+
+    def __getitem__(self, key):
+        if key in self.details:
+            return self.details[key]
+        if key in self.__dataclass_fields__:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        """Flat, JSON-friendly dict (strategy details inlined)"""
+        result = {
+            'description': self.description,
+            'assigned_tag': self.assigned_tag,
+            'method': self.method,
+            'voting': self.voting,
+            'best_category': self.best_category,
+            'decision_similarity': self.decision_similarity,
+        }
+        result.update(self.details)
+        result['similar_incidents'] = self.similar_incidents
+        result['timings'] = self.timings
+        return result
+
+
+def result_record(result, include_neighbors=False):
+    """JSON-ready dict for a result, optionally without the bulky neighbor lists"""
+    record = result.to_dict() if hasattr(result, "to_dict") else dict(result)
+    if not include_neighbors:
+        record.pop('similar_incidents', None)
+        record.pop('category_stats', None)
+    return record
+
+
+def to_json(record):
+    """Serialize a record, converting numpy scalars and arrays"""
+    return json.dumps(record, default=_json_default, ensure_ascii=False)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class JsonLinesSink:
+    """Writes one JSON object per categorized incident (to a file path or stream)"""
+
+    def __init__(self, target=None, include_neighbors=False):
+        self.include_neighbors = include_neighbors
+        if target is None or target == "-":
+            self.stream, self._owns_stream = sys.stdout, False
+        elif isinstance(target, str):
+            self.stream, self._owns_stream = open(target, "a", encoding="utf-8"), True
+        else:
+            self.stream, self._owns_stream = target, False
+
+    def write(self, result):
+        record = result_record(result, self.include_neighbors)
+        record['timestamp'] = time.time()
+        self.stream.write(to_json(record) + "\n")
+        self.stream.flush()
+
+    def close(self):
+        if self._owns_stream:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
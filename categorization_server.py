@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from ai_fallback import AIFallback, StubAIModel
+from categorization_result import result_record, to_json
+from db_config import CHROMA_MODES
+from faiss_indexing import INDEX_SPEC, INDEX_SPECS, STORAGE_PRECISION, STORAGE_PRECISIONS
+from genai_categorization import ai_categorization_batch
+from python_learn import DEFAULT_VOTING, initialize_system, process_incidents_batch
+from voting import VOTING_STRATEGIES
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+HOST = "127.0.0.1"
+PORT = 8765
+MAX_BATCH = 64  # Requests coalesced into one embedding call and one FAISS search
+MAX_WAIT_MS = 5.0  # How long the first request of a batch waits for company
+QUEUE_SIZE = 1024  # Pending requests before new ones are refused with 503
+MAX_BODY_BYTES = 1 << 20
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class MicroBatcher:
+    """Coalesces concurrent categorization requests into batched calls
+
+    Requests wait in a bounded queue; one worker takes up to `max_batch`
+    of them (waiting at most `max_wait_ms` after the first) and runs
+    process_incidents_batch on a single background thread, so the event
+    loop keeps accepting connections while a batch is searched.
+    """
+
+    def __init__(self, db_config, faiss_indexer, voting=DEFAULT_VOTING, max_batch=MAX_BATCH,
+                 max_wait_ms=MAX_WAIT_MS, queue_size=QUEUE_SIZE, ai_fallback=None):
+        self.db_config = db_config
+        self.faiss_indexer = faiss_indexer
+        self.voting = voting
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        # Offline by default: a cached, batched stub model in place of ai_categorization
+        self.ai_fallback = ai_fallback if ai_fallback is not None else AIFallback(StubAIModel())
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.requests = 0
+        self.rejected = 0
+        self._worker = None
+
+    def start(self):
+        self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self.executor.shutdown(wait=True)
+
+    def submit(self, description):
+        """Queue a description; returns a future, or None when the queue is full"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((description, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return None
+        return future
+
+    async def _next_batch(self):
+        batch = [await self.queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            descriptions = [description for description, _, _ in batch]
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, lambda: process_incidents_batch(
+                        descriptions, self.db_config, self.faiss_indexer, voting=self.voting,
+                        batch_size=len(descriptions), verbosity=0, ai_fallback=self.ai_fallback))
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future, queued), result in zip(batch, results):
+                if result is not None:
+                    result.timings['queue_ms'] = (started - queued) * 1000
+                if not future.done():
+                    future.set_result(result)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "n_vectors": int(self.faiss_indexer.index.ntotal),
+            "index": self.faiss_indexer.describe(),
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+            "requests": self.requests,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "rejected": self.rejected,
+            "ai_fallback": self.ai_fallback.stats() if hasattr(self.ai_fallback, "stats") else None,
+        }
+
+
+# ============================================
+# HTTP
+# ============================================
+async def read_request(reader):
+    """Parse one HTTP/1.1 request: (method, target, headers, body), or None at EOF"""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, _ = request_line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_BYTES:
+        raise ValueError(413)
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+
+def write_response(writer, status, payload, keep_alive=True, extra_headers=()):
+    body = to_json(payload).encode("utf-8")
+    head = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    head.extend(extra_headers)
+    writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+
+async def handle_categorize(batcher, target, body):
+    """POST /categorize {"description": "..."}; ?neighbors=1 includes similar incidents"""
+    try:
+        description = json.loads(body or b"{}")["description"]
+    except (ValueError, KeyError, TypeError):
+        return 400, {"error": "expected a JSON body with a 'description' field"}, ()
+    if not isinstance(description, str) or not description.strip():
+        return 400, {"error": "'description' must be a non-empty string"}, ()
+
+    future = batcher.submit(description)
+    if future is None:
+        return 503, {"error": "queue full, retry later"}, ("Retry-After: 1",)
+    result = await future
+    if result is None:
+        return 500, {"error": "search failed"}, ()
+    include_neighbors = parse_qs(urlsplit(target).query).get("neighbors", ["0"])[0] not in ("0", "")
+    return 200, result_record(result, include_neighbors), ()
+
+
+async def handle_connection(batcher, reader, writer):
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except ValueError as e:
+                status = e.args[0] if e.args and e.args[0] == 413 else 400
+                write_response(writer, status, {"error": STATUS_TEXT[status]}, keep_alive=False)
+                break
+            except (asyncio.IncompleteReadError, ConnectionError):
+                break
+            if request is None:
+                break
+            method, target, headers, body = request
+            keep_alive = headers.get("connection", "").lower() != "close"
+            path = urlsplit(target).path
+
+            extra_headers = ()
+            if path == "/health":
+                status, payload = (200, batcher.health()) if method == "GET" else (405, {"error": "use GET"})
+            elif path == "/categorize":
+                if method == "POST":
+                    try:
+                        status, payload, extra_headers = await handle_categorize(batcher, target, body)
+                    except Exception as e:
+                        status, payload = 500, {"error": str(e)}
+                else:
+                    status, payload = 405, {"error": "use POST"}
+            else:
+                status, payload = 404, {"error": f"no route for {path}"}
+
+            write_response(writer, status, payload, keep_alive, extra_headers)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve(db_config, faiss_indexer, host=HOST, port=PORT, **batcher_options):
+    """Run the HTTP service until cancelled"""
+    batcher = MicroBatcher(db_config, faiss_indexer, **batcher_options)
+    batcher.start()
+    server = await asyncio.start_server(lambda r, w: handle_connection(batcher, r, w), host, port)
+    print(f"\n✅ Categorization service listening on http://{host}:{port} "
+          f"(POST /categorize, GET /health; batches of up to {batcher.max_batch}, "
+          f"{batcher.max_wait * 1000:g} ms wait, queue {batcher.queue.maxsize})")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await batcher.stop()
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Incident categorization HTTP service")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--voting', choices=sorted(VOTING_STRATEGIES), default=DEFAULT_VOTING)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_MS)
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--index', choices=INDEX_SPECS, default=INDEX_SPEC, help="FAISS index type")
+    parser.add_argument('--precision', choices=STORAGE_PRECISIONS, default=STORAGE_PRECISION,
+                        help="How flat / ivf_flat / hnsw indexes store vectors (float16 / int8 use less memory)")
+    parser.add_argument('--chroma', choices=CHROMA_MODES, default="skip",
+                        help="ChromaDB collection (not used by the service)")
+    parser.add_argument('--stream', action='store_true', help="Stream the CSV when building the index")
+    parser.add_argument('--live-ai', action='store_true',
+                        help="Use genai_categorization.ai_categorization_batch instead of the offline stub")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    db_config, faiss_indexer = initialize_system(index_spec=args.index, chroma_mode=args.chroma,
+                                                 stream=args.stream, storage_precision=args.precision)
+    try:
+        asyncio.run(serve(db_config, faiss_indexer, host=args.host, port=args.port, voting=args.voting,
+                          max_batch=args.max_batch, max_wait_ms=args.max_wait_ms,
+                          queue_size=args.queue_size,
+                          ai_fallback=AIFallback(ai_categorization_batch) if args.live_ai else None))
+    except KeyboardInterrupt:
+        print("\n👋 Service stopped")
@@ -0,0 +1,152 @@
+import numpy as np
+import faiss
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+SUB_CENTROIDS = 4  # k-means centroids per category (1 = the category mean)
+ACCEPT_SIMILARITY = 0.97  # Decide without a neighbor search when the best centroid is this close...
+ACCEPT_MARGIN = 0.05  # ...and beats every other category's centroids by this much
+CANDIDATE_MARGIN = 0.10  # Categories within this of the best are searched in the second stage
+AUDIT_RATE = 0.0  # Share of prefiltered queries also run through the full search, for the stats
+KMEANS_ITERATIONS = 10
+KMEANS_MAX_POINTS = 256  # Training vectors per centroid
+
+
+class CategoryPrefilter:
+    """Per-category centroids of the corpus, used to decide or narrow a search up front
+
+    Stage one scores a query against every centroid (a small matrix
+    product). If the best category's centroid similarity is at least
+    accept_similarity and leads every other category by accept_margin, the
+    query is decided right there. Otherwise only the categories within
+    candidate_margin of the best are searched, through an ID selector over
+    their rows; when every category is a candidate the search is the
+    ordinary full one. Counters in stats() track how often each path is
+    taken, and, for the audited share of queries, how often the decision
+    differs from the full search.
+    """
+
+    def __init__(self, sub_centroids=SUB_CENTROIDS, accept_similarity=ACCEPT_SIMILARITY,
+                 accept_margin=ACCEPT_MARGIN, candidate_margin=CANDIDATE_MARGIN, audit_rate=AUDIT_RATE, seed=0):
+        self.sub_centroids = sub_centroids
+        self.accept_similarity = accept_similarity
+        self.accept_margin = accept_margin
+        self.candidate_margin = candidate_margin
+        self.audit_rate = audit_rate
+        self.rng = np.random.default_rng(seed)
+        self.seed = seed
+        self.centroids = None  # (n_centroids, dim) float32, L2-normalized, grouped by category
+        self.group_starts = None  # First centroid of each category that has rows
+        self.group_codes = None  # Category code of each centroid group
+        self.n_categories = 0
+        self._bitmaps = {}  # category code -> packed row bitmap, for n_bitmap_rows rows
+        self._n_bitmap_rows = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.counts = {"queries": 0, "decided": 0, "restricted": 0, "full": 0, "audited_decided": 0,
+                       "decided_disagreements": 0, "audited_restricted": 0, "restricted_disagreements": 0}
+
+    def build(self, embeddings, category_codes, n_categories):
+        """Compute the centroids from normalized embeddings (row i has category_codes[i])"""
+        category_codes = np.asarray(category_codes)
+        order = np.argsort(category_codes, kind="stable")
+        sorted_codes = category_codes[order]
+        codes, starts = np.unique(sorted_codes, return_index=True)
+        bounds = np.append(starts, len(order))
+
+        centroids, group_starts = [], []
+        for code, start, stop in zip(codes.tolist(), bounds[:-1], bounds[1:]):
+            rows = np.sort(order[start:stop])
+            k = max(1, min(self.sub_centroids, len(rows) // 39 or 1))
+            group_starts.append(sum(len(c) for c in centroids))
+            if k == 1:
+                centroids.append(np.asarray(embeddings[rows], dtype=np.float32).mean(axis=0, keepdims=True))
+                continue
+            sample = rows
+            if len(rows) > k * KMEANS_MAX_POINTS:
+                sample = np.sort(np.random.default_rng(self.seed).choice(rows, k * KMEANS_MAX_POINTS, replace=False))
+            kmeans = faiss.Kmeans(embeddings.shape[1], k, niter=KMEANS_ITERATIONS, seed=self.seed,
+                                  spherical=True, verbose=False)
+            kmeans.train(np.ascontiguousarray(embeddings[sample], dtype=np.float32))
+            centroids.append(kmeans.centroids.copy())
+
+        self.centroids = np.ascontiguousarray(np.concatenate(centroids), dtype=np.float32)
+        faiss.normalize_L2(self.centroids)
+        self.group_starts = np.asarray(group_starts, dtype=np.int64)
+        self.group_codes = codes.astype(np.int64)
+        self.n_categories = n_categories
+        self._bitmaps, self._n_bitmap_rows = {}, 0
+        return self
+
+    def describe(self):
+        return (f"{len(self.centroids)} centroids over {len(self.group_codes)} categories "
+                f"(accept >= {self.accept_similarity:.2f}, margin {self.accept_margin:.2f})")
+
+    def category_scores(self, query_array):
+        """(n_queries, n_categories) best centroid similarity per category (-inf if it has none)"""
+        similarities = query_array @ self.centroids.T
+        scores = np.full((len(query_array), self.n_categories), -np.inf, dtype=np.float32)
+        scores[:, self.group_codes] = np.maximum.reduceat(similarities, self.group_starts, axis=1)
+        return scores
+
+    def decide(self, query_array):
+        """Stage one for normalized queries
+
+        Returns (decided, similarity, candidates): the decided category code
+        per query (-1 when it goes on to a search), the best centroid
+        similarity, and a (n_queries, n_categories) mask of the categories
+        to search.
+        """
+        scores = self.category_scores(query_array)
+        top_two = -np.partition(-scores, 1, axis=1)[:, :2] if self.n_categories > 1 else \
+            np.column_stack([scores[:, 0], np.full(len(scores), -np.inf)])
+        best = top_two[:, 0]
+        decided = np.where((best >= self.accept_similarity) & (best - top_two[:, 1] >= self.accept_margin),
+                           np.argmax(scores, axis=1), -1)
+        candidates = scores >= (best - self.candidate_margin)[:, None]
+
+        n_decided = int(np.sum(decided >= 0))
+        n_full = int(np.sum((decided < 0) & candidates[:, self.group_codes].all(axis=1)))
+        self.counts["queries"] += len(decided)
+        self.counts["decided"] += n_decided
+        self.counts["full"] += n_full
+        self.counts["restricted"] += len(decided) - n_decided - n_full
+        return decided, best, candidates
+
+    def audit_rows(self, n_rows):
+        """Rows of a block to also run through the full search (audit_rate of them)"""
+        if self.audit_rate <= 0:
+            return np.zeros(0, dtype=np.int64)
+        return np.nonzero(self.rng.random(n_rows) < self.audit_rate)[0]
+
+    def record_audit(self, decided_by_prefilter, agreed):
+        kind = "decided" if decided_by_prefilter else "restricted"
+        self.counts[f"audited_{kind}"] += 1
+        self.counts[f"{kind}_disagreements"] += int(not agreed)
+
+    def selector_bitmap(self, categories, category_codes):
+        """Packed bitmap (little bit order) of the rows whose category is in `categories`"""
+        category_codes = np.asarray(category_codes)
+        if self._n_bitmap_rows != len(category_codes):
+            # Rows were learned online: rebuild the per-category bitmaps lazily
+            self._bitmaps, self._n_bitmap_rows = {}, len(category_codes)
+        bitmap = None
+        for code in categories:
+            if code not in self._bitmaps:
+                self._bitmaps[code] = np.packbits(category_codes == code, bitorder="little")
+            bitmap = self._bitmaps[code].copy() if bitmap is None else bitmap | self._bitmaps[code]
+        return bitmap
+
+    def stats(self):
+        """Path counts and audited disagreement rates"""
+        counts = dict(self.counts)
+        queries = max(1, counts["queries"])
+        counts["decided_rate"] = counts["decided"] / queries
+        counts["restricted_rate"] = counts["restricted"] / queries
+        counts["decided_disagreement_rate"] = counts["decided_disagreements"] / max(1, counts["audited_decided"])
+        counts["restricted_disagreement_rate"] = (counts["restricted_disagreements"]
+                                                  / max(1, counts["audited_restricted"]))
+        return counts
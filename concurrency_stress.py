@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import faiss
+
+from benchmark import BENCH_DIR, ensure_corpus
+from concurrent_index import ConcurrentIndexer
+from faiss_indexing import INDEX_SPEC, INDEX_SPECS
+from python_learn import corpus_embeddings, initialize_system, learn_incidents
+from synthetic_corpus import StubEmbeddingFunction, sample_queries
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+STRESS_ROWS = 20000
+STRESS_THREADS = (1, 2, 4, 8)  # Reader thread counts to measure
+STRESS_SECONDS = 3.0  # Per thread count
+QUERY_BATCH = 16  # Queries per search call of a reader
+N_QUERY_POOL = 2048  # Distinct queries the readers draw from
+WRITER_BATCH = 8  # Incidents learned per writer step
+WRITER_PAUSE_MS = 5.0  # Between writer steps
+REBUILD_EVERY = 100  # Writer steps between full rebuilds swapped in (0 = never)
+OMP_THREADS = 1  # FAISS threads per search, so the scaling measured is the reader threads'
+
+
+def reader(concurrent, db_config, queries, deadline, seed, stats):
+    """Search random query batches until the deadline; checks every returned id against the store"""
+    rng = np.random.default_rng(seed)
+    latencies, n_queries, bad_ids = [], 0, 0
+    while time.perf_counter() < deadline:
+        rows = rng.integers(0, len(queries), size=QUERY_BATCH)
+        started = time.perf_counter()
+        _, indices = concurrent.search_normalized(queries[rows])
+        latencies.append((time.perf_counter() - started) * 1000)
+        n_queries += len(rows)
+        # Rows reach the store before the index, so no neighbor may lie beyond it
+        bad_ids += int(np.sum(indices >= len(db_config.store)))
+    stats.append({"queries": n_queries, "latencies": latencies, "bad_ids": bad_ids})
+
+
+def writer(concurrent, db_config, corpus, learned, texts, vectors, categories, deadline, rebuild_every, stats):
+    """Learn WRITER_BATCH incidents per step and, every rebuild_every steps, rebuild and swap the index
+
+    Learned rows are drawn from the query pool (texts / vectors); their
+    vectors are appended to `learned` so a rebuild covers corpus + learned.
+    """
+    rng = np.random.default_rng(len(learned))
+    steps, rebuild_ms, errors = 0, [], []
+    while time.perf_counter() < deadline:
+        rows = rng.integers(0, len(texts), size=WRITER_BATCH)
+        try:
+            learn_incidents([texts[r] for r in rows], [categories[r] for r in rows], db_config, concurrent)
+            learned.append(vectors[rows])
+            steps += 1
+            if rebuild_every and steps % rebuild_every == 0:
+                started = time.perf_counter()
+                with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                    concurrent.rebuild(np.concatenate([corpus] + learned))
+                rebuild_ms.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            errors.append(repr(e))
+            break
+        time.sleep(WRITER_PAUSE_MS / 1000)
+    stats.append({"learned": steps * WRITER_BATCH, "rebuilds": len(rebuild_ms), "rebuild_ms": rebuild_ms,
+                  "errors": errors})
+
+
+def run_stress(db_config, faiss_indexer, corpus, texts, vectors, categories, thread_counts=STRESS_THREADS,
+               seconds=STRESS_SECONDS, with_writer=True, rebuild_every=REBUILD_EVERY, copy_on_write=False):
+    """Reader throughput for each thread count, with one writer learning incidents and rebuilding meanwhile
+
+    `corpus` holds the embeddings of the rows already indexed; readers
+    search the normalized query pool `vectors`, from which the writer also
+    learns. Returns one result row per thread count, and whether the index
+    ended up holding exactly the incident store's rows.
+    """
+    concurrent = ConcurrentIndexer(faiss_indexer, copy_on_write=copy_on_write)
+    learned, rows = [], []
+    for n_threads in thread_counts:
+        reader_stats, writer_stats = [], []
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=reader, args=(concurrent, db_config, vectors, deadline, seed,
+                                                         reader_stats))
+                   for seed in range(n_threads)]
+        if with_writer:
+            threads.append(threading.Thread(target=writer, args=(concurrent, db_config, corpus, learned, texts,
+                                                                 vectors, categories, deadline, rebuild_every,
+                                                                 writer_stats)))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies = np.concatenate([s["latencies"] for s in reader_stats])
+        row = {
+            "threads": n_threads,
+            "qps": sum(s["queries"] for s in reader_stats) / elapsed,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "bad_ids": sum(s["bad_ids"] for s in reader_stats),
+        }
+        if writer_stats:
+            stats = writer_stats[0]
+            row.update(learned=stats["learned"], rebuilds=stats["rebuilds"], writer_errors=stats["errors"],
+                       rebuild_ms=float(np.mean(stats["rebuild_ms"])) if stats["rebuild_ms"] else None)
+        rows.append(row)
+    consistent = concurrent.indexer.index.ntotal == len(db_config.store)
+    concurrent.close()
+    return rows, consistent
+
+
+def print_stress_report(rows, consistent):
+    writer_note = " + one writer" if rows and "learned" in rows[0] else ""
+    print("\n" + "="*78)
+    print(f"📊 CONCURRENT SEARCH STRESS TEST (reader threads{writer_note})")
+    print("="*78)
+    print(f"{'Threads':>7} {'QPS':>10} {'Scaling':>8} {'p50 ms':>8} {'p99 ms':>8} {'Learned':>8} "
+          f"{'Rebuilds':>8} {'Bad ids':>8}")
+    base_qps = rows[0]["qps"] if rows else 1.0
+    for row in rows:
+        print(f"{row['threads']:>7} {row['qps']:>10,.0f} {row['qps'] / base_qps:>7.2f}x {row['p50_ms']:>8.3f} "
+              f"{row['p99_ms']:>8.3f} {row.get('learned', 0):>8} {row.get('rebuilds', 0):>8} {row['bad_ids']:>8}")
+    print("="*78)
+    errors = [error for row in rows for error in row.get("writer_errors", [])]
+    if errors:
+        print(f"❌ Writer errors: {errors}")
+    if consistent and not any(row["bad_ids"] for row in rows) and not errors:
+        print("✅ Index and incident store stayed consistent")
+    else:
+        print("❌ Index and incident store diverged")
+    print(f"ℹ️ {os.cpu_count()} CPU cores; reader threads scale only up to the cores FAISS can use")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stress concurrent searches against a learning, rebuilding index")
+    parser.add_argument('--rows', type=int, default=STRESS_ROWS, help="Synthetic corpus rows")
+    parser.add_argument('--index', choices=INDEX_SPECS, default=INDEX_SPEC, help="FAISS index type")
+    parser.add_argument('--threads', default=",".join(str(n) for n in STRESS_THREADS),
+                        help="Comma-separated reader thread counts")
+    parser.add_argument('--seconds', type=float, default=STRESS_SECONDS, help="Run time per thread count")
+    parser.add_argument('--rebuild-every', type=int, default=REBUILD_EVERY,
+                        help="Writer steps between rebuilds swapped in (0 = never)")
+    parser.add_argument('--copy-on-write', action='store_true', help="Learn into a copy of the index, then swap")
+    parser.add_argument('--no-writer', action='store_true', help="Readers only")
+    parser.add_argument('--omp-threads', type=int, default=OMP_THREADS, help="FAISS threads per search")
+    parser.add_argument('--bench-dir', default=BENCH_DIR)
+    parser.add_argument('--output', help="Write the results as JSON")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    faiss.omp_set_num_threads(args.omp_threads)
+    csv_file = ensure_corpus(args.bench_dir, args.rows)
+    bundle_dir = os.path.join(args.bench_dir, f"stress-{args.rows}-{args.index}")
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        db_config, faiss_indexer = initialize_system(bundle_dir=bundle_dir, index_spec=args.index, wal_file=None,
+                                                     chroma_mode="skip", csv_file=csv_file, cache_file=None,
+                                                     embedding_factory=StubEmbeddingFunction)
+        corpus = np.asarray(corpus_embeddings(db_config, faiss_indexer, bundle_dir), dtype=np.float32)
+    texts = sample_queries(N_QUERY_POOL)
+    vectors = np.ascontiguousarray(db_config.embed_texts(texts), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    _, category_labels = db_config.get_category_codes()
+    categories = [category_labels[i % len(category_labels)] for i in range(len(texts))]
+    print(f"ℹ️ {len(db_config.store)} incidents, {faiss_indexer.describe()}")
+
+    rows, consistent = run_stress(db_config, faiss_indexer, corpus, texts, vectors, categories,
+                                  thread_counts=[int(n) for n in args.threads.split(",")], seconds=args.seconds,
+                                  with_writer=not args.no_writer, rebuild_every=args.rebuild_every,
+                                  copy_on_write=args.copy_on_write)
+    print_stress_report(rows, consistent)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": rows, "consistent": consistent, "cpu_count": os.cpu_count()}, f, indent=2)
+        print(f"✅ Results written to {args.output}")
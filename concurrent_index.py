@@ -0,0 +1,228 @@
+import contextlib
+import copy
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import faiss
+
+from faiss_indexing import FAISSIndexer
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+SEARCH_THREADS = min(8, os.cpu_count() or 1)  # Threads of search_many (FAISS releases the GIL while searching)
+SEARCH_CHUNK_ROWS = 256  # Queries per thread-pool task in search_many
+COPY_ON_WRITE = False  # add_vectors into a copy of the index, then swap it in (readers never wait for the add)
+
+
+class ReadWriteLock:
+    """Any number of readers or one writer
+
+    A waiting writer holds off new readers, so a steady stream of searches
+    cannot starve it. Not reentrant: a thread holding the read lock must
+    not ask for it again while a writer may be waiting.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self):
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextlib.contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextlib.contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class ConcurrentIndexer:
+    """FAISSIndexer (or ShardedIndexer) wrapper that many threads can search while it is updated
+
+    Searches hold the read lock only while FAISS runs, and FAISS releases
+    the GIL during a search, so searches from several threads (or
+    search_many's thread pool) overlap. Writers are serialized by writer()
+    and take the write lock only for the part that readers must not
+    observe half done: an in-place add_vectors or remove_ids, or the swap
+    of a rebuilt index (swap / rebuild build the new one with no lock
+    held). With copy_on_write (FAISSIndexer only), add_vectors also
+    works on a copy of the index and swaps it in, so readers wait for a
+    reference swap only, at the cost of copying the index per add. Searches already
+    running finish on the indexer they started with. Every other
+    attribute is read from the current indexer, so it is a drop-in for
+    process_new_incident, the batch functions and learn_incidents (which
+    holds writer() so the incident store and the index stay in step).
+    """
+
+    def __init__(self, indexer, search_threads=SEARCH_THREADS, copy_on_write=COPY_ON_WRITE):
+        if copy_on_write and not isinstance(indexer, FAISSIndexer):
+            raise ValueError("copy_on_write copies a FAISSIndexer; other indexers are updated in place")
+        self.indexer = indexer
+        self.search_threads = search_threads
+        self.copy_on_write = copy_on_write
+        self.lock = ReadWriteLock()
+        self._writer = threading.RLock()  # Held by a writer for a whole update, copy included
+        self._pool = None
+        self.swaps = 0
+
+    def __getattr__(self, name):
+        # Only called for attributes not set in __init__: the wrapped indexer's
+        return getattr(self.__dict__['indexer'], name)
+
+    def writer(self):
+        """Context that serializes writers (readers are not blocked by it)"""
+        return self._writer
+
+    def describe(self):
+        mode = "copy-on-write" if self.copy_on_write else "in-place"
+        return f"{self.indexer.describe()} (concurrent, {self.search_threads} search threads, {mode} adds)"
+
+    # --------------------------------------------
+    # Search (read lock)
+    # --------------------------------------------
+    def search_normalized(self, query_array, k=None):
+        with self.lock.read_locked():
+            return self.indexer.search_normalized(query_array, k)
+
+    def search_range(self, query_array, radius=None, max_neighbors=None, params=None):
+        with self.lock.read_locked():
+            return self.indexer.search_range(query_array, radius, max_neighbors, params)
+
+    def search_restricted(self, query_array, categories, category_codes):
+        with self.lock.read_locked():
+            return self.indexer.search_restricted(query_array, categories, category_codes)
+
+    def search_batch(self, query_embeddings):
+        """As FAISSIndexer.search_batch: normalized copies of the queries, errors reported as (None, None)"""
+        try:
+            query_array = np.array(query_embeddings).astype('float32')
+            faiss.normalize_L2(query_array)
+            return self.search_normalized(query_array)
+        except Exception as e:
+            print(f"❌ Error during search: {e}")
+            return None, None
+
+    def search_similar(self, query_embedding):
+        scores, indices = self.search_batch([query_embedding])
+        if scores is None:
+            return None, None
+        return scores[0], indices[0]
+
+    def search_many(self, query_array, k=None, chunk_rows=SEARCH_CHUNK_ROWS):
+        """search_normalized over chunks of normalized queries on the thread pool, results in order"""
+        if self.search_threads <= 1 or len(query_array) <= chunk_rows:
+            return self.search_normalized(query_array, k)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.search_threads)
+        chunks = [query_array[start:start + chunk_rows] for start in range(0, len(query_array), chunk_rows)]
+        results = list(self._pool.map(lambda chunk: self.search_normalized(chunk, k), chunks))
+        return (np.concatenate([scores for scores, _ in results]),
+                np.concatenate([indices for _, indices in results]))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    # --------------------------------------------
+    # Updates (writer, then a short write lock)
+    # --------------------------------------------
+    def add_vectors(self, embeddings, keys=None):
+        """Append vectors under the next ids, in place or (copy_on_write) into a copy swapped in after"""
+        with self._writer:
+            if self.copy_on_write:
+                staged = self.indexer_copy()
+                ids = self._add(staged, embeddings, keys)
+                self._swap(staged)
+                return ids
+            with self.lock.write_locked():
+                return self._add(self.indexer, embeddings, keys)
+
+    @staticmethod
+    def _add(indexer, embeddings, keys):
+        # Keys are passed on only when given: FAISSIndexer.add_vectors takes none
+        if keys is not None:
+            return indexer.add_vectors(embeddings, keys=keys)
+        return indexer.add_vectors(embeddings)
+
+    def remove_ids(self, ids):
+        """Tombstone ids (a set update and a new search selector, so done in place)"""
+        with self._writer, self.lock.write_locked():
+            self.indexer.remove_ids(ids)
+
+    def indexer_copy(self):
+        """Copy of the current FAISSIndexer with its own index and tombstones, for a copy-on-write update"""
+        # Only writers change the index, and the caller is the writer, so cloning needs no read lock
+        staged = copy.copy(self.indexer)
+        staged.index = faiss.clone_index(self.indexer.index)
+        staged.tombstones = set(self.indexer.tombstones)
+        staged.apply_search_params()
+        return staged
+
+    def swap(self, indexer):
+        """Make a fully built indexer current; returns the previous one"""
+        if self.copy_on_write and not isinstance(indexer, FAISSIndexer):
+            raise ValueError("copy_on_write copies a FAISSIndexer; swap in a FAISSIndexer")
+        with self._writer:
+            return self._swap(indexer)
+
+    def _swap(self, indexer):
+        with self.lock.write_locked():
+            previous, self.indexer = self.indexer, indexer
+        self.swaps += 1
+        return previous
+
+    def rebuild(self, embeddings):
+        """Rebuild a FAISSIndexer from embeddings (same parameters) beside the live one, then swap it in
+
+        The embeddings must cover every row the incident store holds, so
+        ids stay aligned; tombstones are carried over.
+        """
+        if not isinstance(self.indexer, FAISSIndexer):
+            raise ValueError("rebuild needs a FAISSIndexer; build other indexers yourself and swap them in")
+        with self._writer:
+            rebuilt = copy.copy(self.indexer)
+            tombstones = set(self.indexer.tombstones)
+            rebuilt.create_index(embeddings)
+            rebuilt.release_embeddings()
+            if tombstones:
+                rebuilt.remove_ids(tombstones)
+            return self._swap(rebuilt)
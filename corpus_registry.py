@@ -0,0 +1,264 @@
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from collections import OrderedDict
+
+import faiss
+
+from artifact_bundle import INDEX_FILE
+from bulk_embedding import default_embedding_function
+from python_learn import (BATCH_SIZE, DEFAULT_VOTING, initialize_system, process_incidents_batch,
+                          process_new_incident, run_batch_file)
+from voting import VOTING_STRATEGIES
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+CORPORA_FILE = "corpora.json"  # {name: {"csv_file": ..., "similarity_threshold": ..., "top_k": ..., ...}}
+CORPORA_DIR = "corpora"  # Each corpus keeps its artifact bundle and WAL under CORPORA_DIR/<name>/
+MEMORY_BUDGET_MB = 1024  # Loaded corpora beyond this are unloaded, least recently used first
+CORPUS_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]*$")  # Names double as directory names
+
+
+def corpus_footprint(db_config, faiss_indexer, bundle_dir=None):
+    """Estimated resident bytes of a loaded corpus: index, incident store and any kept embeddings
+
+    The index size is read from the bundle's index file when there is one
+    (an index in memory is about as large as its serialized form), so
+    sizing a corpus costs no serialization.
+    """
+    index_path = os.path.join(bundle_dir, INDEX_FILE) if bundle_dir else None
+    if index_path and os.path.exists(index_path):
+        n_bytes = os.path.getsize(index_path)
+    elif faiss_indexer.index is not None:
+        n_bytes = len(faiss.serialize_index(faiss_indexer.index))
+    else:
+        n_bytes = 0
+    if db_config.store is not None:
+        n_bytes += db_config.store.nbytes()
+    if faiss_indexer.embeddings_array is not None:
+        n_bytes += faiss_indexer.embeddings_array.nbytes
+    return n_bytes
+
+
+class CorpusRegistry:
+    """Several named incident corpora served side by side, sharing one embedding model
+
+    Each corpus has its own CSV, index, category table and voting operating
+    point (similarity_threshold, top_k and any other initialize_system
+    option), plus its own artifact bundle and WAL under corpora_dir/<name>/.
+    Registering a corpus is free: it is loaded by initialize_system the
+    first time it is asked for, reusing the registry's single embedding
+    function. When the loaded corpora's estimated footprint (see
+    corpus_footprint) exceeds memory_budget_mb, the least recently used
+    ones are unloaded; the next request reloads them from their bundles
+    (a warm start) and replays their WAL. Safe to share between threads;
+    a load prints initialize_system's progress like any other start.
+    """
+
+    def __init__(self, memory_budget_mb=MEMORY_BUDGET_MB, corpora_dir=CORPORA_DIR, embedding_factory=None):
+        self.memory_budget_mb = memory_budget_mb
+        self.corpora_dir = corpora_dir
+        self.embedding_factory = embedding_factory  # None = ChromaDB DefaultEmbeddingFunction
+        self.embedding_function = None  # Built on the first load, then shared by every corpus
+        self.specs = {}  # name -> initialize_system keyword arguments
+        self._loaded = OrderedDict()  # name -> (db_config, faiss_indexer), least recently used first
+        self._sizes = {}  # name -> estimated bytes
+        self._lock = threading.RLock()  # Guards specs, _loaded and _sizes
+        self._load_locks = {}  # name -> lock held while that corpus loads
+        self.loads = self.evictions = 0
+
+    @classmethod
+    def from_file(cls, path=CORPORA_FILE, **options):
+        """Registry with every corpus of a JSON file {name: {"csv_file": ..., other settings}}"""
+        with open(path, encoding="utf-8") as f:
+            corpora = json.load(f)
+        if not isinstance(corpora, dict):
+            raise ValueError(f"{path}: expected an object of corpora")
+        registry = cls(**options)
+        for name, settings in corpora.items():
+            registry.register(name, **settings)
+        return registry
+
+    # --------------------------------------------
+    # Registration
+    # --------------------------------------------
+    def register(self, name, csv_file, **settings):
+        """Add (or redefine) a corpus; `settings` are initialize_system options
+
+        bundle_dir and wal_file default to corpora_dir/<name>/, and the
+        ChromaDB collection is skipped unless chroma_mode says otherwise.
+        A loaded corpus that is redefined is unloaded.
+        """
+        if not CORPUS_NAME.match(str(name)):
+            raise ValueError(f"Invalid corpus name '{name}' (letters, digits, '_', '.', '-')")
+        if "embedding_function" in settings or "embedding_factory" in settings:
+            raise ValueError("Corpora share the registry's embedding model")
+        corpus_dir = os.path.join(self.corpora_dir, name)
+        spec = {"bundle_dir": os.path.join(corpus_dir, "artifacts"),
+                "wal_file": os.path.join(corpus_dir, "incidents.wal.jsonl"),
+                "chroma_mode": "skip"}
+        spec.update(settings, csv_file=csv_file)
+        with self._lock:
+            self.unload(name)
+            self.specs[name] = spec
+
+    def names(self):
+        with self._lock:
+            return list(self.specs)
+
+    def is_loaded(self, name):
+        with self._lock:
+            return name in self._loaded
+
+    # --------------------------------------------
+    # Loading and eviction
+    # --------------------------------------------
+    def shared_embedding_function(self):
+        """The one embedding function every corpus embeds with (built on first use)"""
+        with self._lock:
+            if self.embedding_function is None:
+                factory = self.embedding_factory or default_embedding_function
+                self.embedding_function = factory()
+            return self.embedding_function
+
+    def get(self, name):
+        """(db_config, faiss_indexer) of a corpus, loading it first if needed
+
+        Loading holds only that corpus's lock, so requests for corpora that
+        are already loaded are served meanwhile.
+        """
+        with self._lock:
+            if name in self._loaded:
+                self._loaded.move_to_end(name)
+                return self._loaded[name]
+            if name not in self.specs:
+                raise ValueError(f"Unknown corpus '{name}' (registered: {', '.join(self.specs) or 'none'})")
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                if name in self._loaded:  # Loaded by another thread while this one waited
+                    self._loaded.move_to_end(name)
+                    return self._loaded[name]
+                spec = dict(self.specs[name])
+            system = self._load(name, spec)
+            with self._lock:
+                self._loaded[name] = system
+                self._sizes[name] = corpus_footprint(*system, bundle_dir=spec.get("bundle_dir"))
+                self.loads += 1
+                self._evict(keep=name)
+            return system
+
+    def _load(self, name, spec):
+        for path in (spec.get("bundle_dir"), spec.get("wal_file")):
+            if path:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        embedding_function = self.shared_embedding_function()
+        try:
+            return initialize_system(embedding_function=embedding_function,
+                                     embedding_factory=self.embedding_factory, **spec)
+        except SystemExit:
+            # initialize_system exits on unreadable data; one bad corpus must not stop the others
+            raise RuntimeError(f"Corpus '{name}' failed to load from {spec['csv_file']}") from None
+
+    def _evict(self, keep=None):
+        """Unload least recently used corpora until the loaded ones fit memory_budget_mb"""
+        if self.memory_budget_mb is None:
+            return
+        budget = self.memory_budget_mb * 1024 * 1024
+        for name in list(self._loaded):
+            if sum(self._sizes.values()) <= budget:
+                break
+            if name != keep:
+                self.unload(name)
+                self.evictions += 1
+        if keep in self._sizes and self._sizes[keep] > budget:
+            print(f"⚠️ Corpus '{keep}' alone ({self._sizes[keep] / 2**20:.0f} MB) exceeds the "
+                  f"{self.memory_budget_mb} MB budget")
+
+    def unload(self, name):
+        """Drop a loaded corpus (its bundle and WAL stay on disk for the next load)
+
+        Nothing is closed explicitly, so a categorization already holding
+        the corpus finishes; its memory goes with the last reference.
+        """
+        with self._lock:
+            self._loaded.pop(name, None)
+            self._sizes.pop(name, None)
+
+    def close(self):
+        with self._lock:
+            for name in list(self._loaded):
+                self.unload(name)
+
+    def resident_mb(self):
+        with self._lock:
+            return sum(self._sizes.values()) / (1024 * 1024)
+
+    def describe(self):
+        """One line per registered corpus"""
+        with self._lock:
+            specs = dict(self.specs)
+            loaded = {name: (system, self._sizes[name]) for name, system in self._loaded.items()}
+        lines = []
+        for name, spec in specs.items():
+            if name in loaded:
+                (db_config, faiss_indexer), n_bytes = loaded[name]
+                _, category_labels = db_config.get_category_codes()
+                state = (f"{len(db_config.store)} incidents, {len(category_labels)} categories, "
+                         f"{faiss_indexer.describe()}, {n_bytes / 2**20:.1f} MB")
+            else:
+                state = "not loaded"
+            lines.append(f"{name}: {spec['csv_file']} (threshold {spec.get('similarity_threshold', 'default')}, "
+                         f"top_k {spec.get('top_k', 'default')}) - {state}")
+        return lines
+
+    # --------------------------------------------
+    # Categorization
+    # --------------------------------------------
+    def categorize(self, name, description, voting=DEFAULT_VOTING, ai_fallback=None):
+        """CategorizationResult of one description against the named corpus"""
+        db_config, faiss_indexer = self.get(name)
+        return process_new_incident(description, db_config, faiss_indexer, voting=voting, verbosity=0,
+                                    ai_fallback=ai_fallback)
+
+    def categorize_many(self, name, descriptions, voting=DEFAULT_VOTING, batch_size=BATCH_SIZE, ai_fallback=None):
+        """CategorizationResults of many descriptions against the named corpus (see process_incidents_batch)"""
+        db_config, faiss_indexer = self.get(name)
+        return process_incidents_batch(descriptions, db_config, faiss_indexer, voting=voting,
+                                       batch_size=batch_size, verbosity=0, ai_fallback=ai_fallback)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Categorize incidents against one of several named corpora")
+    parser.add_argument('--corpora', default=CORPORA_FILE, help="JSON file of named corpora")
+    parser.add_argument('--corpus', help="Corpus to categorize against")
+    parser.add_argument('--input', help="CSV of new incidents (default: one description per stdin line)")
+    parser.add_argument('--output', default="results.csv", help="Where to write batch results")
+    parser.add_argument('--voting', choices=sorted(VOTING_STRATEGIES), default=DEFAULT_VOTING)
+    parser.add_argument('--memory-mb', type=float, default=MEMORY_BUDGET_MB,
+                        help="Memory budget of the loaded corpora")
+    parser.add_argument('--corpora-dir', default=CORPORA_DIR, help="Where corpus bundles and WALs are kept")
+    parser.add_argument('--list', action='store_true', help="List the registered corpora and exit")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    registry = CorpusRegistry.from_file(args.corpora, memory_budget_mb=args.memory_mb, corpora_dir=args.corpora_dir)
+    if args.list or not args.corpus:
+        for line in registry.describe():
+            print(f"ℹ️ {line}")
+        sys.exit()
+    if args.input:
+        db_config, faiss_indexer = registry.get(args.corpus)
+        run_batch_file(args.input, args.output, db_config, faiss_indexer, voting=args.voting, verbosity=1)
+    else:
+        for line in sys.stdin:
+            if line.strip():
+                result = registry.categorize(args.corpus, line.strip(), voting=args.voting)
+                print(f"{result.assigned_tag}\t{result.method}\t{result.decision_similarity:.2f}")
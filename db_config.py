@@ -0,0 +1,408 @@
+import hashlib
+import itertools
+
+import numpy as np
+# pandas and chromadb are imported where they are used, so a warm start
+# (which needs neither) and plain imports of this module stay fast
+from embedding_cache import EmbeddingCache, embedding_model_id, CACHE_FILE, MAX_ENTRIES
+from bulk_embedding import (BulkEmbedder, EMBED_WORKERS, ONNX_THREADS, default_embedding_function,
+                            limit_onnx_threads)
+from duplicate_index import DuplicateIndex
+from incident_store import IncidentStore, read_csv_header
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+CSV_FILE = "incidents.csv"
+EMBEDDING_CACHE_FILE = CACHE_FILE  # Set to None to disable the on-disk embedding cache
+EMBEDDING_CACHE_MAX_ENTRIES = MAX_ENTRIES
+CHROMA_MODES = ("memory", "persistent", "skip")
+CHROMA_MODE = "memory"  # "persistent" keeps the collection on disk and reuses it across restarts
+CHROMA_PERSIST_DIR = "chroma_store"
+CHROMA_CHUNK_SIZE = 5000  # Rows per collection.add call (below ChromaDB's max batch size)
+STREAM_CHUNK_ROWS = 20000  # Rows per chunk when the CSV is streamed instead of read whole
+KEEP_COLUMNS = ('Description',)  # Parsed when streaming, plus the category column (others load lazily)
+LEARNED_ID_PREFIX = "learned-"  # IncidentID of incidents learned online
+DUPLICATE_INDEX = True  # Exact-duplicate fast path over normalized descriptions
+DUPLICATE_MINHASH = False  # Also match near-duplicates with a MinHash/LSH sketch (more memory)
+CATEGORY_COLUMNS = ('Category', 'Tag', 'Type', 'Department', 'category', 'tag', 'type')
+
+
+class DatabaseConfig:
+    """Handles CSV loading, ChromaDB initialization, and embedding function"""
+    
+    def __init__(self, csv_file=CSV_FILE, cache_file=EMBEDDING_CACHE_FILE,
+                 cache_max_entries=EMBEDDING_CACHE_MAX_ENTRIES, duplicate_index=DUPLICATE_INDEX,
+                 minhash=DUPLICATE_MINHASH, embed_workers=EMBED_WORKERS, onnx_threads=ONNX_THREADS,
+                 embedding_factory=None, embedding_function=None):
+        self.csv_file = csv_file
+        self.cache_file = cache_file
+        self.cache_max_entries = cache_max_entries
+        self.use_duplicate_index = duplicate_index
+        self.minhash = minhash
+        self.duplicate_index = None
+        self.store = None
+        self.category_col = None
+        self.embedding_factory = embedding_factory  # None = ChromaDB DefaultEmbeddingFunction
+        self.embedding_function = embedding_function  # Prebuilt instance to reuse (e.g. shared between corpora)
+        self.embedding_cache = None
+        self.embed_workers = embed_workers
+        self.onnx_threads = onnx_threads
+        self.bulk_embedder = None
+        self.keep_columns = None
+        self.tombstones = set()
+        self.wal = None
+        self.snapshot_id = None
+        self.collection = None
+        self.chroma_client = None
+        
+    def load_csv(self, chunk_rows=None):
+        """Load incident data from CSV into the columnar IncidentStore
+        
+        Only the descriptions and category codes stay resident; other
+        columns are read back from the CSV when asked for. With chunk_rows,
+        the CSV is read in chunks of KEEP_COLUMNS and the category column,
+        which bounds the parser's working memory.
+        """
+        import pandas as pd
+        print("\n[STEP 1] Loading incident data from CSV...")
+        if chunk_rows:
+            chunks = list(self.iter_csv_chunks(chunk_rows))
+            df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame(columns=self.keep_columns)
+            print(f"✅ Successfully loaded {len(df)} incidents (columns parsed: {self.keep_columns})")
+        else:
+            try:
+                df = pd.read_csv(self.csv_file)
+                print(f"✅ Successfully loaded {len(df)} incidents")
+                print(f"Columns: {list(df.columns)}")
+                print(f"\nFirst few records:")
+                print(df.head())
+            except Exception as e:
+                print(f"❌ Error loading CSV: {e}")
+                exit()
+            if self.category_col is None:
+                self._find_category_col(df.columns)
+        
+        self.attach_store(IncidentStore.from_frame(df, self.category_col, self.csv_file))
+        return self.store, self.category_col
+    
+    def attach_store(self, store, duplicate_index=None):
+        """Use `store` for the incident metadata and (re)build the duplicate index from it"""
+        self.store = store
+        if duplicate_index is not None:
+            self.duplicate_index = duplicate_index
+        else:
+            self.build_duplicate_index()
+        print(f"✅ Incident store: {len(store)} incidents, {len(store.labels)} categories, "
+              f"{store.nbytes() / 2**20:.1f} MB")
+        return store
+    
+    def build_duplicate_index(self):
+        """Hash the normalized descriptions for the exact/near-duplicate fast path"""
+        if not self.use_duplicate_index:
+            self.duplicate_index = None
+            return None
+        self.duplicate_index = DuplicateIndex(minhash=self.minhash)
+        self.duplicate_index.add(self.store.iter_descriptions(), self.store.codes)
+        kind = "exact + near-duplicate" if self.minhash else "exact"
+        print(f"✅ Duplicate index ({kind}): {len(self.duplicate_index)} distinct descriptions")
+        return self.duplicate_index
+    
+    def _find_category_col(self, columns):
+        """Validate required columns and find the category/tag column"""
+        if 'Description' not in columns:
+            print("❌ 'Description' column not found in CSV")
+            exit()
+        
+        for col in CATEGORY_COLUMNS:
+            if col in columns:
+                self.category_col = col
+                break
+        
+        if self.category_col:
+            print(f"✅ Found category column: '{self.category_col}'")
+        else:
+            print("❌ No category/tag column found in CSV")
+            exit()
+        return self.category_col
+    
+    def detect_columns(self):
+        """Read only the CSV header: find the category column and the columns to keep"""
+        try:
+            columns = read_csv_header(self.csv_file)
+        except Exception as e:
+            print(f"❌ Error loading CSV: {e}")
+            exit()
+        self._find_category_col(columns)
+        self.keep_columns = [col for col in KEEP_COLUMNS if col in columns] + [self.category_col]
+        return self.category_col
+    
+    def iter_csv_chunks(self, chunk_rows=STREAM_CHUNK_ROWS):
+        """Yield the CSV as dataframes of up to chunk_rows rows with only the kept columns"""
+        import pandas as pd
+        if self.keep_columns is None:
+            self.detect_columns()
+        try:
+            yield from pd.read_csv(self.csv_file, usecols=self.keep_columns, chunksize=chunk_rows)
+        except Exception as e:
+            print(f"❌ Error streaming CSV: {e}")
+            exit()
+    
+    def initialize_embedding_function(self):
+        """Initialize ChromaDB embedding function"""
+        print("\n[STEP 2] Initializing ChromaDB Embedding Function...")
+        try:
+            limit_onnx_threads(self.onnx_threads)
+            if self.embedding_function is not None:
+                print(f"✅ Reusing {type(self.embedding_function).__name__}")
+            elif self.embedding_factory is None:
+                self.embedding_function = default_embedding_function()
+                print("✅ ChromaDB DefaultEmbeddingFunction initialized")
+            else:
+                self.embedding_function = self.embedding_factory()
+                print(f"✅ {type(self.embedding_function).__name__} initialized")
+        except Exception as e:
+            print(f"❌ Error initializing embedding function: {e}")
+            exit()
+        
+        self.bulk_embedder = BulkEmbedder(self.embedding_function, workers=self.embed_workers,
+                                          onnx_threads=self.onnx_threads,
+                                          factory=self.embedding_factory or default_embedding_function)
+        if self.bulk_embedder.workers > 1:
+            print(f"✅ Bulk embedding: {self.bulk_embedder.describe()}")
+        
+        if self.cache_file:
+            try:
+                self.embedding_cache = EmbeddingCache(
+                    path=self.cache_file,
+                    model_id=embedding_model_id(self.embedding_function),
+                    max_entries=self.cache_max_entries
+                )
+                print(f"✅ Embedding cache opened: {self.cache_file} ({len(self.embedding_cache)} entries)")
+            except Exception as e:
+                print(f"⚠️ Embedding cache disabled: {e}")
+                self.embedding_cache = None
+        
+        return self.embedding_function
+    
+    def embed_texts(self, texts):
+        """Embed a list of texts, serving repeats from the embedding cache
+
+        Large lists (index builds) are spread over the bulk embedding workers.
+        """
+        embed = self.bulk_embedder or self.embedding_function
+        if self.embedding_cache is not None:
+            return self.embedding_cache.embed(texts, embed)
+        return np.asarray(embed(texts), dtype=np.float32)
+    
+    def release_embedding_workers(self):
+        """Stop the bulk embedding worker processes once an index build is done"""
+        if self.bulk_embedder is not None:
+            self.bulk_embedder.close()
+    
+    def embed_query(self, description):
+        """Embed a single incident description"""
+        return self.embed_texts([description])[0]
+    
+    def generate_embeddings(self):
+        """Generate embeddings for all descriptions"""
+        print("\n[STEP 3] Generating embeddings for all incident descriptions...")
+        try:
+            descriptions = list(self.store.iter_descriptions())
+            embeddings = self.embed_texts(descriptions)
+            
+            if self.embedding_cache is not None:
+                print(f"✅ Embedding cache: {self.embedding_cache.hits} reused, "
+                      f"{self.embedding_cache.misses} newly embedded")
+            print(f"✅ Generated {len(embeddings)} embeddings")
+            print(f"Embedding dimension: {len(embeddings[0])}")
+            
+            return embeddings, descriptions
+        except Exception as e:
+            print(f"❌ Error generating embeddings: {e}")
+            exit()
+    
+    def setup_chromadb_collection(self, descriptions, embeddings=None, mode=CHROMA_MODE,
+                                  persist_dir=CHROMA_PERSIST_DIR, chunk_size=CHROMA_CHUNK_SIZE):
+        """Create and populate ChromaDB collection
+        
+        When `embeddings` are given they are stored directly, so ChromaDB does
+        not run the embedding model over the corpus a second time. With
+        `descriptions` None they are read from the incident store one chunk
+        at a time, as are the metadata, so a streamed build never holds
+        every description as Python strings. mode is
+        "memory" (fresh in-process collection), "persistent" (on-disk store
+        in persist_dir, reused when it already holds this CSV) or "skip".
+        """
+        print("\n[STEP 5] Storing data in ChromaDB collection...")
+        if mode not in CHROMA_MODES:
+            raise ValueError(f"Unknown ChromaDB mode '{mode}' (choose from {', '.join(CHROMA_MODES)})")
+        if mode == "skip":
+            print("ℹ️ ChromaDB collection skipped")
+            return None
+        try:
+            import chromadb
+            collection_metadata = {"hnsw:space": "cosine"}
+            if mode == "persistent":
+                self.chroma_client = chromadb.PersistentClient(path=persist_dir)
+                collection_metadata["csv_sha256"] = self.csv_checksum()
+                try:
+                    existing = self.chroma_client.get_collection(name="incidents", embedding_function=self.embedding_function)
+                    if (existing.metadata or {}).get("csv_sha256") == collection_metadata["csv_sha256"] \
+                            and existing.count() == len(self.store):
+                        self.collection = existing
+                        print(f"✅ Reusing persistent ChromaDB collection ({existing.count()} incidents)")
+                        return self.collection
+                except Exception:
+                    pass
+            else:
+                self.chroma_client = chromadb.Client()
+            
+            # Delete existing collection if exists
+            try:
+                self.chroma_client.delete_collection(name="incidents")
+            except:
+                pass
+            
+            # Create new collection
+            self.collection = self.chroma_client.create_collection(
+                name="incidents",
+                embedding_function=self.embedding_function,
+                metadata=collection_metadata
+            )
+            
+            # Add to collection in bounded chunks, metadata built per chunk
+            n_rows = len(self.store)
+            incident_ids = self.store.column('IncidentID') if self.store.has_column('IncidentID') else None
+            dates = self.store.column('Date') if self.store.has_column('Date') else None
+            store_descriptions = self.store.iter_descriptions() if descriptions is None else None
+            for start in range(0, n_rows, chunk_size):
+                end = min(start + chunk_size, n_rows)
+                ids = [str(i) for i in range(start, end)]
+                chunk_incident_ids = (incident_ids.iloc[start:end].astype(str).tolist() if incident_ids is not None
+                                      else ids)
+                chunk_dates = dates.iloc[start:end].astype(str).tolist() if dates is not None else [''] * len(ids)
+                categories = self.store.categories(np.arange(start, end)).tolist()
+                batch = {
+                    "documents": (list(itertools.islice(store_descriptions, end - start))
+                                  if descriptions is None else list(descriptions[start:end])),
+                    "metadatas": [{"incident_id": incident_id, "date": date, "category": category}
+                                  for incident_id, date, category in zip(chunk_incident_ids, chunk_dates,
+                                                                         categories)],
+                    "ids": ids,
+                }
+                if embeddings is not None:
+                    batch["embeddings"] = np.asarray(embeddings[start:end], dtype=np.float32).tolist()
+                self.collection.add(**batch)
+            
+            print(f"✅ Stored {n_rows} incidents in ChromaDB ({mode})")
+            return self.collection
+            
+        except Exception as e:
+            print(f"⚠️ ChromaDB storage warning: {e}")
+            return None
+    
+    def get_category_codes(self):
+        """Return int32 category code per row and the code -> label table"""
+        return self.store.codes, self.store.labels
+    
+    def set_category_codes(self, category_codes, category_labels):
+        """Use precomputed category codes (e.g. from an artifact bundle)"""
+        self.store.set_codes(category_codes, category_labels)
+    
+    def csv_checksum(self, chunk_size=1 << 20):
+        """SHA-256 of the raw CSV file"""
+        digest = hashlib.sha256()
+        with open(self.csv_file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def append_incidents(self, descriptions, categories, dates=None, embeddings=None):
+        """Append learned incidents, keeping the incident store and ChromaDB in sync
+        
+        Returns the new row ids, which are positional (len(store) onwards)
+        and match the ids FAISSIndexer.add_vectors assigns.
+        """
+        if dates is None:
+            dates = [""] * len(descriptions)
+        start = len(self.store)
+        ids = np.arange(start, start + len(descriptions))
+        
+        columns = {}
+        if self.store.has_column('Date'):
+            columns['Date'] = list(dates)
+        if self.store.has_column('IncidentID'):
+            columns['IncidentID'] = [f"{LEARNED_ID_PREFIX}{i}" for i in ids]
+        new_codes = self.store.append(descriptions, categories, columns)
+        if self.duplicate_index is not None:
+            self.duplicate_index.add(descriptions, new_codes, first_row=start)
+        
+        if self.collection is not None and embeddings is not None:
+            try:
+                self.collection.add(
+                    ids=[str(i) for i in ids],
+                    embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+                    documents=list(descriptions),
+                    metadatas=[{"incident_id": str(i), "date": str(d), "category": str(c)}
+                               for i, d, c in zip(ids, dates, categories)]
+                )
+            except Exception as e:
+                print(f"⚠️ ChromaDB append warning: {e}")
+        
+        return ids
+    
+    def remove_incidents(self, ids):
+        """Tombstone incidents: rows stay in place (ids are stable) but are excluded from search"""
+        ids = [int(i) for i in ids if int(i) not in self.tombstones]
+        self.tombstones.update(ids)
+        if self.duplicate_index is not None:
+            descriptions = self.store.descriptions(ids)
+            for description, code in zip(descriptions, self.store.codes[ids]):
+                self.duplicate_index.remove(description, code)
+        if self.collection is not None:
+            try:
+                self.collection.delete(ids=[str(i) for i in ids])
+            except Exception as e:
+                print(f"⚠️ ChromaDB delete warning: {e}")
+    
+    @property
+    def df(self):
+        """All incidents as a dataframe, built from the store (and the CSV) on each access"""
+        return None if self.store is None else self.store.to_frame()
+    
+    def get_live_data(self):
+        """Dataframe without tombstoned rows"""
+        df = self.df
+        if not self.tombstones:
+            return df
+        return df.drop(index=df.index[sorted(self.tombstones)])
+    
+    def write_live_csv(self, path, chunk_rows=STREAM_CHUNK_ROWS):
+        """Write the live incidents (learned ones included, tombstoned ones dropped) to path
+        
+        The original CSV is streamed through chunk by chunk, so every column
+        is preserved without loading the whole file; learned incidents are
+        appended after it. Returns the number of rows written.
+        """
+        import pandas as pd
+        tombstones = np.fromiter(sorted(self.tombstones), dtype=np.int64)
+        written = offset = 0
+        header = True
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            for chunk in pd.read_csv(self.csv_file, chunksize=chunk_rows):
+                keep = ~np.isin(np.arange(offset, offset + len(chunk)), tombstones)
+                chunk[keep].to_csv(f, header=header, index=False)
+                written += int(keep.sum())
+                offset += len(chunk)
+                header = False
+            learned = np.setdiff1d(np.arange(offset, len(self.store)), tombstones)
+            if len(learned):
+                self.store.appended_frame(learned).to_csv(f, header=header, index=False)
+                written += len(learned)
+        return written
+    
+    def get_data(self):
+        """Return dataframe (materialized from the store) and category column"""
+        return self.df, self.category_col
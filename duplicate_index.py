@@ -0,0 +1,160 @@
+import array
+import zlib
+
+import numpy as np
+
+from embedding_cache import normalize_description
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+MIN_AGREEMENT = 0.5  # Share of duplicates that must agree on a category for the fast path
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16  # LSH bands (MINHASH_PERMUTATIONS / MINHASH_BANDS rows each)
+MINHASH_SHINGLE = 5  # Character shingle length
+MINHASH_THRESHOLD = 0.9  # Estimated Jaccard similarity that counts as a near-duplicate
+MINHASH_PRIME = (1 << 31) - 1  # Mersenne prime; keeps a*x+b within uint64
+MINHASH_SEED = 1
+
+
+class DuplicateIndex:
+    """Hash index of normalized historical descriptions -> category distribution
+
+    Every distinct normalized description gets a slot holding its category
+    counts and the row of its first occurrence. Slots are kept in compact
+    arrays (code, count, first row); only descriptions seen with more than
+    one category get a {code: count} dict. With minhash=True, a
+    MinHash/LSH sketch of each slot's character shingles is kept as well so
+    near-duplicates (small edits, changed numbers) can be matched.
+    """
+
+    def __init__(self, minhash=False, min_agreement=MIN_AGREEMENT, n_permutations=MINHASH_PERMUTATIONS,
+                 n_bands=MINHASH_BANDS, shingle=MINHASH_SHINGLE, threshold=MINHASH_THRESHOLD):
+        if minhash and n_permutations % n_bands:
+            raise ValueError(f"n_bands={n_bands} must divide n_permutations={n_permutations}")
+        self.min_agreement = min_agreement
+        self.slots = {}  # normalized description -> slot
+        self.first_row = array.array('q')
+        self.codes = array.array('i')
+        self.n_rows = array.array('i')
+        self.mixed = {}  # slot -> {category code: count} for slots with several categories
+        self.minhash = minhash
+        self.shingle = shingle
+        self.threshold = threshold
+        self.n_bands = n_bands
+        self.signatures = None
+        self.buckets = [{} for _ in range(n_bands)] if minhash else None
+        if minhash:
+            rng = np.random.default_rng(MINHASH_SEED)
+            self.hash_a = rng.integers(1, MINHASH_PRIME, n_permutations, dtype=np.uint64)
+            self.hash_b = rng.integers(0, MINHASH_PRIME, n_permutations, dtype=np.uint64)
+            self.signatures = np.zeros((0, n_permutations), dtype=np.uint32)
+            self._n_signatures = 0
+
+    def __len__(self):
+        return len(self.slots)
+
+    def add(self, descriptions, category_codes, first_row=0):
+        """Index rows first_row, first_row+1, ... with their category codes"""
+        new_signatures = []
+        for row, (description, code) in enumerate(zip(descriptions, category_codes), first_row):
+            key = normalize_description(description)
+            code = int(code)
+            slot = self.slots.get(key)
+            if slot is None:
+                self.slots[key] = len(self.first_row)
+                self.first_row.append(row)
+                self.codes.append(code)
+                self.n_rows.append(1)
+                if self.minhash:
+                    new_signatures.append(self.signature(key))
+            elif slot in self.mixed:
+                self.mixed[slot][code] = self.mixed[slot].get(code, 0) + 1
+            elif self.codes[slot] == code or self.n_rows[slot] == 0:
+                self.codes[slot] = code
+                self.n_rows[slot] += 1
+            else:
+                self.mixed[slot] = {self.codes[slot]: self.n_rows[slot], code: 1}
+        if new_signatures:
+            self._add_signatures(np.vstack(new_signatures))
+
+    def remove(self, description, category_code):
+        """Forget one occurrence (e.g. a tombstoned row)"""
+        slot = self.slots.get(normalize_description(description))
+        if slot is None:
+            return
+        code = int(category_code)
+        if slot in self.mixed:
+            counts = self.mixed[slot]
+            if counts.get(code, 0) > 1:
+                counts[code] -= 1
+            else:
+                counts.pop(code, None)
+        elif self.codes[slot] == code and self.n_rows[slot] > 0:
+            self.n_rows[slot] -= 1
+
+    def counts(self, slot):
+        """{category code: count} of a slot (empty once all its rows are removed)"""
+        if slot in self.mixed:
+            return self.mixed[slot]
+        return {self.codes[slot]: self.n_rows[slot]} if self.n_rows[slot] else {}
+
+    def signature(self, key):
+        """MinHash signature of a normalized description's character shingles"""
+        text = key or " "
+        n = max(1, len(text) - self.shingle + 1)
+        shingles = {text[i:i + self.shingle] for i in range(n)}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) % MINHASH_PRIME for s in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (self.hash_a[:, None] * hashes[None, :] + self.hash_b[:, None]) % np.uint64(MINHASH_PRIME)
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def _add_signatures(self, signatures):
+        start = self._n_signatures
+        end = start + len(signatures)
+        if end > len(self.signatures):
+            grown = np.zeros((max(end, 2 * len(self.signatures)), signatures.shape[1]), dtype=np.uint32)
+            grown[:start] = self.signatures[:start]
+            self.signatures = grown
+        self.signatures[start:end] = signatures
+        self._n_signatures = end
+        for band, rows in enumerate(np.split(signatures, self.n_bands, axis=1)):
+            buckets = self.buckets[band]
+            for slot, band_rows in enumerate(rows, start):
+                buckets.setdefault(band_rows.tobytes(), []).append(slot)
+
+    def _near_duplicate(self, key):
+        """(slot, estimated Jaccard) of the most similar live slot, or (None, 0.0)"""
+        signature = self.signature(key)
+        candidates = set()
+        for band, rows in enumerate(np.split(signature, self.n_bands)):
+            candidates.update(self.buckets[band].get(rows.tobytes(), ()))
+        candidates = [slot for slot in candidates if self.counts(slot)]
+        if not candidates:
+            return None, 0.0
+        agreement = (self.signatures[candidates] == signature).mean(axis=1)
+        best = int(np.argmax(agreement))
+        return candidates[best], float(agreement[best])
+
+    def lookup(self, description):
+        """Return a match dict for a duplicate with a clear category, else None
+
+        The dict holds 'kind' ("exact" or "near"), 'similarity' (percent:
+        100 for exact, estimated Jaccard for near), 'counts' ({code: count})
+        and 'first_row'.
+        """
+        key = normalize_description(description)
+        slot = self.slots.get(key)
+        kind, similarity = "exact", 100.0
+        if slot is None or not self.counts(slot):
+            if not self.minhash:
+                return None
+            slot, jaccard = self._near_duplicate(key)
+            if slot is None or jaccard < self.threshold:
+                return None
+            kind, similarity = "near", jaccard * 100
+        counts = self.counts(slot)
+        if max(counts.values()) < self.min_agreement * sum(counts.values()):
+            return None
+        return {'kind': kind, 'similarity': similarity, 'counts': counts, 'first_row': self.first_row[slot]}
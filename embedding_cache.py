@@ -0,0 +1,140 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+CACHE_FILE = "embedding_cache.sqlite"
+MAX_ENTRIES = 1_000_000  # Oldest (least recently used) entries are evicted beyond this
+SQLITE_BATCH = 500  # Keys per SELECT (stays below SQLite's host-parameter limit)
+
+
+def normalize_description(description):
+    """Normalize a description for hashing: collapse whitespace and casefold"""
+    if description is None:
+        return ""
+    return " ".join(str(description).split()).casefold()
+
+
+def embedding_model_id(embedding_function):
+    """Build a stable identity string for an embedding function"""
+    cls = type(embedding_function)
+    model_name = getattr(embedding_function, "MODEL_NAME", None) or getattr(embedding_function, "model_name", "")
+    return f"{cls.__module__}.{cls.__name__}:{model_name}"
+
+
+class EmbeddingCache:
+    """On-disk, content-addressed embedding cache with LRU eviction"""
+
+    def __init__(self, path=CACHE_FILE, model_id="default", max_entries=MAX_ENTRIES):
+        self.path = path
+        self.model_id = model_id
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def key_for(self, description):
+        """Content address of a description for this cache's model"""
+        payload = f"{self.model_id}\0{normalize_description(description)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Return {key: float32 vector} for the keys present in the cache"""
+        found = {}
+        unique_keys = list(dict.fromkeys(keys))
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(unique_keys), SQLITE_BATCH):
+                batch = unique_keys[start:start + SQLITE_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs and evict the least recently used overflow"""
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((key, int(vector.shape[0]), vector.tobytes(), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+
+    def embed(self, descriptions, embedding_function):
+        """Embed descriptions, computing only the ones not already cached
+
+        Returns a float32 array of shape (len(descriptions), dim) in input order.
+        """
+        keys = [self.key_for(d) for d in descriptions]
+        cached = self.get_many(keys)
+
+        missing = {}
+        for key, description in zip(keys, descriptions):
+            if key not in cached and key not in missing:
+                missing[key] = description
+
+        self.hits += len(keys) - sum(1 for key in keys if key in missing)
+        self.misses += len(missing)
+
+        if missing:
+            new_vectors = np.asarray(embedding_function(list(missing.values())), dtype=np.float32)
+            new_items = list(zip(missing.keys(), new_vectors))
+            self.put_many(new_items)
+            cached.update(new_items)
+
+        if not keys:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.vstack([cached[key] for key in keys]).astype(np.float32, copy=False)
+
+    def __len__(self):
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return count
+
+    def close(self):
+        """Close the underlying SQLite connection"""
+        with self._lock:
+            self._conn.close()
@@ -1,10 +1,9 @@
-import pandas as pd
+import os
+
 import numpy as np
 import faiss
-import chromadb
-from chromadb.utils import embedding_functions
-import re
-from collections import Counter
+from bulk_embedding import BulkEmbedder, limit_onnx_threads
+from keyword_categorizer import KEYWORD_FILE, UNCATEGORIZED, KeywordCategorizer
 
 # ============================================
 # CONFIGURATION
@@ -12,196 +11,60 @@ from collections import Counter
 CSV_FILE = "incidents.csv"  # Your CSV file in current directory
 SIMILARITY_THRESHOLD = 0.96  # 96% threshold
 TOP_K = 10  # Top 10 similar incidents
+EMBED_WORKERS = 0  # Embedding processes (0 = one per CPU core); the pipeline is built by
+                   # build_pipeline(), not at import, because spawned workers import this script
+ONNX_THREADS = 0  # ONNX Runtime intra-op threads per process (0 = cores / workers)
 
-print("="*60)
-print("🚀 INCIDENT CATEGORIZATION SYSTEM")
-print("Using ChromaDB Embeddings + FAISS Vector Search")
-print("="*60)
-
-# ============================================
-# STEP 1: LOAD CSV DATA
-# ============================================
-print("
-[STEP 1] Loading incident data from CSV...")
-try:
-    df = pd.read_csv(CSV_FILE)
-    print(f"✅ Successfully loaded {len(df)} incidents")
-    print(f"Columns: {list(df.columns)}")
-    print(f"
-First few records:")
-    print(df.head())
-except Exception as e:
-    print(f"❌ Error loading CSV: {e}")
-    exit()
-
-# Clean the data
-if 'Description' not in df.columns:
-    print("❌ 'Description' column not found in CSV")
-    exit()
-
-# Find category column
-category_col = None
-for col in ['Category', 'Tag', 'Type', 'Department', 'category', 'tag']:
-    if col in df.columns:
-        category_col = col
-        break
-
-if category_col:
-    print(f"✅ Found category column: '{category_col}'")
-else:
-    print("⚠️ No category column found. Will use index as category.")
-    df['Category'] = df.index
-    category_col = 'Category'
+_keyword_categorizer = None  # Compiled on first use
 
 # ============================================
-# STEP 2: INITIALIZE CHROMADB EMBEDDING
-# ============================================
-print("
-[STEP 2] Initializing ChromaDB Embedding Function...")
-try:
-    embedding_function = embedding_functions.DefaultEmbeddingFunction()
-    print("✅ ChromaDB DefaultEmbeddingFunction initialized")
-except Exception as e:
-    print(f"❌ Error initializing embedding function: {e}")
-    exit()
-
-# ============================================
-# STEP 3: GENERATE EMBEDDINGS
+# FUNCTION: SIMPLE KEYWORD-BASED CATEGORIZATION
 # ============================================
-print("
-[STEP 3] Generating embeddings for all incident descriptions...")
-try:
-    descriptions = df['Description'].fillna("").tolist()
-    
-    embeddings = embedding_function(descriptions)
-    embeddings_array = np.array(embeddings).astype('float32')
-    
-    print(f"✅ Generated {len(embeddings)} embeddings")
-    print(f"Embedding dimension: {embeddings_array.shape[1]}")
-except Exception as e:
-    print(f"❌ Error generating embeddings: {e}")
-    exit()
+def keyword_categorizer():
+    """The compiled keyword table: KEYWORD_FILE when present, else the built-in one (built once)"""
+    global _keyword_categorizer
+    if _keyword_categorizer is None:
+        if os.path.exists(KEYWORD_FILE):
+            _keyword_categorizer = KeywordCategorizer.from_file(KEYWORD_FILE)
+        else:
+            _keyword_categorizer = KeywordCategorizer()
+    return _keyword_categorizer
 
-# ============================================
-# STEP 4: CREATE FAISS INDEX
-# ============================================
-print("
-[STEP 4] Creating FAISS index for vector search...")
-try:
-    dimension = embeddings_array.shape[1]
-    
-    # Normalize for cosine similarity
-    faiss.normalize_L2(embeddings_array)
-    
-    # Create FAISS index
-    index = faiss.IndexFlatIP(dimension)
-    index.add(embeddings_array)
-    
-    print(f"✅ FAISS index created with {index.ntotal} vectors")
-    print(f"Index type: IndexFlatIP (Cosine Similarity)")
-except Exception as e:
-    print(f"❌ Error creating FAISS index: {e}")
-    exit()
 
-# ============================================
-# STEP 5: CHROMADB COLLECTION
-# ============================================
-print("
-[STEP 5] Storing data in ChromaDB collection...")
-try:
-    chroma_client = chromadb.Client()
-    
-    try:
-        chroma_client.delete_collection(name="incidents")
-    except:
-        pass
-    
-    collection = chroma_client.create_collection(
-        name="incidents",
-        embedding_function=embedding_function,
-        metadata={"hnsw:space": "cosine"}
-    )
-    
-    ids = [str(i) for i in range(len(df))]
-    metadatas = []
-    
-    for idx, row in df.iterrows():
-        metadata = {
-            "incident_id": str(row.get('IncidentID', idx)),
-            "date": str(row.get('Date', '')),
-            "category": str(row[category_col])
-        }
-        metadatas.append(metadata)
-    
-    collection.add(
-        documents=descriptions,
-        metadatas=metadatas,
-        ids=ids
-    )
-    
-    print(f"✅ Stored {len(descriptions)} incidents in ChromaDB")
-except Exception as e:
-    print(f"⚠️ ChromaDB storage warning: {e}")
-
-# ============================================
-# FUNCTION: SIMPLE KEYWORD-BASED CATEGORIZATION
-# ============================================
 def categorize_with_keywords(description):
     """Simple rule-based categorization using keywords"""
-    print("
-[GENAI] Generating category using keyword analysis...")
-    
-    description_lower = description.lower()
-    
-    # Define keyword categories
-    categories = {
-        'IT': ['server', 'network', 'computer', 'software', 'database', 'system', 'crash', 'connectivity', 'internet'],
-        'Safety': ['fire', 'alarm', 'emergency', 'evacuation', 'injury', 'accident', 'hazard'],
-        'Facilities': ['power', 'outage', 'water', 'leakage', 'hvac', 'heating', 'cooling', 'building', 'maintenance'],
-        'Hardware': ['equipment', 'device', 'machine', 'hardware', 'printer', 'monitor', 'keyboard'],
-        'Security': ['breach', 'unauthorized', 'access', 'theft', 'intrusion', 'lock', 'camera'],
-        'HR': ['employee', 'staff', 'personnel', 'leave', 'attendance', 'payroll'],
-    }
-    
-    # Count keyword matches
-    scores = {}
-    for category, keywords in categories.items():
-        score = sum(1 for keyword in keywords if keyword in description_lower)
-        if score > 0:
-            scores[category] = score
+    print("\n[GENAI] Generating category using keyword analysis...")
     
-    # Get category with highest score
-    if scores:
-        category = max(scores, key=scores.get)
-        print(f"✅ Generated category: {category} (matched {scores[category]} keywords)")
-        return category
+    category, n_matched = keyword_categorizer().categorize(description)
+    if n_matched:
+        print(f"✅ Generated category: {category} (matched {n_matched} keywords)")
+    elif category == UNCATEGORIZED:
+        print(f"✅ Generated category: Uncategorized")
     else:
-        # Extract main nouns as category
-        words = re.findall(r'\b[a-zA-Z]+\b', description)
-        if len(words) > 0:
-            # Use most common word
-            common_words = Counter(words).most_common(3)
-            category = common_words[0][0].capitalize()
-            print(f"✅ Generated category: {category} (from text analysis)")
-            return category
-        else:
-            print(f"✅ Generated category: Uncategorized")
-            return "Uncategorized"
+        print(f"✅ Generated category: {category} (from text analysis)")
+    return category
+
+
+def categorize_many_with_keywords(descriptions):
+    """Keyword categories of a whole column of descriptions, scanned in one pass"""
+    return [category for category, _ in keyword_categorizer().categorize_many(descriptions)]
 
 # ============================================
 # MAIN FUNCTION: PROCESS NEW INCIDENT
 # ============================================
-def process_new_incident(new_description):
-    """Process new incident and assign category"""
-    print("
-" + "="*60)
+def process_new_incident(new_description, df, category_col, embedding_function, index):
+    """Process new incident and assign category
+
+    df, category_col, embedding_function and index are what
+    build_pipeline() returns.
+    """
+    print("\n" + "="*60)
     print("🔍 PROCESSING NEW INCIDENT")
     print("="*60)
     print(f"Description: {new_description}")
     
     # Generate embedding
-    print("
-[VECTOR] Generating embedding for new incident...")
+    print("\n[VECTOR] Generating embedding for new incident...")
     try:
         new_embedding = embedding_function([new_description])
         new_embedding_array = np.array(new_embedding).astype('float32')
@@ -212,16 +75,14 @@ def process_new_incident(new_description):
         return None
     
     # FAISS search
-    print(f"
-[SEARCH] Finding top {TOP_K} similar incidents using FAISS...")
+    print(f"\n[SEARCH] Finding top {TOP_K} similar incidents using FAISS...")
     try:
         scores, indices = index.search(new_embedding_array, TOP_K)
         scores = scores[0]
         indices = indices[0]
         
         print(f"✅ Found {len(indices)} similar incidents")
-        print("
-📊 TOP 10 SIMILAR INCIDENTS:")
+        print("\n📊 TOP 10 SIMILAR INCIDENTS:")
         print("-" * 60)
         
         similar_incidents = []
@@ -249,13 +110,11 @@ def process_new_incident(new_description):
     
     # Calculate average similarity
     avg_similarity = np.mean(scores) * 100
-    print(f"
-[ANALYSIS] Average Similarity Score: {avg_similarity:.2f}%")
+    print(f"\n[ANALYSIS] Average Similarity Score: {avg_similarity:.2f}%")
     print(f"Threshold: {SIMILARITY_THRESHOLD * 100}%")
     
     # Decision
-    print("
-[DECISION] Making categorization decision...")
+    print("\n[DECISION] Making categorization decision...")
     
     if avg_similarity >= (SIMILARITY_THRESHOLD * 100):
         # Use existing category
@@ -274,8 +133,7 @@ def process_new_incident(new_description):
         method = "Generated Category"
     
     # Final result
-    print("
-" + "="*60)
+    print("\n" + "="*60)
     print("✨ FINAL RESULT")
     print("="*60)
     print(f"New Incident: {new_description}")
@@ -292,33 +150,181 @@ def process_new_incident(new_description):
         'method': method
     }
 
+
 # ============================================
-# STEP 6: USER INPUT
+# PIPELINE: LOAD, EMBED AND INDEX THE CSV
 # ============================================
-print("
+def build_pipeline(csv_file=CSV_FILE):
+    """Load the CSV, embed every description and index them
 
-" + "="*60)
-print("🎯 READY FOR NEW INCIDENT INPUT")
-print("="*60)
+    Returns (df, category_col, embedding_function, index), the state
+    process_new_incident searches.
+    """
+    # Only the pipeline needs these; importing this module (or a spawned embedding worker) skips them
+    import pandas as pd
+    import chromadb
+    from chromadb.utils import embedding_functions
 
-print("
-Enter new incident description (or 'quit' to exit):")
-while True:
-    user_input = input("
->>> ").strip()
-    
-    if user_input.lower() in ['quit', 'exit', 'q']:
-        print("
-👋 Exiting system. Goodbye!")
-        break
-    
-    if not user_input:
-        print("⚠️ Please enter a valid description")
-        continue
-    
-    # Process the incident
-    result = process_new_incident(user_input)
-    
-    print("
-" + "-"*60)
-    print("Enter another incident description (or 'quit' to exit):")
\ No newline at end of file
+    # ============================================
+    # STEP 1: LOAD CSV DATA
+    # ============================================
+    print("\n[STEP 1] Loading incident data from CSV...")
+    try:
+        df = pd.read_csv(csv_file)
+        print(f"✅ Successfully loaded {len(df)} incidents")
+        print(f"Columns: {list(df.columns)}")
+        print(f"\nFirst few records:")
+        print(df.head())
+    except Exception as e:
+        print(f"❌ Error loading CSV: {e}")
+        exit()
+
+    # Clean the data
+    if 'Description' not in df.columns:
+        print("❌ 'Description' column not found in CSV")
+        exit()
+
+    # Find category column
+    category_col = None
+    for col in ['Category', 'Tag', 'Type', 'Department', 'category', 'tag']:
+        if col in df.columns:
+            category_col = col
+            break
+
+    if category_col:
+        print(f"✅ Found category column: '{category_col}'")
+    else:
+        print("⚠️ No category column found. Will use index as category.")
+        df['Category'] = df.index
+        category_col = 'Category'
+
+    # ============================================
+    # STEP 2: INITIALIZE CHROMADB EMBEDDING
+    # ============================================
+    print("\n[STEP 2] Initializing ChromaDB Embedding Function...")
+    try:
+        limit_onnx_threads(ONNX_THREADS)
+        embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        bulk_embedder = BulkEmbedder(embedding_function, workers=EMBED_WORKERS, onnx_threads=ONNX_THREADS)
+        print("✅ ChromaDB DefaultEmbeddingFunction initialized")
+        print(f"Bulk embedding: {bulk_embedder.describe()}")
+    except Exception as e:
+        print(f"❌ Error initializing embedding function: {e}")
+        exit()
+
+    # ============================================
+    # STEP 3: GENERATE EMBEDDINGS
+    # ============================================
+    print("\n[STEP 3] Generating embeddings for all incident descriptions...")
+    try:
+        descriptions = df['Description'].fillna("").tolist()
+
+        embeddings = bulk_embedder(descriptions)
+        bulk_embedder.close()
+        embeddings_array = np.array(embeddings).astype('float32')
+
+        print(f"✅ Generated {len(embeddings)} embeddings")
+        print(f"Embedding dimension: {embeddings_array.shape[1]}")
+    except Exception as e:
+        print(f"❌ Error generating embeddings: {e}")
+        exit()
+
+    # ============================================
+    # STEP 4: CREATE FAISS INDEX
+    # ============================================
+    print("\n[STEP 4] Creating FAISS index for vector search...")
+    try:
+        dimension = embeddings_array.shape[1]
+
+        # Normalize for cosine similarity
+        faiss.normalize_L2(embeddings_array)
+
+        # Create FAISS index
+        index = faiss.IndexFlatIP(dimension)
+        index.add(embeddings_array)
+
+        print(f"✅ FAISS index created with {index.ntotal} vectors")
+        print(f"Index type: IndexFlatIP (Cosine Similarity)")
+    except Exception as e:
+        print(f"❌ Error creating FAISS index: {e}")
+        exit()
+
+    # ============================================
+    # STEP 5: CHROMADB COLLECTION
+    # ============================================
+    print("\n[STEP 5] Storing data in ChromaDB collection...")
+    try:
+        chroma_client = chromadb.Client()
+
+        try:
+            chroma_client.delete_collection(name="incidents")
+        except:
+            pass
+
+        collection = chroma_client.create_collection(
+            name="incidents",
+            embedding_function=embedding_function,
+            metadata={"hnsw:space": "cosine"}
+        )
+
+        ids = [str(i) for i in range(len(df))]
+        metadatas = []
+
+        for idx, row in df.iterrows():
+            metadata = {
+                "incident_id": str(row.get('IncidentID', idx)),
+                "date": str(row.get('Date', '')),
+                "category": str(row[category_col])
+            }
+            metadatas.append(metadata)
+
+        collection.add(
+            documents=descriptions,
+            metadatas=metadatas,
+            ids=ids
+        )
+
+        print(f"✅ Stored {len(descriptions)} incidents in ChromaDB")
+    except Exception as e:
+        print(f"⚠️ ChromaDB storage warning: {e}")
+
+    return df, category_col, embedding_function, index
+
+
+def main():
+    """Command-line entry point: build the pipeline, then categorize incidents typed at the prompt"""
+    print("="*60)
+    print("🚀 INCIDENT CATEGORIZATION SYSTEM")
+    print("Using ChromaDB Embeddings + FAISS Vector Search")
+    print("="*60)
+
+    df, category_col, embedding_function, index = build_pipeline()
+
+    # ============================================
+    # STEP 6: USER INPUT
+    # ============================================
+    print("\n\n" + "="*60)
+    print("🎯 READY FOR NEW INCIDENT INPUT")
+    print("="*60)
+
+    print("\nEnter new incident description (or 'quit' to exit):")
+    while True:
+        user_input = input("\n>>> ").strip()
+
+        if user_input.lower() in ['quit', 'exit', 'q']:
+            print("\n👋 Exiting system. Goodbye!")
+            break
+
+        if not user_input:
+            print("⚠️ Please enter a valid description")
+            continue
+
+        # Process the incident
+        result = process_new_incident(user_input, df, category_col, embedding_function, index)
+
+        print("\n" + "-"*60)
+        print("Enter another incident description (or 'quit' to exit):")
+
+
+if __name__ == "__main__":
+    main()
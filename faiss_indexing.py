@@ -0,0 +1,574 @@
+import time
+
+import numpy as np
+import faiss
+
+from category_prefilter import CategoryPrefilter
+from voting import vote
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+SIMILARITY_THRESHOLD = 0.96  # 96% threshold
+TOP_K = 10  # Top 10 similar incidents
+
+# Index types: exact brute force, or approximate (IVF-flat, HNSW, IVF-PQ)
+INDEX_SPECS = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+INDEX_SPEC = "flat"
+NPROBE = 16  # IVF lists visited per query
+EF_SEARCH = 64  # HNSW candidate list size at query time
+HNSW_M = 32  # HNSW graph degree
+PQ_M = 16  # IVF-PQ sub-quantizers (must divide the embedding dimension)
+PQ_NBITS = 8  # IVF-PQ bits per sub-quantizer code
+
+# How flat / ivf_flat / hnsw store vectors: full float32, float16 or 8-bit scalar quantized
+STORAGE_PRECISIONS = ("float32", "float16", "int8")
+STORAGE_PRECISION = "float32"
+SQ_CODECS = {"float32": "Flat", "float16": "SQfp16", "int8": "SQ8"}
+KEEP_EMBEDDINGS = False  # Keep the dense float32 matrix alongside the index after building
+
+# "knn": always the top_k nearest neighbors; "range": only neighbors above a similarity radius,
+# at most top_k of them (a query with none goes straight to the AI fallback)
+SEARCH_MODES = ("knn", "range")
+SEARCH_MODE = "knn"
+RANGE_RADIUS = None  # Similarity radius of range mode (None = the similarity threshold)
+
+
+class FAISSIndexer:
+    """Handles FAISS index creation and vector search"""
+    
+    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD, top_k=TOP_K, index_spec=INDEX_SPEC,
+                 nlist=None, nprobe=NPROBE, hnsw_m=HNSW_M, ef_search=EF_SEARCH,
+                 pq_m=PQ_M, pq_nbits=PQ_NBITS, storage_precision=STORAGE_PRECISION,
+                 keep_embeddings=KEEP_EMBEDDINGS, search_mode=SEARCH_MODE, radius=RANGE_RADIUS):
+        if index_spec not in INDEX_SPECS:
+            raise ValueError(f"Unknown index spec '{index_spec}' (choose from {', '.join(INDEX_SPECS)})")
+        if storage_precision not in STORAGE_PRECISIONS:
+            raise ValueError(f"Unknown storage precision '{storage_precision}' "
+                             f"(choose from {', '.join(STORAGE_PRECISIONS)})")
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{search_mode}' (choose from {', '.join(SEARCH_MODES)})")
+        if index_spec == "ivf_pq" and storage_precision != "float32":
+            raise ValueError("ivf_pq vectors are already PQ codes; storage_precision applies to "
+                             "flat, ivf_flat and hnsw")
+        self.index = None
+        self.embeddings_array = None
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.index_spec = index_spec
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.hnsw_m = hnsw_m
+        self.ef_search = ef_search
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.storage_precision = storage_precision
+        self.keep_embeddings = keep_embeddings
+        self.search_mode = search_mode
+        self.radius = radius
+        self.tombstones = set()
+        self.prefilter = None  # CategoryPrefilter, when built with build_prefilter()
+        self._search_params = None
+        self._selector = None
+    
+    def build_params(self):
+        """Parameters that determine the index contents (anything else is query-time)"""
+        params = {"index_spec": self.index_spec, "storage_precision": self.storage_precision}
+        if self.index_spec in ("ivf_flat", "ivf_pq"):
+            params["nlist"] = self.nlist
+        if self.index_spec == "hnsw":
+            params["hnsw_m"] = self.hnsw_m
+        if self.index_spec == "ivf_pq":
+            params["pq_m"] = self.pq_m
+            params["pq_nbits"] = self.pq_nbits
+        return params
+    
+    def factory_string(self, n_vectors):
+        """FAISS index_factory description for this spec and corpus size"""
+        codec = SQ_CODECS[self.storage_precision]
+        if self.index_spec == "flat":
+            return codec
+        if self.index_spec == "hnsw":
+            return f"HNSW{self.hnsw_m}" if codec == "Flat" else f"HNSW{self.hnsw_m},{codec}"
+        # ~4*sqrt(n) lists, with at least 39 training points per list
+        nlist = self.nlist or int(4 * np.sqrt(n_vectors))
+        nlist = max(1, min(nlist, n_vectors // 39 or 1))
+        if self.index_spec == "ivf_flat":
+            return f"IVF{nlist},{codec}"
+        return f"IVF{nlist},PQ{self.pq_m}x{self.pq_nbits}"
+    
+    def new_index(self, dimension, n_vectors):
+        """Create an empty (untrained) index for this spec"""
+        if self.index_spec == "ivf_pq" and dimension % self.pq_m:
+            raise ValueError(f"pq_m={self.pq_m} must divide the embedding dimension {dimension}")
+        index = faiss.index_factory(dimension, self.factory_string(n_vectors), faiss.METRIC_INNER_PRODUCT)
+        if self.index_spec == "hnsw":
+            index.hnsw.efConstruction = max(40, self.hnsw_m * 2)
+        return index
+    
+    def apply_search_params(self):
+        """Apply query-time knobs (nprobe / efSearch) to the current index"""
+        if self.index is None:
+            return
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            ivf.nprobe = min(self.nprobe, ivf.nlist)
+        hnsw_index = faiss.downcast_index(self.index)
+        if hasattr(hnsw_index, "hnsw"):
+            hnsw_index.hnsw.efSearch = max(self.ef_search, self.top_k)
+        self._update_search_params()
+    
+    def _update_search_params(self):
+        """Rebuild the per-search parameters that filter out tombstoned ids"""
+        if not self.tombstones or self.index is None:
+            self._search_params = None
+            self._selector = None
+            return
+        removed = faiss.IDSelectorBatch(np.fromiter(sorted(self.tombstones), dtype='int64'))
+        selector = faiss.IDSelectorNot(removed)
+        # IDSelectorNot only borrows `removed`; keep both alive with the params
+        self._selector = (removed, selector)
+        self._search_params = self._params_with(selector)
+    
+    def _params_with(self, selector):
+        """Search parameters of this index type that filter ids through selector"""
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            return faiss.SearchParametersIVF(sel=selector, nprobe=min(self.nprobe, ivf.nlist))
+        if hasattr(faiss.downcast_index(self.index), "hnsw"):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(self.ef_search, self.top_k))
+        return faiss.SearchParameters(sel=selector)
+    
+    def describe(self):
+        """One-line description of the index and its search parameters"""
+        if self.index is None:
+            return f"{self.index_spec} (not built)"
+        text = f"{type(faiss.downcast_index(self.index)).__name__} ({self.index_spec}, cosine"
+        text += ")" if self.index_spec == "ivf_pq" else f", {self.storage_precision})"
+        if faiss.try_extract_index_ivf(self.index) is not None:
+            text += f", nprobe={self.nprobe}"
+        if self.index_spec == "hnsw":
+            text += f", efSearch={self.ef_search}"
+        if self.search_mode == "range":
+            text += f", range >= {self.get_radius():.2f} (max {self.top_k})"
+        return text
+        
+    def create_index(self, embeddings):
+        """Create FAISS index from embeddings"""
+        print("\n[STEP 4] Creating FAISS index for vector search...")
+        try:
+            # Convert to numpy array
+            self.embeddings_array = np.array(embeddings).astype('float32')
+            
+            # Normalize for cosine similarity
+            faiss.normalize_L2(self.embeddings_array)
+            
+            # Create FAISS index (approximate specs are trained on the corpus first)
+            n_vectors, dimension = self.embeddings_array.shape
+            self.index = self.new_index(dimension, n_vectors)
+            if not self.index.is_trained:
+                self.index.train(self.embeddings_array)
+            self.index.add(self.embeddings_array)
+            self.tombstones = set()
+            self.apply_search_params()
+            
+            print(f"✅ FAISS index created with {self.index.ntotal} vectors")
+            print(f"Index type: {self.describe()}")
+            
+            return self.index
+            
+        except Exception as e:
+            print(f"❌ Error creating FAISS index: {e}")
+            exit()
+    
+    def begin_index(self, dimension, n_vectors):
+        """Start an empty index sized for about n_vectors, filled in chunks with add_normalized()"""
+        self.index = self.new_index(dimension, n_vectors)
+        self.embeddings_array = None
+        self.tombstones = set()
+        return self.index
+    
+    def training_size(self, minimum):
+        """Training vectors to collect before the first add (0 when no training is needed)"""
+        if self.index.is_trained:
+            return 0
+        size = minimum
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is not None:
+            size = max(size, 39 * ivf.nlist)
+        if self.index_spec == "ivf_pq":
+            size = max(size, 39 * (1 << self.pq_nbits))
+        return size
+    
+    def train_index(self, vectors):
+        """Train the index on already-normalized vectors"""
+        self.index.train(np.ascontiguousarray(vectors, dtype='float32'))
+    
+    def add_normalized(self, vectors):
+        """Append already-normalized float32 vectors (no copy, no re-normalization)"""
+        self.index.add(vectors)
+    
+    def finish_index(self, embeddings_array=None):
+        """Finish an index built with begin_index() and make it searchable"""
+        self.embeddings_array = embeddings_array
+        self.apply_search_params()
+        print(f"✅ FAISS index created with {self.index.ntotal} vectors")
+        print(f"Index type: {self.describe()}")
+        return self.index
+    
+    def set_index(self, index, embeddings_array=None):
+        """Use a prebuilt (e.g. loaded from disk) FAISS index"""
+        self.index = index
+        self.embeddings_array = embeddings_array
+        self.apply_search_params()
+        return self.index
+    
+    def release_embeddings(self):
+        """Drop the dense float32 matrix once the index is built, unless keep_embeddings
+        
+        The index already holds every vector (at storage_precision), so the
+        matrix is a second full-precision copy that the query path never
+        reads; keep it only for reports that need the exact vectors.
+        """
+        if not self.keep_embeddings:
+            self.embeddings_array = None
+    
+    def add_vectors(self, embeddings):
+        """Append vectors to the live index without a rebuild
+        
+        Ids are positional and stable: new vectors get ids ntotal, ntotal+1, ...
+        which line up with rows appended to DatabaseConfig.
+        """
+        vectors = np.array(embeddings).astype('float32').reshape(-1, self.index.d)
+        faiss.normalize_L2(vectors)
+        self._make_writable()
+        start = self.index.ntotal
+        self.index.add(vectors)
+        # The dense matrix no longer mirrors the index once rows are appended online
+        self.embeddings_array = None
+        return np.arange(start, start + len(vectors), dtype='int64')
+    
+    def _make_writable(self):
+        """Copy memory-mapped (read-only) IVF lists into RAM before the first online add"""
+        ivf = faiss.try_extract_index_ivf(self.index)
+        if ivf is None or type(faiss.downcast_InvertedLists(ivf.invlists)).__name__ != "OnDiskInvertedLists":
+            return
+        source = ivf.invlists
+        lists = faiss.ArrayInvertedLists(ivf.nlist, ivf.code_size)
+        for list_no in range(ivf.nlist):
+            size = source.list_size(list_no)
+            if size:
+                lists.add_entries(list_no, size, source.get_ids(list_no), source.get_codes(list_no))
+        ivf.replace_invlists(lists, True)
+        lists.this.disown()
+    
+    def remove_ids(self, ids):
+        """Tombstone ids so searches skip them (ids of the other vectors stay unchanged)"""
+        self.tombstones.update(int(i) for i in ids)
+        self._update_search_params()
+    
+    def search_similar(self, query_embedding):
+        """Search for similar incidents using FAISS"""
+        scores, indices = self.search_batch([query_embedding])
+        if scores is None:
+            return None, None
+        return scores[0], indices[0]
+    
+    def search_batch(self, query_embeddings):
+        """Search for the top K neighbors of every row of query_embeddings at once
+        
+        Returns (scores, indices), each of shape (n_queries, top_k). In range
+        mode rows hold only the neighbors within the radius; the rest of a
+        row is padding (index -1), as for a missing kNN neighbor.
+        """
+        try:
+            # Convert to numpy array and normalize
+            query_array = np.array(query_embeddings).astype('float32')
+            faiss.normalize_L2(query_array)
+            
+            # Search
+            return self.search_normalized(query_array)
+            
+        except Exception as e:
+            print(f"❌ Error during search: {e}")
+            return None, None
+    
+    def search_normalized(self, query_array, k=None):
+        """Search already-normalized float32 queries (no copy, no error handling)
+        
+        An explicit k always asks for the k nearest neighbors; otherwise the
+        search follows search_mode.
+        """
+        if k is None and self.search_mode == "range":
+            return self.search_range(query_array)
+        return self.index.search(query_array, k or self.top_k, params=self._search_params)
+    
+    def search_range(self, query_array, radius=None, max_neighbors=None, params=None):
+        """Neighbors of normalized queries with similarity above radius, the best max_neighbors of each
+        
+        Padded to (n_queries, max_neighbors) like a kNN result (see
+        pad_range_result), so voting and lookups take either.
+        """
+        radius = self.get_radius() if radius is None else radius
+        params = self._search_params if params is None else params
+        lims, distances, labels = self.index.range_search(query_array, radius, params=params)
+        return pad_range_result(lims, distances, labels, max_neighbors or self.top_k)
+    
+    def build_prefilter(self, category_codes, n_categories, embeddings=None, **prefilter_params):
+        """Precompute the per-category centroids of the two-stage search (see CategoryPrefilter)
+        
+        Uses `embeddings` or the dense matrix kept from the build, so call
+        it before release_embeddings().
+        """
+        embeddings = self.embeddings_array if embeddings is None else embeddings
+        if embeddings is None:
+            raise ValueError("build_prefilter needs the corpus embeddings")
+        self.prefilter = CategoryPrefilter(**prefilter_params).build(embeddings, category_codes, n_categories)
+        print(f"✅ Category prefilter: {self.prefilter.describe()}")
+        return self.prefilter
+    
+    def search_restricted(self, query_array, categories, category_codes):
+        """Search normalized queries among the rows whose category is in `categories` only"""
+        bitmap = self.prefilter.selector_bitmap(categories, category_codes)
+        # Selectors only borrow the bitmap and each other; all stay referenced until the search returns
+        in_categories = faiss.IDSelectorBitmap(len(category_codes), faiss.swig_ptr(bitmap))
+        selector = in_categories
+        if self._selector is not None:
+            selector = faiss.IDSelectorAnd(in_categories, self._selector[1])
+        if self.search_mode == "range":
+            return self.search_range(query_array, params=self._params_with(selector))
+        return self.index.search(query_array, self.top_k, params=self._params_with(selector))
+    
+    def get_threshold(self):
+        """Get similarity threshold"""
+        return self.similarity_threshold
+    
+    def get_top_k(self):
+        """Get top K value"""
+        return self.top_k
+    
+    def get_radius(self):
+        """Similarity radius of range mode (the threshold unless set)"""
+        return self.similarity_threshold if self.radius is None else self.radius
+
+
+def pad_range_result(lims, distances, labels, max_neighbors):
+    """Turn a FAISS range_search result into padded (scores, indices) of shape (n_queries, max_neighbors)
+    
+    Each query keeps its max_neighbors most similar hits, best first; the
+    remaining slots are index -1 with the lowest float32 score, which is
+    what a kNN search returns when it runs out of neighbors.
+    """
+    lims = np.asarray(lims, dtype=np.int64)
+    n_queries = len(lims) - 1
+    counts = np.diff(lims)
+    queries = np.repeat(np.arange(n_queries), counts)
+    order = np.lexsort((-distances, queries))
+    ranks = np.arange(len(order)) - np.repeat(lims[:-1], counts)
+    keep = ranks < max_neighbors
+    scores = np.full((n_queries, max_neighbors), -np.finfo(np.float32).max, dtype=np.float32)
+    indices = np.full((n_queries, max_neighbors), -1, dtype=np.int64)
+    scores[queries[keep], ranks[keep]] = distances[order][keep]
+    indices[queries[keep], ranks[keep]] = labels[order][keep]
+    return scores, indices
+
+
+def save_faiss_index(indexer, filepath="faiss_index.bin"):
+    """Save FAISS index to disk (optional - for production reuse)"""
+    try:
+        faiss.write_index(indexer.index, filepath)
+        print(f"✅ FAISS index saved to {filepath}")
+    except Exception as e:
+        print(f"⚠️ Error saving FAISS index: {e}")
+
+
+def load_faiss_index(filepath="faiss_index.bin", mmap=False):
+    """Load FAISS index from disk (optional - for production reuse)
+    
+    With mmap=True the index data is memory-mapped read-only instead of
+    being copied into RAM.
+    """
+    try:
+        if mmap:
+            index = faiss.read_index(filepath, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = faiss.read_index(filepath)
+        print(f"✅ FAISS index loaded from {filepath}")
+        return index
+    except Exception as e:
+        print(f"⚠️ Error loading FAISS index: {e}")
+        return None
+
+
+# ============================================
+# INDEX QUALITY REPORT
+# ============================================
+def index_quality_report(embeddings, category_codes, n_categories, specs, top_k=TOP_K,
+                         similarity_threshold=SIMILARITY_THRESHOLD, n_queries=1000,
+                         strategies=("frequency", "weighted"), seed=0, **index_params):
+    """Compare approximate index specs against the exact flat index on the loaded corpus
+
+    A sample of corpus vectors is used as queries. For every spec this
+    measures build time, per-query latency (batched and single-query p50),
+    recall@k of the neighbor ids, and how often the voted category and the
+    final vector-search-vs-AI decision agree with the flat index.
+    Returns one dict per spec (the first row is the flat baseline).
+    """
+    embeddings = np.array(embeddings, dtype='float32')
+    faiss.normalize_L2(embeddings)
+    category_codes = np.asarray(category_codes)
+
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[query_rows]
+    threshold_percent = similarity_threshold * 100
+
+    def evaluate(spec):
+        indexer = FAISSIndexer(similarity_threshold, top_k, index_spec=spec, **index_params)
+        start = time.perf_counter()
+        n_vectors, dimension = embeddings.shape
+        indexer.index = indexer.new_index(dimension, n_vectors)
+        if not indexer.index.is_trained:
+            indexer.index.train(embeddings)
+        indexer.index.add(embeddings)
+        indexer.apply_search_params()
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scores, indices = indexer.index.search(queries, top_k)
+        batch_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        single_ms = []
+        for query in queries[:200]:
+            start = time.perf_counter()
+            indexer.index.search(query[None, :], top_k)
+            single_ms.append((time.perf_counter() - start) * 1000)
+
+        neighbor_codes = np.where(indices >= 0, category_codes[np.clip(indices, 0, None)], -1)
+        _, votes = vote(scores, neighbor_codes, n_categories, strategies=strategies)
+        return indexer, scores, indices, votes, build_seconds, batch_ms, float(np.median(single_ms))
+
+    evaluations = {spec: evaluate(spec) for spec in ("flat",) + tuple(s for s in specs if s != "flat")}
+    _, _, ref_indices, ref_votes, _, _, _ = evaluations["flat"]
+
+    report = []
+    for spec, (indexer, scores, indices, votes, build_seconds, batch_ms, single_p50_ms) in evaluations.items():
+        overlap = [len(np.intersect1d(row, ref_row)) for row, ref_row in zip(indices, ref_indices)]
+        row = {
+            "spec": spec,
+            "index": indexer.describe(),
+            "build_seconds": build_seconds,
+            "batch_ms_per_query": batch_ms,
+            "single_query_p50_ms": single_p50_ms,
+            f"recall@{top_k}": float(np.mean(overlap)) / top_k,
+        }
+        for name, result in votes.items():
+            same_winner, same_decision = vote_agreement(result, ref_votes[name], threshold_percent)
+            row[f"{name}_vote_agreement"] = float(np.mean(same_winner))
+            row[f"{name}_decision_agreement"] = float(np.mean(same_decision))
+        report.append(row)
+
+    return report
+
+
+def vote_agreement(result, ref, threshold_percent):
+    """Per-query (same winner, same final decision) of a vote result against a reference vote
+
+    The decision agrees when both accept the same category by vector
+    search, or both fall back to AI categorization.
+    """
+    same_winner = result['winner'] == ref['winner']
+    accepted = result['decision_similarity'] >= threshold_percent
+    ref_accepted = ref['decision_similarity'] >= threshold_percent
+    return same_winner, (accepted == ref_accepted) & (~accepted | same_winner)
+
+
+def print_index_quality_report(report, title="INDEX RECALL / LATENCY REPORT (vs exact flat index)"):
+    """Print index_quality_report() rows as a table"""
+    print("\n" + "="*60)
+    print(f"📊 {title}")
+    print("="*60)
+    for row in report:
+        print(f"\n{row['spec']}: {row['index']}")
+        for key, value in row.items():
+            if key in ("spec", "index"):
+                continue
+            if key.endswith("agreement") or key.startswith("recall"):
+                print(f"   • {key}: {value * 100:.2f}%")
+            elif isinstance(value, int):
+                print(f"   • {key}: {value}")
+            else:
+                print(f"   • {key}: {value:.4f}")
+
+
+# ============================================
+# STORAGE PRECISION ACCURACY REPORT
+# ============================================
+def precision_accuracy_report(embeddings, category_codes, n_categories, precisions, index_spec="flat",
+                              top_k=TOP_K, similarity_threshold=SIMILARITY_THRESHOLD, n_queries=None,
+                              strategies=("frequency", "weighted"), batch_rows=4096, seed=0, **index_params):
+    """Compare reduced-precision storage against float32 for one index spec
+
+    Every corpus vector is used as a query (or a sample of n_queries).
+    For every precision this reports the index size, recall@k of the
+    neighbor ids, top-1 agreement, mean absolute score error, and how often
+    the voted category and the final vector-search-vs-AI decision agree
+    with the float32 index. Queries run batch_rows at a time, so only one
+    block of results is held per precision. Returns one dict per
+    precision (the first row is the float32 baseline).
+    """
+    embeddings = np.array(embeddings, dtype='float32')
+    faiss.normalize_L2(embeddings)
+    category_codes = np.asarray(category_codes)
+    threshold_percent = similarity_threshold * 100
+    n_vectors, dimension = embeddings.shape
+    query_rows = np.arange(n_vectors)
+    if n_queries is not None and n_queries < n_vectors:
+        query_rows = np.sort(np.random.default_rng(seed).choice(n_vectors, size=n_queries, replace=False))
+
+    indexers = {}
+    for precision in ("float32",) + tuple(p for p in precisions if p != "float32"):
+        indexer = FAISSIndexer(similarity_threshold, top_k, index_spec=index_spec,
+                               storage_precision=precision, **index_params)
+        indexer.index = indexer.new_index(dimension, n_vectors)
+        if not indexer.index.is_trained:
+            indexer.index.train(embeddings)
+        indexer.index.add(embeddings)
+        indexer.apply_search_params()
+        indexers[precision] = indexer
+
+    totals = {precision: {} for precision in indexers}
+    for start in range(0, len(query_rows), batch_rows):
+        queries = embeddings[query_rows[start:start + batch_rows]]
+        results = {}
+        for precision, indexer in indexers.items():
+            scores, indices = indexer.index.search(queries, top_k)
+            neighbor_codes = np.where(indices >= 0, category_codes[np.clip(indices, 0, None)], -1)
+            _, votes = vote(scores, neighbor_codes, n_categories, strategies=strategies)
+            results[precision] = scores, indices, votes
+        ref_scores, ref_indices, ref_votes = results["float32"]
+        for precision, (scores, indices, votes) in results.items():
+            sums = totals[precision]
+            overlap = [len(np.intersect1d(row, ref_row)) for row, ref_row in zip(indices, ref_indices)]
+            sums[f"recall@{top_k}"] = sums.get(f"recall@{top_k}", 0) + sum(overlap) / top_k
+            sums["top1_agreement"] = sums.get("top1_agreement", 0) + np.sum(indices[:, 0] == ref_indices[:, 0])
+            sums["mean_score_error"] = sums.get("mean_score_error", 0) + np.abs(scores - ref_scores).mean(axis=1).sum()
+            for name, result in votes.items():
+                same_winner, same_decision = vote_agreement(result, ref_votes[name], threshold_percent)
+                sums[f"{name}_vote_agreement"] = sums.get(f"{name}_vote_agreement", 0) + np.sum(same_winner)
+                sums[f"{name}_decision_agreement"] = sums.get(f"{name}_decision_agreement", 0) + np.sum(same_decision)
+
+    report = []
+    for precision, indexer in indexers.items():
+        index_bytes = len(faiss.serialize_index(indexer.index))
+        row = {
+            "spec": precision,
+            "index": indexer.describe(),
+            "index_mb": index_bytes / 2**20,
+            "bytes_per_vector": index_bytes / max(1, n_vectors),
+            "n_queries": len(query_rows),
+        }
+        row.update({key: float(value) / max(1, len(query_rows)) for key, value in totals[precision].items()})
+        report.append(row)
+    return report
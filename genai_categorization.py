@@ -0,0 +1,109 @@
+def ai_categorization(description, verbose=True):
+    """
+    AI-based categorization function
+    TODO: Add your AI model here (OpenAI, Ollama, Azure OpenAI, etc.)
+    
+    Args:
+        description (str): Incident description text
+        verbose (bool): Print progress messages
+    
+    Returns:
+        str: Assigned category/tag
+    
+    Example implementation with OpenAI:
+    ------------------------------------
+    from openai import OpenAI
+    
+    client = OpenAI(api_key="your-api-key")
+    
+    prompt = f'''
+    You are an incident categorization AI. Analyze the following incident 
+    description and assign the most appropriate category.
+    
+    Incident: {description}
+    
+    Return only the category name, nothing else.
+    '''
+    
+    response = client.chat.completions.create(
+        model="gpt-4",
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.3
+    )
+    
+    return response.choices[0].message.content.strip()
+    """
+    
+    if verbose:
+        print("\n[AI] Calling AI categorization function...")
+        print("⚠️ AI categorization not implemented yet (placeholder)")
+    
+    # Placeholder - will be implemented later
+    # Add your AI model integration here:
+    # - OpenAI GPT-4
+    # - Azure OpenAI
+    # - Ollama (local models)
+    # - Google Gemini
+    # - Anthropic Claude
+    # etc.
+    
+    # For now, return a generic category
+    return "Uncategorized"
+
+
+# ============================================
+# OPTIONAL: Advanced AI Categorization Functions
+# ============================================
+
+def ai_categorization_with_context(description, similar_incidents, verbose=True):
+    """
+    AI categorization with context from similar incidents
+    
+    Args:
+        description (str): New incident description
+        similar_incidents (list): List of similar incidents with tags
+        verbose (bool): Print progress messages
+    
+    Returns:
+        str: Assigned category/tag
+    """
+    if verbose:
+        print("\n[AI] Calling AI with context from similar incidents...")
+    
+    # Build context from similar incidents
+    context = "\n".join([
+        f"- {inc['description'][:100]} (Tag: {inc['tag']})"
+        for inc in similar_incidents[:3]
+    ])
+    
+    # TODO: Send to your AI model with context
+    # prompt = f"""
+    # Here are some similar incidents:
+    # {context}
+    # 
+    # New incident: {description}
+    # 
+    # Based on the similar incidents, what category should this be assigned to?
+    # """
+    
+    return "Uncategorized"
+
+
+def ai_categorization_batch(descriptions, verbose=True):
+    """
+    Batch AI categorization for multiple incidents
+    
+    Args:
+        descriptions (list): List of incident descriptions
+        verbose (bool): Print progress messages
+    
+    Returns:
+        list: List of assigned categories
+    """
+    if verbose:
+        print(f"\n[AI] Batch categorizing {len(descriptions)} incidents...")
+    
+    # TODO: Implement batch processing with your AI model
+    # This is more efficient for processing multiple incidents
+    
+    return ["Uncategorized"] * len(descriptions)
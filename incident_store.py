@@ -0,0 +1,227 @@
+import csv
+import os
+
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+DESCRIPTION_OFFSETS_FILE = "description_offsets.npy"
+DESCRIPTION_BYTES_FILE = "description_bytes.npy"
+
+
+def read_csv_header(csv_file):
+    """Column names of a CSV, read without pandas"""
+    with open(csv_file, newline="", encoding="utf-8-sig") as f:
+        return next(csv.reader(f), [])
+
+
+def encode_descriptions(descriptions):
+    """UTF-8 encode descriptions into (int64 offsets of length n+1, uint8 buffer)"""
+    encoded = ["" if d is None else str(d) for d in descriptions]
+    encoded = [d.encode("utf-8") for d in encoded]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class IncidentStore:
+    """Columnar store of the incident metadata the query path reads
+
+    Categories are an int32 code per row plus a small label table;
+    descriptions are one UTF-8 byte buffer with int64 offsets (row i is
+    data[offsets[i]:offsets[i + 1]]), both of which may be memory-mapped
+    from an artifact bundle. Every other CSV column is read from csv_file
+    the first time it is asked for. Rows appended after the CSV (learned
+    incidents) are kept in small Python lists.
+    """
+
+    def __init__(self, codes, labels, offsets, data, csv_file=None, category_col=None):
+        self.codes = codes
+        self.labels = [str(label) for label in labels]
+        self.offsets = offsets
+        self.data = data
+        self.csv_file = csv_file
+        self.category_col = category_col
+        self.n_csv_rows = len(offsets) - 1
+        self._view = memoryview(data)
+        self._columns = {}  # CSV column name -> Series, loaded on first use
+        self._csv_columns = None
+        self._appended = []  # descriptions of rows after the CSV
+        self._appended_columns = {}  # column name -> values of rows after the CSV
+
+    @classmethod
+    def from_descriptions(cls, descriptions, codes, labels, csv_file=None, category_col=None):
+        offsets, data = encode_descriptions(descriptions)
+        return cls(np.asarray(codes, dtype=np.int32), labels, offsets, data, csv_file, category_col)
+
+    @classmethod
+    def from_frame(cls, df, category_col, csv_file=None):
+        """Build from a dataframe with a Description and a category column"""
+        import pandas as pd
+        codes, labels = pd.factorize(df[category_col].astype(str))
+        return cls.from_descriptions(df['Description'].fillna("").astype(str), codes, labels,
+                                     csv_file, category_col)
+
+    def __len__(self):
+        return self.n_csv_rows + len(self._appended)
+
+    def nbytes(self):
+        """Bytes held by the code array and the description buffers"""
+        return self.codes.nbytes + self.offsets.nbytes + self.data.nbytes
+
+    # --------------------------------------------
+    # Descriptions and categories
+    # --------------------------------------------
+    def description(self, row):
+        row = int(row)
+        if row >= self.n_csv_rows:
+            return self._appended[row - self.n_csv_rows]
+        return self._view[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+    def descriptions(self, rows):
+        """Descriptions of an array of rows, as an object array of the same shape"""
+        rows = np.asarray(rows, dtype=np.int64)
+        flat = rows.ravel()
+        n_csv_rows, view, appended = self.n_csv_rows, self._view, self._appended
+        in_csv = np.where(flat < n_csv_rows, flat, 0) if n_csv_rows else np.zeros(0, dtype=np.int64)
+        starts = self.offsets[in_csv].tolist() if n_csv_rows else [0] * len(flat)
+        ends = self.offsets[in_csv + 1].tolist() if n_csv_rows else [0] * len(flat)
+        out = np.empty(len(flat), dtype=object)
+        out[:] = [view[start:end].tobytes().decode("utf-8") if row < n_csv_rows else appended[row - n_csv_rows]
+                  for row, start, end in zip(flat.tolist(), starts, ends)]
+        return out.reshape(rows.shape)
+
+    def iter_descriptions(self, start=0, stop=None):
+        stop = len(self) if stop is None else stop
+        for row in range(start, stop):
+            yield self.description(row)
+
+    def categories(self, rows):
+        """Category labels of an array of rows"""
+        return np.asarray(self.labels, dtype=object)[self.codes[np.asarray(rows, dtype=np.int64)]]
+
+    def set_codes(self, codes, labels):
+        self.codes = codes
+        self.labels = [str(label) for label in labels]
+
+    # --------------------------------------------
+    # Other columns (loaded lazily)
+    # --------------------------------------------
+    def csv_columns(self):
+        """Column names of the source CSV"""
+        if self._csv_columns is None:
+            if self.csv_file is None:
+                self._csv_columns = ['Description', self.category_col]
+            else:
+                self._csv_columns = read_csv_header(self.csv_file)
+        return self._csv_columns
+
+    def has_column(self, name):
+        return name in self.csv_columns()
+
+    def column(self, name):
+        """Whole column as a Series (row position index), reading it from the CSV if needed"""
+        import pandas as pd
+        if name == 'Description':
+            return pd.Series(list(self.iter_descriptions()), dtype=object)
+        if name == self.category_col:
+            return pd.Series(self.categories(np.arange(len(self))), dtype=object)
+        if name not in self._columns:
+            if not self.has_column(name):
+                raise KeyError(name)
+            values = pd.read_csv(self.csv_file, usecols=[name], nrows=self.n_csv_rows)[name]
+            self._columns[name] = values.reset_index(drop=True)
+        values = self._columns[name]
+        if self._appended:
+            appended = self.appended_frame(np.arange(self.n_csv_rows, len(self)))[name]
+            values = pd.concat([values, appended.set_axis(range(self.n_csv_rows, len(self)))])
+        return values
+
+    def to_frame(self, rows=None):
+        """Dataframe of all columns (all rows, or the given row positions)"""
+        import pandas as pd
+        frame = pd.DataFrame({name: self.column(name) for name in self.csv_columns()})
+        return frame if rows is None else frame.iloc[rows]
+
+    def appended_frame(self, rows):
+        """Dataframe with the CSV's columns for appended rows (positions >= n_csv_rows)"""
+        import pandas as pd
+        rows = np.asarray(rows, dtype=np.int64)
+        local = (rows - self.n_csv_rows).tolist()
+        frame = {}
+        for name in self.csv_columns():
+            if name == 'Description':
+                frame[name] = [self._appended[i] for i in local]
+            elif name == self.category_col:
+                frame[name] = self.categories(rows)
+            else:
+                values = self._appended_columns.get(name)
+                frame[name] = [values[i] for i in local] if values else [None] * len(local)
+        return pd.DataFrame(frame, columns=self.csv_columns())
+
+    def unload_columns(self):
+        """Drop the lazily loaded CSV columns"""
+        self._columns.clear()
+
+    # --------------------------------------------
+    # Appends and persistence
+    # --------------------------------------------
+    def append(self, descriptions, categories, columns=None):
+        """Append rows; returns their int32 category codes (new labels are added to the table)"""
+        label_to_code = {label: code for code, label in enumerate(self.labels)}
+        new_codes = []
+        for category in categories:
+            category = str(category)
+            if category not in label_to_code:
+                label_to_code[category] = len(self.labels)
+                self.labels.append(category)
+            new_codes.append(label_to_code[category])
+        new_codes = np.asarray(new_codes, dtype=np.int32)
+
+        columns = columns or {}
+        for name in columns:
+            self._appended_columns.setdefault(name, [None] * len(self._appended))
+        for name, values in self._appended_columns.items():
+            values.extend(columns.get(name, [None] * len(new_codes)))
+        self._appended.extend(str(d) for d in descriptions)
+        self.codes = np.concatenate([self.codes, new_codes])
+        return new_codes
+
+    def save(self, directory):
+        """Write the description buffers of the CSV rows to directory"""
+        np.save(os.path.join(directory, DESCRIPTION_OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(directory, DESCRIPTION_BYTES_FILE), self.data)
+
+    @classmethod
+    def load(cls, directory, codes, labels, csv_file=None, category_col=None, mmap=True):
+        """Open description buffers written by save(), memory-mapped by default"""
+        mmap_mode = "r" if mmap else None
+        offsets = np.load(os.path.join(directory, DESCRIPTION_OFFSETS_FILE), mmap_mode=mmap_mode)
+        data = np.load(os.path.join(directory, DESCRIPTION_BYTES_FILE), mmap_mode=mmap_mode)
+        if len(offsets) != len(codes) + 1:
+            raise ValueError(f"{len(offsets) - 1} descriptions for {len(codes)} category codes")
+        return cls(codes, labels, offsets, data, csv_file, category_col)
+
+
+class IncidentStoreBuilder:
+    """Accumulates descriptions and category codes chunk by chunk (streaming builds)"""
+
+    def __init__(self):
+        self.offset_chunks = [np.zeros(1, dtype=np.int64)]
+        self.data_chunks = []
+        self.code_chunks = []
+        self.n_bytes = 0
+
+    def add(self, descriptions, codes):
+        offsets, data = encode_descriptions(descriptions)
+        self.offset_chunks.append(offsets[1:] + self.n_bytes)
+        self.data_chunks.append(data)
+        self.code_chunks.append(np.asarray(codes, dtype=np.int32))
+        self.n_bytes += len(data)
+
+    def finish(self, labels, csv_file=None, category_col=None):
+        codes = np.concatenate(self.code_chunks) if self.code_chunks else np.zeros(0, dtype=np.int32)
+        data = np.concatenate(self.data_chunks) if self.data_chunks else np.zeros(0, dtype=np.uint8)
+        return IncidentStore(codes, labels, np.concatenate(self.offset_chunks), data, csv_file, category_col)
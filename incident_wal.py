@@ -0,0 +1,86 @@
+import base64
+import json
+import os
+
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+WAL_FILE = "incidents.wal.jsonl"
+
+
+def encode_vector(vector):
+    """float32 vector -> base64 text"""
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vector(text):
+    """base64 text -> float32 vector"""
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32)
+
+
+class IncidentWAL:
+    """Write-ahead append log of incidents learned (or removed) since the last snapshot
+
+    Each line is a JSON record tagged with the snapshot it applies to (the
+    CSV checksum from the artifact bundle manifest), so records written on
+    top of an older snapshot are never replayed onto a newer one.
+    Embeddings are stored with the record so replay never re-embeds.
+    """
+
+    def __init__(self, path=WAL_FILE, fsync=True):
+        self.path = path
+        self.fsync = fsync
+
+    def _append(self, records):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def append_add(self, snapshot, ids, descriptions, categories, dates, embeddings):
+        """Log newly learned incidents"""
+        self._append(
+            {
+                "op": "add",
+                "snapshot": snapshot,
+                "id": int(incident_id),
+                "description": description,
+                "category": category,
+                "date": date,
+                "embedding": encode_vector(embedding),
+            }
+            for incident_id, description, category, date, embedding
+            in zip(ids, descriptions, categories, dates, embeddings)
+        )
+
+    def append_delete(self, snapshot, ids):
+        """Log tombstoned incidents"""
+        self._append({"op": "delete", "snapshot": snapshot, "id": int(i)} for i in ids)
+
+    def records(self, snapshot):
+        """Yield the records written on top of `snapshot`, in order"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write; everything before it is intact
+                    print(f"⚠️ Ignoring unreadable WAL line {line_number} in {self.path}")
+                    continue
+                if record.get("snapshot") == snapshot:
+                    yield record
+
+    def truncate(self):
+        """Drop all records (after they have been folded into a new snapshot)"""
+        with open(self.path, "w", encoding="utf-8"):
+            pass
@@ -0,0 +1,106 @@
+import argparse
+import asyncio
+import csv
+import json
+import random
+import time
+
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+HOST = "127.0.0.1"  # Same defaults as categorization_server.py
+PORT = 8765
+CONCURRENCY = 32  # Simultaneous keep-alive connections
+N_REQUESTS = 2000
+SAMPLE_CSV = "incidents.csv"
+
+
+def load_descriptions(csv_file, limit=5000, seed=0):
+    """Descriptions to send: a sample of the CSV, or synthetic ones if it cannot be read"""
+    try:
+        with open(csv_file, newline='', encoding='utf-8') as f:
+            descriptions = [row['Description'] for row in csv.DictReader(f) if row.get('Description')]
+    except (OSError, KeyError):
+        descriptions = []
+    rng = random.Random(seed)
+    if not descriptions:
+        words = "server network printer login password email database power leak badge".split()
+        return [" ".join(rng.choice(words) for _ in range(6)) for _ in range(limit)]
+    rng.shuffle(descriptions)
+    return descriptions[:limit]
+
+
+async def post(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode("utf-8")
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode("latin-1") + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_load(host, port, descriptions, n_requests, concurrency):
+    """Send n_requests POST /categorize calls over `concurrency` connections"""
+    latencies, statuses = [], {}
+    counter = iter(range(n_requests))
+
+    async def client():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in counter:
+                started = time.perf_counter()
+                status = await post(reader, writer, host, "/categorize",
+                                    {"description": descriptions[i % len(descriptions)]})
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return np.asarray(latencies), statuses, elapsed
+
+
+def print_load_report(latencies, statuses, elapsed, concurrency):
+    print("\n" + "="*60)
+    print("📈 LOAD TEST RESULTS")
+    print("="*60)
+    print(f"Requests: {len(latencies)} over {concurrency} connections in {elapsed:.2f}s")
+    print(f"Throughput: {len(latencies) / elapsed:.1f} req/s")
+    print(f"Latency p50: {np.percentile(latencies, 50):.2f} ms")
+    print(f"Latency p99: {np.percentile(latencies, 99):.2f} ms")
+    print(f"Latency max: {latencies.max():.2f} ms")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+    print("="*60)
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Load generator for categorization_server.py")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--requests', type=int, default=N_REQUESTS)
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--csv', default=SAMPLE_CSV, help="Where to sample descriptions from")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    descriptions = load_descriptions(args.csv)
+    latencies, statuses, elapsed = asyncio.run(
+        run_load(args.host, args.port, descriptions, args.requests, args.concurrency))
+    print_load_report(latencies, statuses, elapsed, args.concurrency)
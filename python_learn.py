@@ -1,423 +1,1194 @@
+import argparse
+import contextlib
+import csv
+import os
+import sys
+import time
+
 import numpy as np
-from collections import Counter
-from db_config import DatabaseConfig
-from faiss_indexing import FAISSIndexer
+import faiss
+from db_config import (DatabaseConfig, CHROMA_MODE, CHROMA_MODES, CSV_FILE, DUPLICATE_INDEX, DUPLICATE_MINHASH,
+                       EMBEDDING_CACHE_FILE, STREAM_CHUNK_ROWS)
+from bulk_embedding import EMBED_WORKERS, ONNX_THREADS
+from category_prefilter import AUDIT_RATE, SUB_CENTROIDS
+from faiss_indexing import (FAISSIndexer, INDEX_SPEC, INDEX_SPECS, SEARCH_MODE, SEARCH_MODES, SIMILARITY_THRESHOLD,
+                            STORAGE_PRECISION, STORAGE_PRECISIONS, TOP_K, index_quality_report, precision_accuracy_report, print_index_quality_report)
+from artifact_bundle import (BUNDLE_DIR, EMBEDDINGS_FILE, expected_manifest, load_artifact_bundle,
+                             save_artifact_bundle)
+from categorization_result import CategorizationResult, JsonLinesSink
 from genai_categorization import ai_categorization
+from ai_fallback import AIFallback, StubAIModel
+from incident_wal import IncidentWAL, WAL_FILE, decode_vector
+from sharded_index import (N_SHARDS, SHARD_DIR, SHARD_EXECUTOR, SHARD_EXECUTORS, SHARD_KEY, SHARD_KEYS, ShardedIndexer,
+                           shard_keys)
+from streaming_build import remove_spool, stream_build
+from time_partitions import (MAX_RESIDENT_MB, PARTITION_DIR, PERIOD, PERIODS, RECENCY_HALF_LIFE, RECENT_PERIODS,
+                             TimePartitionedIndexer)
+from voting import VOTING_STRATEGIES, category_breakdown, get_strategy, stats_from_counts, vote
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+DEFAULT_VOTING = "weighted"  # "frequency" or "weighted"
+BATCH_SIZE = 1024  # Descriptions embedded and searched per chunk in batch mode
+EXACT_MATCH = "Exact Match"  # method of results served by the duplicate index
+NEAR_DUPLICATE_MATCH = "Near-Duplicate Match"
+CENTROID_MATCH = "Centroid Match"  # method of results decided by the category prefilter
+AI_GENERATED = "AI Generated"  # method of results tagged by the AI fallback
+VERBOSITY = 2  # 0 = silent, 1 = one summary line per incident, 2 = full analysis
+
+
+def print_banner():
+    print("="*60)
+    print("🚀 INCIDENT CATEGORIZATION SYSTEM")
+    print("Using ChromaDB Embeddings + FAISS Vector Search + Similarity Voting")
+    print("="*60)
 
 
-print("="*60)
-print("🚀 INCIDENT CATEGORIZATION SYSTEM")
-print("Using ChromaDB Embeddings + FAISS Vector Search + Frequency Voting")
-print("="*60)
+def initialize_system(bundle_dir=BUNDLE_DIR, index_spec=INDEX_SPEC, wal_file=WAL_FILE,
+                      chroma_mode=None, stream=False, chunk_rows=STREAM_CHUNK_ROWS,
+                      duplicate_index=DUPLICATE_INDEX, minhash=DUPLICATE_MINHASH,
+                      embed_workers=EMBED_WORKERS, onnx_threads=ONNX_THREADS, csv_file=CSV_FILE,
+                      cache_file=EMBEDDING_CACHE_FILE, embedding_factory=None, prefilter=False,
+                      sub_centroids=SUB_CENTROIDS, audit_rate=AUDIT_RATE,
+                      similarity_threshold=SIMILARITY_THRESHOLD, top_k=TOP_K, embedding_function=None,
+                      **index_params):
+    """Initialize database, embeddings, and FAISS index
 
+    Reuses the warm-start artifact bundle in `bundle_dir` when its manifest
+    matches the current CSV, embedding model and index build parameters;
+    otherwise rebuilds and saves a fresh bundle. Incidents learned since
+    that snapshot are then replayed from the write-ahead log `wal_file`.
+    The ChromaDB collection (`chroma_mode`: memory / persistent / skip) is
+    loaded from the computed vectors; nothing on the query path reads it,
+    so a warm start only attaches a persistent store. It defaults to
+    CHROMA_MODE, or to "skip" for a streamed build, whose point is not to
+    hold the whole corpus in memory.
+    Incident metadata lives in a columnar IncidentStore; a warm start
+    memory-maps its descriptions from the bundle instead of parsing the CSV.
+    With `stream`, a cold start reads, embeds and indexes the CSV
+    `chunk_rows` rows at a time (see streaming_build.stream_build).
+    `duplicate_index` / `minhash` control the exact / near-duplicate fast
+    path built while loading (see DatabaseConfig).
+    A cold start embeds the corpus with `embed_workers` processes of
+    `onnx_threads` ONNX threads each (see bulk_embedding.BulkEmbedder).
+    `csv_file`, `cache_file` (None disables the embedding cache) and
+    `embedding_factory` (a picklable callable returning an embedding
+    function; None for the ChromaDB default) select the data and model;
+    an already built `embedding_function` is reused instead (see
+    corpus_registry, whose corpora share one model).
+    `index_spec` and `index_params` (nlist, nprobe, hnsw_m, ef_search,
+    pq_m, pq_nbits, storage_precision, keep_embeddings, search_mode,
+    radius) are passed to FAISSIndexer; the dense embedding matrix is
+    dropped once the index and bundle are built unless keep_embeddings is
+    set.
+    With `prefilter`, per-category centroids (`sub_centroids` each) are
+    computed for the two-stage search (see two_stage_search), and
+    `audit_rate` of its shortcuts are checked against the full search.
+    `similarity_threshold` and `top_k` are the voting operating point (see
+    calibration.py for choosing them).
+    """
 
-def initialize_system():
-    """Initialize database, embeddings, and FAISS index"""
-    
-    db_config = DatabaseConfig(csv_file="incidents.csv")
-    df, category_col = db_config.load_csv()
+    if chroma_mode is None:
+        chroma_mode = "skip" if stream else CHROMA_MODE
+    db_config = DatabaseConfig(csv_file=csv_file, cache_file=cache_file, duplicate_index=duplicate_index,
+                               minhash=minhash, embed_workers=embed_workers, onnx_threads=onnx_threads,
+                               embedding_factory=embedding_factory, embedding_function=embedding_function)
+    db_config.detect_columns()
     embedding_function = db_config.initialize_embedding_function()
-    embeddings, descriptions = db_config.generate_embeddings()
-    faiss_indexer = FAISSIndexer(similarity_threshold=0.96, top_k=10)
-    faiss_indexer.create_index(embeddings)
-    db_config.setup_chromadb_collection(descriptions)
-    
+    faiss_indexer = FAISSIndexer(similarity_threshold=similarity_threshold, top_k=top_k, index_spec=index_spec, **index_params)
+
+    expected = expected_manifest(db_config, faiss_indexer)
+    db_config.snapshot_id = expected['csv_sha256']
+    bundle = load_artifact_bundle(bundle_dir, expected, csv_file=csv_file)
+    if bundle is not None:
+        if bundle['store'] is not None:
+            db_config.attach_store(bundle['store'])
+        else:
+            db_config.load_csv(chunk_rows=chunk_rows if stream else None)
+            db_config.set_category_codes(bundle['category_codes'], bundle['manifest']['category_labels'])
+        faiss_indexer.set_index(bundle['index'], bundle['embeddings'])
+        print("✅ Warm start: skipped CSV parsing, embedding and index build")
+        if chroma_mode == "persistent":
+            db_config.setup_chromadb_collection(None, embeddings=bundle['embeddings'], mode=chroma_mode)
+    elif stream:
+        spool_path = f"{bundle_dir}.spool-{os.getpid()}.f32"
+        embeddings = stream_build(db_config, faiss_indexer, spool_path, chunk_rows=chunk_rows)
+        category_codes, category_labels = db_config.get_category_codes()
+        if save_artifact_bundle(bundle_dir, faiss_indexer, embeddings, category_codes, category_labels,
+                                expected, store=db_config.store) is not None:
+            # Serve the vectors from the bundle's copy so the spool can go
+            faiss_indexer.embeddings_array = np.load(os.path.join(bundle_dir, EMBEDDINGS_FILE), mmap_mode="r")
+            del embeddings
+            remove_spool(spool_path)
+        db_config.setup_chromadb_collection(None, embeddings=faiss_indexer.embeddings_array, mode=chroma_mode)
+    else:
+        db_config.load_csv()
+        embeddings, descriptions = db_config.generate_embeddings()
+        faiss_indexer.create_index(embeddings)
+        category_codes, category_labels = db_config.get_category_codes()
+        save_artifact_bundle(bundle_dir, faiss_indexer, faiss_indexer.embeddings_array,
+                             category_codes, category_labels, expected, store=db_config.store)
+        db_config.setup_chromadb_collection(descriptions, embeddings=embeddings, mode=chroma_mode)
+    db_config.release_embedding_workers()
+    if prefilter:
+        category_codes, category_labels = db_config.get_category_codes()
+        faiss_indexer.build_prefilter(category_codes, len(category_labels), sub_centroids=sub_centroids,
+                                      audit_rate=audit_rate)
+    faiss_indexer.release_embeddings()
+
+    if wal_file:
+        db_config.wal = IncidentWAL(wal_file)
+        replay_wal(db_config, faiss_indexer)
+
     return db_config, faiss_indexer
 
 
-def process_new_incident(new_description, db_config, faiss_indexer):
-    """Process new incident using frequency-based category voting"""
-    
-    print("
-" + "="*60)
-    print("🔍 PROCESSING NEW INCIDENT")
-    print("="*60)
-    print(f"Description: {new_description}")
-    
-    df, category_col = db_config.get_data()
-    embedding_function = db_config.embedding_function
-    
-    print("
-[VECTOR] Generating embedding for new incident...")
-    try:
-        new_embedding = embedding_function([new_description])[0]
-        print("✅ Embedding generated")
-    except Exception as e:
-        print(f"❌ Error generating embedding: {e}")
-        return None
-    
-    print(f"
-[SEARCH] Finding top {faiss_indexer.get_top_k()} similar incidents using FAISS...")
-    scores, indices = faiss_indexer.search_similar(new_embedding)
-    
-    if scores is None or indices is None:
-        print("❌ Search failed")
-        return None
-    
-    print(f"✅ Found {len(indices)} similar incidents")
-    print("
-📊 TOP 10 SIMILAR INCIDENTS:")
-    print("-" * 60)
-    
-    similar_incidents = []
-    category_scores = {}
-    
-    for i, (idx, score) in enumerate(zip(indices, scores)):
-        similarity_percent = score * 100
-        incident = df.iloc[idx]
-        category_tag = str(incident[category_col])
-        
-        similar_incidents.append({
-            'rank': i + 1,
-            'index': int(idx),
-            'similarity': float(similarity_percent),
-            'description': str(incident['Description']),
-            'tag': category_tag
-        })
-        
-        if category_tag not in category_scores:
-            category_scores[category_tag] = []
-        category_scores[category_tag].append(similarity_percent)
-        
-        print(f"{i+1}. Similarity: {similarity_percent:.2f}%")
-        print(f"   Tag: {category_tag}")
-        print(f"   Description: {incident['Description'][:70]}...")
-        print()
-    
-    print("
-📊 FREQUENCY ANALYSIS:")
-    print("-" * 60)
-    
-    category_list = [inc['tag'] for inc in similar_incidents]
-    category_frequency = Counter(category_list)
-    
-    print(f"Total incidents analyzed: {len(similar_incidents)}")
-    print(f"
-Category Frequency Distribution:")
-    for category, freq in category_frequency.most_common():
-        avg_sim = np.mean(category_scores[category])
-        print(f"  • {category}: {freq}/{len(similar_incidents)} occurrences (Avg Similarity: {avg_sim:.2f}%)")
-    
-    most_frequent_category = category_frequency.most_common(1)[0][0]
-    most_frequent_count = category_frequency.most_common(1)[0][1]
-    
-    print(f"
-🏆 Most Frequent Category: '{most_frequent_category}' ({most_frequent_count}/{len(similar_incidents)} occurrences)")
-    
-    avg_similarity_of_most_frequent = np.mean(category_scores[most_frequent_category])
-    
-    print(f"📈 Average Similarity for '{most_frequent_category}': {avg_similarity_of_most_frequent:.2f}%")
-    print(f"🎯 Threshold: {faiss_indexer.get_threshold() * 100}%")
-    
-    print("
-[DECISION] Making categorization decision...")
-    
-    if avg_similarity_of_most_frequent >= (faiss_indexer.get_threshold() * 100):
-        assigned_tag = most_frequent_category
-        
-        print(f"✅ Average similarity ({avg_similarity_of_most_frequent:.2f}%) >= Threshold ({faiss_indexer.get_threshold() * 100}%)")
-        print(f"📌 Assigning tag: '{assigned_tag}'")
-        print(f"   (Most frequent category with {most_frequent_count} occurrences)")
-        method = "Frequency-Based Vector Search"
-        
+def shard_system(db_config, faiss_indexer, n_shards=N_SHARDS, shard_key=SHARD_KEY, key_column=None,
+                 executor=SHARD_EXECUTOR, bundle_dir=BUNDLE_DIR):
+    """Replace the single index from initialize_system with a ShardedIndexer over the same corpus
+
+    The shards are built from the corpus embeddings (the bundle's copy when
+    there is one) with the same index spec and parameters; the single index
+    is released afterwards. Process shards are written under bundle_dir,
+    so runs with different bundles keep separate shard files. Returns the
+    ShardedIndexer, which process_new_incident and the batch functions
+    accept unchanged.
+    """
+    index_params = {name: getattr(faiss_indexer, name) for name in
+                    ("index_spec", "nlist", "nprobe", "hnsw_m", "ef_search", "pq_m", "pq_nbits",
+                     "storage_precision", "search_mode", "radius")}
+    sharded = ShardedIndexer(faiss_indexer.get_threshold(), faiss_indexer.get_top_k(), n_shards=n_shards,
+                             shard_key=shard_key, executor=executor, shard_dir=os.path.join(bundle_dir, SHARD_DIR),
+                             **index_params)
+    sharded.create_index(corpus_embeddings(db_config, faiss_indexer, bundle_dir),
+                         shard_keys(db_config, shard_key, key_column), removed_ids=faiss_indexer.tombstones)
+    faiss_indexer.index = None
+    faiss_indexer.embeddings_array = None
+    return sharded
+
+
+def partition_system(db_config, faiss_indexer, period=PERIOD, recent_periods=RECENT_PERIODS,
+                     recency_half_life=RECENCY_HALF_LIFE, max_resident_mb=MAX_RESIDENT_MB, bundle_dir=BUNDLE_DIR):
+    """Replace the single index from initialize_system with per-period partitions of the Date column
+
+    Like shard_system, but the partitions are time periods searched within
+    a recency window and loaded on demand from their files under
+    bundle_dir (see TimePartitionedIndexer). Returns the
+    TimePartitionedIndexer.
+    """
+    index_params = {name: getattr(faiss_indexer, name) for name in
+                    ("index_spec", "nlist", "nprobe", "hnsw_m", "ef_search", "pq_m", "pq_nbits",
+                     "storage_precision", "search_mode", "radius")}
+    partitioned = TimePartitionedIndexer(faiss_indexer.get_threshold(), faiss_indexer.get_top_k(), period=period,
+                                         recent_periods=recent_periods, recency_half_life=recency_half_life,
+                                         max_resident_mb=max_resident_mb,
+                                         partition_dir=os.path.join(bundle_dir, PARTITION_DIR), **index_params)
+    partitioned.create_index(corpus_embeddings(db_config, faiss_indexer, bundle_dir), shard_keys(db_config, "date"),
+                             removed_ids=faiss_indexer.tombstones)
+    faiss_indexer.index = None
+    faiss_indexer.embeddings_array = None
+    return partitioned
+
+
+# ============================================
+# ONLINE LEARNING
+# ============================================
+def learn_incidents(descriptions, categories, db_config, faiss_indexer, dates=None):
+    """Add categorized incidents to the live index without a rebuild
+
+    The rows are appended to DatabaseConfig (dataframe, category codes,
+    ChromaDB) and FAISSIndexer under the same positional ids, then logged
+    to the write-ahead log so a restart can replay them. Learners sharing
+    a ConcurrentIndexer take turns (see index_writer).
+    """
+    descriptions = list(descriptions)
+    categories = [str(c) for c in categories]
+    if dates is None:
+        dates = [time.strftime("%Y-%m-%d")] * len(descriptions)
+
+    check_writable(faiss_indexer)
+    embeddings = db_config.embed_texts(descriptions)
+    with index_writer(faiss_indexer):
+        if db_config.wal is not None:
+            ids = range(len(db_config.store), len(db_config.store) + len(descriptions))
+            db_config.wal.append_add(db_config.snapshot_id, ids, descriptions, categories, dates, embeddings)
+        return _apply_add(db_config, faiss_indexer, descriptions, categories, dates, embeddings)
+
+
+def forget_incidents(ids, db_config, faiss_indexer):
+    """Tombstone incidents so they no longer take part in search and voting"""
+    check_writable(faiss_indexer)
+    with index_writer(faiss_indexer):
+        if db_config.wal is not None:
+            db_config.wal.append_delete(db_config.snapshot_id, ids)
+        db_config.remove_incidents(ids)
+        faiss_indexer.remove_ids(ids)
+
+
+def check_writable(faiss_indexer):
+    """Refuse an update the index cannot take before anything reaches the WAL (which replay would repeat)"""
+    if not getattr(faiss_indexer, 'writable', True):
+        raise RuntimeError("Process-served shards are read-only; rebuild them to add or remove incidents")
+
+
+def index_writer(faiss_indexer):
+    """Writer turn of a ConcurrentIndexer, so row ids, the WAL and the index stay in step; a no-op otherwise
+
+    The incident store only grows, and its rows are appended before the
+    index learns their vectors, so searches running meanwhile never see
+    an id the store does not have yet.
+    """
+    writer = getattr(faiss_indexer, 'writer', None)
+    return writer() if writer is not None else contextlib.nullcontext()
+
+
+def _apply_add(db_config, faiss_indexer, descriptions, categories, dates, embeddings):
+    ids = db_config.append_incidents(descriptions, categories, dates, embeddings)
+    if getattr(faiss_indexer, 'date_keyed', False):
+        index_ids = faiss_indexer.add_vectors(embeddings, keys=dates)
     else:
-        print(f"⚠️ Average similarity ({avg_similarity_of_most_frequent:.2f}%) < Threshold ({faiss_indexer.get_threshold() * 100}%)")
-        print("🤖 Calling AI categorization function...")
-        
-        assigned_tag = ai_categorization(new_description)
-        print(f"📌 Assigned tag from AI: '{assigned_tag}'")
-        method = "AI Generated"
-    
-    print("
-" + "="*60)
-    print("✨ FINAL RESULT")
-    print("="*60)
-    print(f"New Incident: {new_description}")
-    print(f"Assigned Tag: {assigned_tag}")
-    print(f"Most Frequent Category: {most_frequent_category} ({most_frequent_count}/{len(similar_incidents)})")
-    print(f"Average Similarity (Most Frequent): {avg_similarity_of_most_frequent:.2f}%")
-    print(f"Method: {method}")
-    print("="*60)
-    
-    return {
-        'description': new_description,
-        'assigned_tag': assigned_tag,
-        'most_frequent_category': most_frequent_category,
-        'frequency_count': most_frequent_count,
-        'avg_similarity': avg_similarity_of_most_frequent,
-        'similar_incidents': similar_incidents,
-        'category_frequency': dict(category_frequency),
-        'method': method
-    }
+        index_ids = faiss_indexer.add_vectors(embeddings)
+    if not np.array_equal(ids, index_ids):
+        raise RuntimeError(f"Index ids {index_ids[:1]} out of sync with data rows {ids[:1]}")
+    return ids
 
 
-if __name__ == "__main__":
-    db_config, faiss_indexer = initialize_system()
-    
-    print("
+def replay_wal(db_config, faiss_indexer):
+    """Re-apply incidents learned since the current snapshot from the write-ahead log"""
+    added = removed = 0
+    for record in db_config.wal.records(db_config.snapshot_id):
+        if record['op'] == 'add':
+            if record['id'] != len(db_config.store):
+                print(f"⚠️ WAL record id {record['id']} does not follow row {len(db_config.store)}; stopping replay")
+                break
+            _apply_add(db_config, faiss_indexer, [record['description']], [record['category']],
+                       [record['date']], decode_vector(record['embedding'])[None, :])
+            added += 1
+        elif record['op'] == 'delete':
+            db_config.remove_incidents([record['id']])
+            faiss_indexer.remove_ids([record['id']])
+            removed += 1
+    if added or removed:
+        print(f"✅ Replayed write-ahead log: {added} learned, {removed} removed incidents")
 
-" + "="*60)
-    print("🎯 READY FOR NEW INCIDENT INPUT")
-    print("="*60)
-    
-    print("
-Enter new incident description (or 'quit' to exit):")
-    while True:
-        user_input = input("
->>> ").strip()
-        
-        if user_input.lower() in ['quit', 'exit', 'q']:
-            print("
-👋 Exiting system. Goodbye!")
-            break
-        
-        if not user_input:
-            print("⚠️ Please enter a valid description")
-            continue
-        
-        result = process_new_incident(user_input, db_config, faiss_indexer)
-        
-        print("
-" + "-"*60)
-        print("Enter another incident description (or 'quit' to exit):")
 
+def checkpoint(db_config):
+    """Fold learned incidents into the CSV and clear the write-ahead log
 
+    The CSV is rewritten atomically without tombstoned rows; the next
+    initialize_system() rebuilds the bundle, reusing cached embeddings.
+    """
+    print(f"\n[CHECKPOINT] Writing {db_config.csv_file} with learned incidents...")
+    tmp_file = f"{db_config.csv_file}.tmp"
+    n_written = db_config.write_live_csv(tmp_file)
+    os.replace(tmp_file, db_config.csv_file)
+    if db_config.wal is not None:
+        db_config.wal.truncate()
+    print(f"✅ Checkpoint written ({n_written} incidents)")
 
 
+# ============================================
+# NEIGHBORS AND VOTING
+# ============================================
+def neighbor_weights(faiss_indexer, indices):
+    """Per-neighbor vote weights of the indexer (recency decay of time partitions), or None"""
+    recency_weights = getattr(faiss_indexer, 'recency_weights', None)
+    return recency_weights(indices) if recency_weights is not None else None
 
 
+def lookup_neighbors(indices, db_config):
+    """Vectorized lookup of category codes and descriptions for a block of neighbor indices
 
+    `indices` is a (n_queries, top_k) FAISS result; -1 (no neighbor) maps to
+    code -1 and an empty description.
+    """
+    category_codes, category_labels = db_config.get_category_codes()
+    indices = np.atleast_2d(np.asarray(indices, dtype=np.int64))
+    valid = indices >= 0
 
+    neighbor_codes = np.full(indices.shape, -1, dtype=np.int64)
+    neighbor_codes[valid] = category_codes[indices[valid]]
 
+    neighbor_descriptions = np.full(indices.shape, "", dtype=object)
+    neighbor_descriptions[valid] = db_config.store.descriptions(indices[valid])
+    return neighbor_codes, neighbor_descriptions
 
 
+def collect_similar_incidents(indices, scores, neighbor_codes, neighbor_descriptions, category_labels):
+    """Turn one row of FAISS results into a list of similar-incident dicts"""
+    similarities = (np.asarray(scores, dtype=np.float64) * 100).tolist()
+    return [
+        {
+            'rank': rank + 1,
+            'index': int(idx),
+            'similarity': similarity,
+            'description': description,
+            'tag': category_labels[code]
+        }
+        for rank, (idx, similarity, code, description)
+        in enumerate(zip(indices.tolist(), similarities, neighbor_codes.tolist(), neighbor_descriptions))
+        if idx >= 0
+    ]
 
 
+def vote_details(voting, strategy_vote, row, breakdown, category_labels):
+    """Strategy-specific fields of the result dict for one query"""
+    best_category = category_labels[strategy_vote['winner'][row]]
+    if voting == 'frequency':
+        return {
+            'most_frequent_category': best_category,
+            'frequency_count': int(strategy_vote['count'][row]),
+            'avg_similarity': float(strategy_vote['decision_similarity'][row]),
+            'category_frequency': {tag: stats['count'] for tag, stats in breakdown.items()}
+        }
+    if voting == 'weighted':
+        return {
+            'best_category': best_category,
+            'confidence': float(strategy_vote['confidence'][row]),
+            'weighted_avg_similarity': float(strategy_vote['decision_similarity'][row]),
+            'category_stats': breakdown
+        }
+    return {
+        'best_category': best_category,
+        'decision_similarity': float(strategy_vote['decision_similarity'][row])
+    }
 
 
+def build_result(description, voting, strategy_vote, row, category_labels,
+                 similar_incidents, details, assigned_tag, method, timings):
+    """Assemble the CategorizationResult returned for one incident"""
+    return CategorizationResult(
+        description=description,
+        assigned_tag=assigned_tag,
+        method=method,
+        voting=voting,
+        best_category=category_labels[strategy_vote['winner'][row]],
+        decision_similarity=float(strategy_vote['decision_similarity'][row]),
+        similar_incidents=similar_incidents,
+        details=details,
+        timings=timings,
+    )
 
 
+def duplicate_result(description, match, db_config, voting, lookup_ms):
+    """CategorizationResult for a description found in the duplicate index
 
-import numpy as np
-from collections import Counter
-from db_config import DatabaseConfig
-from faiss_indexing import FAISSIndexer
-from genai_categorization import ai_categorization
+    The historical rows sharing the description stand in for the FAISS
+    neighbors (all at the match similarity), so the vote details have the
+    same shape as a vector-search result.
+    """
+    category_codes, category_labels = db_config.get_category_codes()
+    stats = stats_from_counts(match['counts'], match['similarity'], len(category_labels))
+    strategy_vote = get_strategy(voting)(stats)
+    breakdown = category_breakdown(stats, 0, category_labels)
+    details = vote_details(voting, strategy_vote, 0, breakdown, category_labels)
+    row = match['first_row']
+    similar_incidents = [{
+        'rank': 1,
+        'index': row,
+        'similarity': match['similarity'],
+        'description': db_config.store.description(row),
+        'tag': category_labels[category_codes[row]]
+    }]
+    method = EXACT_MATCH if match['kind'] == "exact" else NEAR_DUPLICATE_MATCH
+    timings = {'embed_ms': 0.0, 'search_ms': lookup_ms, 'vote_ms': 0.0, 'ai_fallback_ms': 0.0,
+               'total_ms': lookup_ms}
+    result = build_result(description, voting, strategy_vote, 0, category_labels, similar_incidents,
+                          details, category_labels[strategy_vote['winner'][0]], method, timings)
+    return result, breakdown
 
 
-print("="*60)
-print("🚀 INCIDENT CATEGORIZATION SYSTEM")
-print("Using Weighted Similarity Voting Method")
-print("="*60)
+def centroid_result(description, code, similarity, db_config, voting, timings):
+    """CategorizationResult for a query the category prefilter decided without a neighbor search"""
+    _, category_labels = db_config.get_category_codes()
+    return CategorizationResult(
+        description=description,
+        assigned_tag=category_labels[code],
+        method=CENTROID_MATCH,
+        voting=voting,
+        best_category=category_labels[code],
+        decision_similarity=float(similarity) * 100,
+        similar_incidents=[],
+        details={'centroid_similarity': float(similarity) * 100},
+        timings=timings,
+    )
 
 
-def initialize_system():
-    """Initialize database, embeddings, and FAISS index"""
-    
-    db_config = DatabaseConfig(csv_file="incidents.csv")
-    df, category_col = db_config.load_csv()
-    embedding_function = db_config.initialize_embedding_function()
-    embeddings, descriptions = db_config.generate_embeddings()
-    faiss_indexer = FAISSIndexer(similarity_threshold=0.96, top_k=10)
-    faiss_indexer.create_index(embeddings)
-    db_config.setup_chromadb_collection(descriptions)
-    
-    return db_config, faiss_indexer
+def no_neighbor_result(description, assigned_tag, voting, timings):
+    """CategorizationResult for a query with no neighbor in range: tagged by the AI fallback, nothing voted"""
+    return CategorizationResult(
+        description=description,
+        assigned_tag=assigned_tag,
+        method=AI_GENERATED,
+        voting=voting,
+        best_category=None,
+        decision_similarity=0.0,
+        similar_incidents=[],
+        details={'neighbors_in_range': 0},
+        timings=timings,
+    )
+
+
+def two_stage_search(embeddings, db_config, faiss_indexer, voting):
+    """Neighbor search, preceded by the category prefilter when the indexer has one
+
+    Returns (scores, indices, decided, centroid_similarity). Without a
+    prefilter this is search_batch and decided is None. With one, queries
+    the centroids decide get decided[row] = category code and no
+    neighbors (indices -1); the others are searched among their candidate
+    categories only (grouped by candidate set), or over everything when all
+    categories are candidates. An audit_rate share of the prefiltered
+    queries is also searched in full, and the decisions compared.
+    """
+    prefilter = getattr(faiss_indexer, 'prefilter', None)
+    if prefilter is None:
+        scores, indices = faiss_indexer.search_batch(embeddings)
+        return scores, indices, None, None
+
+    query_array = np.array(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+    faiss.normalize_L2(query_array)
+    decided, centroid_similarity, candidates = prefilter.decide(query_array)
+    category_codes, category_labels = db_config.get_category_codes()
+    top_k = faiss_indexer.get_top_k()
+    scores = np.full((len(query_array), top_k), -np.finfo(np.float32).max, dtype=np.float32)
+    indices = np.full((len(query_array), top_k), -1, dtype=np.int64)
 
+    searched = np.nonzero(decided < 0)[0]
+    restricted = searched[~candidates[searched][:, prefilter.group_codes].all(axis=1)]
+    full = np.setdiff1d(searched, restricted)
+    try:
+        if len(full):
+            scores[full], indices[full] = faiss_indexer.search_normalized(query_array[full])
+        groups = {}
+        for row in restricted.tolist():
+            groups.setdefault(candidates[row].tobytes(), []).append(row)
+        for rows in groups.values():
+            categories = np.nonzero(candidates[rows[0]])[0].tolist()
+            scores[rows], indices[rows] = faiss_indexer.search_restricted(query_array[rows], categories,
+                                                                          category_codes)
+
+        audited = prefilter.audit_rows(len(query_array))
+        audited = audited[(decided[audited] >= 0) | np.isin(audited, restricted)]
+        if len(audited):
+            full_scores, full_indices = faiss_indexer.search_normalized(query_array[audited])
+            threshold_percent = faiss_indexer.get_threshold() * 100
+            codes = lambda idx: np.where(idx >= 0, category_codes[np.clip(idx, 0, None)], -1)
+            _, full_votes = vote(full_scores, codes(full_indices), len(category_labels), strategies=(voting,))
+            _, stage_votes = vote(scores[audited], codes(indices[audited]), len(category_labels),
+                                  strategies=(voting,))
+            for position, row in enumerate(audited.tolist()):
+                full_accepted = full_votes[voting]['decision_similarity'][position] >= threshold_percent
+                full_decision = full_votes[voting]['winner'][position] if full_accepted else -1
+                if decided[row] >= 0:
+                    prefilter.record_audit(True, full_decision == decided[row])
+                else:
+                    accepted = stage_votes[voting]['decision_similarity'][position] >= threshold_percent
+                    prefilter.record_audit(False, full_decision == (stage_votes[voting]['winner'][position]
+                                                                    if accepted else -1))
+    except Exception as e:
+        print(f"❌ Error during search: {e}")
+        return None, None, None, None
+    return scores, indices, decided, centroid_similarity
+
+
+def print_vote_analysis(voting, details, breakdown, n_incidents):
+    """Print the per-category analysis for a vote"""
+    if voting == 'frequency':
+        print("\n📊 FREQUENCY ANALYSIS:")
+        print("-" * 60)
+        print(f"Total incidents analyzed: {n_incidents}")
+        print(f"\nCategory Frequency Distribution:")
+        for category, stats in sorted(breakdown.items(), key=lambda x: x[1]['count'], reverse=True):
+            print(f"  • {category}: {stats['count']}/{n_incidents} occurrences (Avg Similarity: {stats['simple_avg_similarity']:.2f}%)")
+        print(f"\n🏆 Most Frequent Category: '{details['most_frequent_category']}' ({details['frequency_count']}/{n_incidents} occurrences)")
+        print(f"📈 Average Similarity for '{details['most_frequent_category']}': {details['avg_similarity']:.2f}%")
+    else:
+        print("\n📊 WEIGHTED SIMILARITY ANALYSIS:")
+        print("-" * 60)
+        print(f"Total incidents analyzed: {n_incidents}")
+        print(f"\nWeighted Category Analysis:\n")
+        for category, stats in sorted(breakdown.items(), key=lambda x: x[1]['confidence'], reverse=True):
+            print(f"  📌 {category}:")
+            print(f"     • Occurrences: {stats['count']}/{n_incidents}")
+            print(f"     • Total Weight: {stats['total_weight']:.4f}")
+            print(f"     • Weighted Avg Similarity: {stats['weighted_avg_similarity']:.2f}%")
+            print(f"     • Simple Avg Similarity: {stats['simple_avg_similarity']:.2f}%")
+            print(f"     • Max Similarity: {stats['max_similarity']:.2f}%")
+            print(f"     • Confidence Score: {stats['confidence']:.2f}%")
+            print()
+        if 'confidence' in details:
+            print(f"🏆 Best Category: '{details['best_category']}'")
+            print(f"   Confidence Score: {details['confidence']:.2f}%")
+            print(f"   Weighted Avg Similarity: {details['weighted_avg_similarity']:.2f}%")
 
-def process_new_incident(new_description, db_config, faiss_indexer):
-    """Process new incident using weighted similarity voting"""
-    
-    print("
-" + "="*60)
+
+def format_timings(timings):
+    """'embed 1.2 ms · search 0.3 ms · ...' for a result's timings dict"""
+    return " · ".join(f"{stage[:-3]} {ms:.2f} ms" for stage, ms in timings.items())
+
+
+def print_result_summary(result):
+    """One line per incident (verbosity 1)"""
+    print(f"📌 {result.assigned_tag} | {result.method} | {result.decision_similarity:.2f}% | "
+          f"{result.timings.get('total_ms', 0.0):.2f} ms | {result.description[:70]}")
+
+
+def print_incident_report(result, breakdown, top_k, threshold_percent):
+    """Full analysis of one categorized incident (verbosity 2)"""
+    print("\n" + "="*60)
     print("🔍 PROCESSING NEW INCIDENT")
     print("="*60)
-    print(f"Description: {new_description}")
-    
-    df, category_col = db_config.get_data()
-    embedding_function = db_config.embedding_function
-    
-    print("
-[VECTOR] Generating embedding for new incident...")
+    print(f"Description: {result.description}")
+
+    if result.method in (EXACT_MATCH, NEAR_DUPLICATE_MATCH):
+        match = result.similar_incidents[0]
+        print(f"\n[DUPLICATE] {result.method} with historical incident #{match['index']} "
+              f"({match['similarity']:.2f}%): skipped embedding and search")
+        print(f"   Description: {match['description'][:70]}...")
+        n_rows = sum(stats['count'] for stats in breakdown.values())
+        print_vote_analysis(result.voting, result.details, breakdown, n_rows)
+    elif result.method == CENTROID_MATCH:
+        print(f"\n[PREFILTER] {result.best_category} centroid at {result.decision_similarity:.2f}% "
+              f"clearly ahead of every other category: skipped the neighbor search")
+    elif result.get('neighbors_in_range') == 0:
+        print(f"\n[SEARCH] No similar incidents within the search radius: skipped voting")
+        print("🤖 Calling AI categorization function...")
+        print(f"📌 Assigned tag from AI: '{result.assigned_tag}'")
+    else:
+        print_search_report(result, breakdown, top_k, threshold_percent)
+
+    print("\n" + "="*60)
+    print("✨ FINAL RESULT")
+    print("="*60)
+    print(f"New Incident: {result.description}")
+    print(f"Assigned Tag: {result.assigned_tag}")
+    print(f"Best Category: {result.best_category}")
+    print(f"Decision Similarity: {result.decision_similarity:.2f}%")
+    print(f"Method: {result.method}")
+    print(f"Timings: {format_timings(result.timings)}")
+    print("="*60)
+
+
+def print_search_report(result, breakdown, top_k, threshold_percent):
+    """Neighbors, vote analysis and decision of a vector-search result"""
+    print("\n[VECTOR] Generating embedding for new incident...")
+    print("✅ Embedding generated")
+    print(f"\n[SEARCH] Finding top {top_k} similar incidents using FAISS...")
+    print(f"✅ Found {len(result.similar_incidents)} similar incidents")
+    print(f"\n📊 TOP {len(result.similar_incidents)} SIMILAR INCIDENTS:")
+    print("-" * 60)
+    for inc in result.similar_incidents:
+        print(f"{inc['rank']}. Similarity: {inc['similarity']:.2f}%")
+        if result.voting == 'weighted':
+            print(f"   Weight: {(inc['similarity'] / 100) ** 2:.4f}")
+        print(f"   Tag: {inc['tag']}")
+        print(f"   Description: {inc['description'][:70]}...")
+        print()
+
+    print_vote_analysis(result.voting, result.details, breakdown, len(result.similar_incidents))
+    print(f"🎯 Threshold: {threshold_percent}%")
+
+    print("\n[DECISION] Making categorization decision...")
+    if result.method != AI_GENERATED:
+        print(f"✅ Similarity ({result.decision_similarity:.2f}%) >= Threshold ({threshold_percent}%)")
+        print(f"📌 Assigning tag: '{result.assigned_tag}'")
+    else:
+        print(f"⚠️ Similarity ({result.decision_similarity:.2f}%) < Threshold ({threshold_percent}%)")
+        print("🤖 Calling AI categorization function...")
+        print(f"📌 Assigned tag from AI: '{result.assigned_tag}'")
+
+
+# ============================================
+# SINGLE INCIDENT
+# ============================================
+def process_new_incident(new_description, db_config, faiss_indexer, voting=DEFAULT_VOTING,
+                         verbosity=None, sink=None, ai_fallback=None):
+    """Process new incident using frequency or weighted similarity voting
+
+    The categorization itself is silent; the report is printed afterwards
+    according to `verbosity` (default VERBOSITY), and the result is also
+    written to `sink` (e.g. a JsonLinesSink) when given. Returns a
+    CategorizationResult with per-stage timings in milliseconds.
+    Descriptions already in the duplicate index return straight away
+    (method EXACT_MATCH / NEAR_DUPLICATE_MATCH) without embedding.
+    `ai_fallback(description, verbose=...)` replaces ai_categorization;
+    an AIFallback (cached, batched) also gets the query embedding.
+    """
+    verbosity = VERBOSITY if verbosity is None else verbosity
+    ai_fallback = ai_fallback or ai_categorization
+    get_strategy(voting)
+    timings = {}
+    started = stage_start = time.perf_counter()
+
+    match = db_config.duplicate_index.lookup(new_description) if db_config.duplicate_index is not None else None
+    if match is not None:
+        result, breakdown = duplicate_result(new_description, match, db_config, voting,
+                                             (time.perf_counter() - started) * 1000)
+        report_result(result, breakdown, faiss_indexer, verbosity, sink)
+        return result
+
     try:
-        new_embedding = embedding_function([new_description])[0]
-        print("✅ Embedding generated")
+        new_embedding = db_config.embed_query(new_description)
     except Exception as e:
-        print(f"❌ Error generating embedding: {e}")
+        if verbosity:
+            print(f"❌ Error generating embedding: {e}")
         return None
-    
-    print(f"
-[SEARCH] Finding top {faiss_indexer.get_top_k()} similar incidents using FAISS...")
-    scores, indices = faiss_indexer.search_similar(new_embedding)
-    
+    now = time.perf_counter()
+    timings['embed_ms'], stage_start = (now - stage_start) * 1000, now
+
+    scores, indices, decided, centroid_similarity = two_stage_search(new_embedding[None, :], db_config,
+                                                                     faiss_indexer, voting)
     if scores is None or indices is None:
-        print("❌ Search failed")
+        if verbosity:
+            print("❌ Search failed")
         return None
-    
-    print(f"✅ Found {len(indices)} similar incidents")
-    print("
-📊 TOP 10 SIMILAR INCIDENTS:")
-    print("-" * 60)
-    
-    similar_incidents = []
-    category_weighted_scores = {}
-    
-    for i, (idx, score) in enumerate(zip(indices, scores)):
-        similarity_percent = score * 100
-        incident = df.iloc[idx]
-        category_tag = str(incident[category_col])
-        
-        similar_incidents.append({
-            'rank': i + 1,
-            'index': int(idx),
-            'similarity': float(similarity_percent),
-            'description': str(incident['Description']),
-            'tag': category_tag
-        })
-        
-        # Weighted scoring: weight = similarity^2 (emphasizes high similarity)
-        weight = score ** 2
-        
-        if category_tag not in category_weighted_scores:
-            category_weighted_scores[category_tag] = {
-                'total_weight': 0,
-                'similarities': [],
-                'count': 0,
-                'max_similarity': 0
-            }
-        
-        category_weighted_scores[category_tag]['total_weight'] += weight
-        category_weighted_scores[category_tag]['similarities'].append(similarity_percent)
-        category_weighted_scores[category_tag]['count'] += 1
-        category_weighted_scores[category_tag]['max_similarity'] = max(
-            category_weighted_scores[category_tag]['max_similarity'], 
-            similarity_percent
-        )
-        
-        print(f"{i+1}. Similarity: {similarity_percent:.2f}%")
-        print(f"   Weight: {weight:.4f}")
-        print(f"   Tag: {category_tag}")
-        print(f"   Description: {incident['Description'][:70]}...")
-        print()
-    
-    print("
-📊 WEIGHTED SIMILARITY ANALYSIS:")
-    print("-" * 60)
-    
-    # Calculate weighted averages and confidence scores
-    for category in category_weighted_scores:
-        stats = category_weighted_scores[category]
-        
-        # Weighted average similarity
-        stats['weighted_avg_similarity'] = (stats['total_weight'] / stats['count']) * 100
-        
-        # Simple average similarity
-        stats['simple_avg_similarity'] = np.mean(stats['similarities'])
-        
-        # Confidence score: 70% weighted avg + 30% max similarity
-        stats['confidence'] = (stats['weighted_avg_similarity'] * 0.7) + (stats['max_similarity'] * 0.3)
-    
-    print(f"Total incidents analyzed: {len(similar_incidents)}")
-    print(f"
-Weighted Category Analysis:
-")
-    
-    # Sort by confidence score
-    sorted_categories = sorted(
-        category_weighted_scores.items(), 
-        key=lambda x: x[1]['confidence'], 
-        reverse=True
-    )
-    
-    for category, stats in sorted_categories:
-        print(f"  📌 {category}:")
-        print(f"     • Occurrences: {stats['count']}/{len(similar_incidents)}")
-        print(f"     • Total Weight: {stats['total_weight']:.4f}")
-        print(f"     • Weighted Avg Similarity: {stats['weighted_avg_similarity']:.2f}%")
-        print(f"     • Simple Avg Similarity: {stats['simple_avg_similarity']:.2f}%")
-        print(f"     • Max Similarity: {stats['max_similarity']:.2f}%")
-        print(f"     • Confidence Score: {stats['confidence']:.2f}%")
-        print()
-    
-    # Select best category
-    best_category = sorted_categories[0][0]
-    best_stats = sorted_categories[0][1]
-    
-    print(f"🏆 Best Category: '{best_category}'")
-    print(f"   Confidence Score: {best_stats['confidence']:.2f}%")
-    print(f"   Weighted Avg Similarity: {best_stats['weighted_avg_similarity']:.2f}%")
-    print(f"🎯 Threshold: {faiss_indexer.get_threshold() * 100}%")
-    
-    print("
-[DECISION] Making categorization decision...")
-    
-    # Use weighted average similarity for threshold comparison
-    if best_stats['weighted_avg_similarity'] >= (faiss_indexer.get_threshold() * 100):
-        assigned_tag = best_category
-        
-        print(f"✅ Weighted avg similarity ({best_stats['weighted_avg_similarity']:.2f}%) >= Threshold ({faiss_indexer.get_threshold() * 100}%)")
-        print(f"📌 Assigning tag: '{assigned_tag}'")
-        print(f"   (Highest confidence category with {best_stats['count']} occurrences)")
-        method = "Weighted Similarity Voting"
-        
+    scores, indices = scores[0], indices[0]
+    now = time.perf_counter()
+    timings['search_ms'], stage_start = (now - stage_start) * 1000, now
+
+    if decided is not None and decided[0] >= 0:
+        timings.update(vote_ms=0.0, ai_fallback_ms=0.0, total_ms=(now - started) * 1000)
+        result = centroid_result(new_description, decided[0], centroid_similarity[0], db_config, voting, timings)
+        report_result(result, {}, faiss_indexer, verbosity, sink)
+        return result
+
+    if not (indices >= 0).any():
+        # Nothing within the search radius: no neighbors to look up or vote on
+        timings['vote_ms'] = 0.0
+        assigned_tag = call_ai_fallback(ai_fallback, new_description, new_embedding)
+        now = time.perf_counter()
+        timings['ai_fallback_ms'] = (now - stage_start) * 1000
+        timings['total_ms'] = (now - started) * 1000
+        result = no_neighbor_result(new_description, assigned_tag, voting, timings)
+        report_result(result, {}, faiss_indexer, verbosity, sink)
+        return result
+
+    category_codes, category_labels = db_config.get_category_codes()
+    neighbor_codes, neighbor_descriptions = lookup_neighbors(indices, db_config)
+    similar_incidents = collect_similar_incidents(indices, scores, neighbor_codes[0],
+                                                  neighbor_descriptions[0], category_labels)
+    stats, votes = vote(scores[None, :], neighbor_codes, len(category_labels), strategies=(voting,),
+                        neighbor_weights=neighbor_weights(faiss_indexer, indices[None, :]))
+    strategy_vote = votes[voting]
+    breakdown = category_breakdown(stats, 0, category_labels, neighbor_codes[0], scores)
+    details = vote_details(voting, strategy_vote, 0, breakdown, category_labels)
+    now = time.perf_counter()
+    timings['vote_ms'], stage_start = (now - stage_start) * 1000, now
+
+    if strategy_vote['decision_similarity'][0] >= faiss_indexer.get_threshold() * 100:
+        assigned_tag = category_labels[strategy_vote['winner'][0]]
+        method = strategy_vote['method']
     else:
-        print(f"⚠️ Weighted avg similarity ({best_stats['weighted_avg_similarity']:.2f}%) < Threshold ({faiss_indexer.get_threshold() * 100}%)")
-        print("🤖 Calling AI categorization function...")
-        
-        assigned_tag = ai_categorization(new_description)
-        print(f"📌 Assigned tag from AI: '{assigned_tag}'")
-        method = "AI Generated"
-    
-    print("
-" + "="*60)
-    print("✨ FINAL RESULT")
-    print("="*60)
-    print(f"New Incident: {new_description}")
-    print(f"Assigned Tag: {assigned_tag}")
-    print(f"Best Category: {best_category}")
-    print(f"Confidence Score: {best_stats['confidence']:.2f}%")
-    print(f"Weighted Avg Similarity: {best_stats['weighted_avg_similarity']:.2f}%")
-    print(f"Method: {method}")
-    print("="*60)
-    
-    return {
-        'description': new_description,
-        'assigned_tag': assigned_tag,
-        'best_category': best_category,
-        'confidence': best_stats['confidence'],
-        'weighted_avg_similarity': best_stats['weighted_avg_similarity'],
-        'category_stats': category_weighted_scores,
-        'similar_incidents': similar_incidents,
-        'method': method
+        assigned_tag = call_ai_fallback(ai_fallback, new_description, new_embedding)
+        method = AI_GENERATED
+    now = time.perf_counter()
+    timings['ai_fallback_ms'] = (now - stage_start) * 1000
+    timings['total_ms'] = (now - started) * 1000
+
+    result = build_result(new_description, voting, strategy_vote, 0, category_labels,
+                          similar_incidents, details, assigned_tag, method, timings)
+    report_result(result, breakdown, faiss_indexer, verbosity, sink)
+    return result
+
+
+def call_ai_fallback(ai_fallback, description, embedding):
+    """Tag one description with the AI fallback (an AIFallback also gets its embedding)"""
+    if hasattr(ai_fallback, 'categorize_many'):
+        return ai_fallback.categorize_many([description], embedding[None, :])[0]
+    return ai_fallback(description, verbose=False)
+
+
+def report_result(result, breakdown, faiss_indexer, verbosity, sink=None):
+    """Print a result according to verbosity and write it to the sink"""
+    if verbosity >= 2:
+        print_incident_report(result, breakdown, faiss_indexer.get_top_k(), faiss_indexer.get_threshold() * 100)
+    elif verbosity == 1:
+        print_result_summary(result)
+    if sink is not None:
+        sink.write(result)
+
+
+# ============================================
+# BATCH OF INCIDENTS
+# ============================================
+def process_incidents_batch(descriptions, db_config, faiss_indexer, voting=DEFAULT_VOTING,
+                            batch_size=BATCH_SIZE, verbosity=None, sink=None, ai_fallback=None):
+    """Categorize many incidents: one embedding call and one matrix search per chunk
+
+    Returns one CategorizationResult per description, with the same content
+    process_new_incident returns for that description. Duplicates of
+    historical descriptions are answered from the duplicate index and never
+    embedded. The embed, search and vote timings are the chunk's totals
+    amortized over its searched rows; the AI fallback time is amortized
+    over the rows that fell back. `ai_fallback` is as in
+    process_new_incident; an AIFallback gets all of a chunk's fallback rows
+    in a single call.
+    """
+    verbosity = VERBOSITY if verbosity is None else verbosity
+    ai_fallback = ai_fallback or ai_categorization
+    get_strategy(voting)
+    descriptions = ["" if d is None else str(d) for d in descriptions]
+
+    results = []
+    for start in range(0, len(descriptions), batch_size):
+        chunk = descriptions[start:start + batch_size]
+        chunk_results = [None] * len(chunk)
+        searched_rows = list(range(len(chunk)))
+        if db_config.duplicate_index is not None:
+            searched_rows = []
+            for row, description in enumerate(chunk):
+                lookup_start = time.perf_counter()
+                match = db_config.duplicate_index.lookup(description)
+                if match is None:
+                    searched_rows.append(row)
+                    continue
+                chunk_results[row], _ = duplicate_result(description, match, db_config, voting,
+                                                         (time.perf_counter() - lookup_start) * 1000)
+
+        if searched_rows:
+            searched = search_chunk([chunk[row] for row in searched_rows], db_config, faiss_indexer,
+                                    voting, verbosity, ai_fallback)
+            for row, result in zip(searched_rows, searched):
+                chunk_results[row] = result
+
+        if sink is not None:
+            for result in chunk_results:
+                if result is not None:
+                    sink.write(result)
+        results.extend(chunk_results)
+
+        if verbosity:
+            print(f"✅ Categorized {min(start + batch_size, len(descriptions))}/{len(descriptions)} incidents")
+
+    return results
+
+
+def search_chunk(chunk, db_config, faiss_indexer, voting, verbosity, ai_fallback):
+    """Embed, search and vote a chunk of descriptions in one pass (None per row on failure)"""
+    category_codes, category_labels = db_config.get_category_codes()
+    threshold_percent = faiss_indexer.get_threshold() * 100
+    stage_start = time.perf_counter()
+    embeddings = db_config.embed_texts(chunk)
+    embedded = time.perf_counter()
+    scores, indices, decided, centroid_similarity = two_stage_search(embeddings, db_config, faiss_indexer, voting)
+    searched = time.perf_counter()
+    if scores is None or indices is None:
+        return [None] * len(chunk)
+    if decided is None:
+        decided = np.full(len(chunk), -1)
+
+    neighbor_codes, neighbor_descriptions = lookup_neighbors(indices, db_config)
+    stats, votes = vote(scores, neighbor_codes, len(category_labels), strategies=(voting,),
+                        neighbor_weights=neighbor_weights(faiss_indexer, indices))
+    strategy_vote = votes[voting]
+    in_range = (indices >= 0).any(axis=1)  # False when a range search found nothing
+    accepted = (strategy_vote['decision_similarity'] >= threshold_percent) & in_range
+    voted = time.perf_counter()
+    shared = {
+        'embed_ms': (embedded - stage_start) * 1000 / len(chunk),
+        'search_ms': (searched - embedded) * 1000 / len(chunk),
+        'vote_ms': (voted - searched) * 1000 / len(chunk),
     }
 
+    # Every below-threshold row of the chunk goes to the AI fallback in one go
+    fallback_rows = np.nonzero(~accepted & (decided < 0))[0]
+    fallback_start = time.perf_counter()
+    if len(fallback_rows) and hasattr(ai_fallback, 'categorize_many'):
+        tags = ai_fallback.categorize_many([chunk[row] for row in fallback_rows], embeddings[fallback_rows])
+        fallback_tags = dict(zip(fallback_rows.tolist(), tags))
+    else:
+        fallback_tags = {row: ai_fallback(chunk[row], verbose=verbosity >= 2) for row in fallback_rows.tolist()}
+    fallback_ms = (time.perf_counter() - fallback_start) * 1000 / max(1, len(fallback_rows))
 
-if __name__ == "__main__":
-    db_config, faiss_indexer = initialize_system()
-    
-    print("
+    results = []
+    for row, description in enumerate(chunk):
+        if decided[row] >= 0:
+            timings = dict(shared, vote_ms=0.0, ai_fallback_ms=0.0)
+            timings['total_ms'] = sum(timings.values())
+            results.append(centroid_result(description, decided[row], centroid_similarity[row], db_config,
+                                           voting, timings))
+            continue
+        if not in_range[row]:
+            timings = dict(shared, vote_ms=0.0, ai_fallback_ms=fallback_ms)
+            timings['total_ms'] = sum(timings.values())
+            results.append(no_neighbor_result(description, fallback_tags[row], voting, timings))
+            continue
+        similar_incidents = collect_similar_incidents(indices[row], scores[row], neighbor_codes[row],
+                                                      neighbor_descriptions[row], category_labels)
+        breakdown = category_breakdown(stats, row, category_labels, neighbor_codes[row], scores[row])
+        details = vote_details(voting, strategy_vote, row, breakdown, category_labels)
+        timings = dict(shared)
+        if accepted[row]:
+            assigned_tag = category_labels[strategy_vote['winner'][row]]
+            method = strategy_vote['method']
+            timings['ai_fallback_ms'] = 0.0
+        else:
+            assigned_tag, method = fallback_tags[row], AI_GENERATED
+            timings['ai_fallback_ms'] = fallback_ms
+        timings['total_ms'] = sum(timings.values())
+        results.append(build_result(description, voting, strategy_vote, row, category_labels,
+                                    similar_incidents, details, assigned_tag, method, timings))
+    return results
 
-" + "="*60)
+
+def run_batch_file(input_csv, output_csv, db_config, faiss_indexer, voting=DEFAULT_VOTING,
+                   batch_size=BATCH_SIZE, description_col='Description', verbosity=None, sink=None,
+                   ai_fallback=None):
+    """Categorize every row of input_csv and write one result row per incident to output_csv"""
+    verbosity = VERBOSITY if verbosity is None else verbosity
+    if verbosity:
+        print(f"\n[BATCH] Reading incidents from {input_csv}...")
+    with open(input_csv, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        if description_col not in (reader.fieldnames or []):
+            print(f"❌ '{description_col}' column not found in {input_csv}")
+            return None
+        descriptions = [row[description_col] for row in reader]
+    if verbosity:
+        print(f"✅ Loaded {len(descriptions)} incidents")
+
+    results = process_incidents_batch(descriptions, db_config, faiss_indexer, voting=voting,
+                                      batch_size=batch_size, verbosity=verbosity, sink=sink,
+                                      ai_fallback=ai_fallback)
+
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Description', 'AssignedTag', 'Method', 'BestCategory', 'Similarity', 'TotalMs'])
+        for description, result in zip(descriptions, results):
+            if result is None:
+                writer.writerow([description, '', 'Error', '', '', ''])
+                continue
+            writer.writerow([description, result.assigned_tag, result.method, result.best_category,
+                             f"{result.decision_similarity:.2f}", f"{result.timings['total_ms']:.3f}"])
+
+    if verbosity:
+        print(f"✅ Wrote {len(results)} results to {output_csv}")
+    return results
+
+
+def corpus_embeddings(db_config, faiss_indexer, bundle_dir=BUNDLE_DIR):
+    """Float32 vectors of every live row: the kept matrix, the bundle's copy, or re-embedded"""
+    if faiss_indexer.embeddings_array is not None:
+        return faiss_indexer.embeddings_array
+    bundle_file = os.path.join(bundle_dir, EMBEDDINGS_FILE)
+    if os.path.exists(bundle_file):
+        embeddings = np.load(bundle_file, mmap_mode="r")
+        if len(embeddings) < len(db_config.store):
+            # Incidents learned since the bundle was written
+            learned = db_config.store.descriptions(np.arange(len(embeddings), len(db_config.store)))
+            embeddings = np.concatenate([embeddings, db_config.embed_texts(learned.tolist())])
+        if len(embeddings) == len(db_config.store):
+            return embeddings
+    embeddings, _ = db_config.generate_embeddings()
+    return embeddings
+
+
+def run_index_report(db_config, faiss_indexer, specs, n_queries=1000):
+    """Print recall@k and vote agreement of the given index specs against the exact flat index"""
+    embeddings = corpus_embeddings(db_config, faiss_indexer)
+    category_codes, category_labels = db_config.get_category_codes()
+    report = index_quality_report(
+        embeddings, category_codes, len(category_labels), specs,
+        top_k=faiss_indexer.get_top_k(), similarity_threshold=faiss_indexer.get_threshold(),
+        n_queries=n_queries, nlist=faiss_indexer.nlist, nprobe=faiss_indexer.nprobe,
+        hnsw_m=faiss_indexer.hnsw_m, ef_search=faiss_indexer.ef_search,
+        pq_m=faiss_indexer.pq_m, pq_nbits=faiss_indexer.pq_nbits
+    )
+    print_index_quality_report(report)
+    return report
+
+
+def run_precision_report(db_config, faiss_indexer, precisions, n_queries=None):
+    """Print neighbor and vote agreement of reduced storage precisions against float32"""
+    embeddings = corpus_embeddings(db_config, faiss_indexer)
+    category_codes, category_labels = db_config.get_category_codes()
+    report = precision_accuracy_report(
+        embeddings, category_codes, len(category_labels), precisions, index_spec=faiss_indexer.index_spec,
+        top_k=faiss_indexer.get_top_k(), similarity_threshold=faiss_indexer.get_threshold(),
+        n_queries=n_queries, nlist=faiss_indexer.nlist, nprobe=faiss_indexer.nprobe,
+        hnsw_m=faiss_indexer.hnsw_m, ef_search=faiss_indexer.ef_search
+    )
+    print_index_quality_report(report, title=f"STORAGE PRECISION REPORT ({faiss_indexer.index_spec} "
+                                             f"index, vs float32)")
+    return report
+
+
+def print_prefilter_stats(stats):
+    """How often the category prefilter decided, narrowed or fell through, and audited disagreement"""
+    print(f"ℹ️ Category prefilter: {stats['decided_rate']:.1%} decided by centroids, "
+          f"{stats['restricted_rate']:.1%} searched in candidate categories, "
+          f"{stats['full']} of {stats['queries']} searched in full")
+    if stats['audited_decided'] or stats['audited_restricted']:
+        print(f"ℹ️ Disagreement with the full search: {stats['decided_disagreement_rate']:.2%} of "
+              f"{stats['audited_decided']} audited centroid decisions, "
+              f"{stats['restricted_disagreement_rate']:.2%} of {stats['audited_restricted']} audited "
+              f"restricted searches")
+
+
+def run_prefilter_report(db_config, faiss_indexer, descriptions, voting=DEFAULT_VOTING):
+    """Compare the two-stage search against the full search on `descriptions`
+
+    Runs every description one at a time through process_new_incident
+    with and without the prefilter (duplicate fast path off, so every
+    query reaches the search), then audits all of them in one batch.
+    """
+    prefilter, duplicate_index = faiss_indexer.prefilter, db_config.duplicate_index
+    # Offline stand-in model: the report times the search paths, not the AI fallback
+    ai_fallback = AIFallback(StubAIModel(), max_wait_ms=0)
+    db_config.duplicate_index = None
+    try:
+        latencies = {}
+        for name, stage_prefilter in (("full", None), ("two_stage", prefilter)):
+            faiss_indexer.prefilter = stage_prefilter
+            started = time.perf_counter()
+            for description in descriptions:
+                process_new_incident(description, db_config, faiss_indexer, voting=voting, verbosity=0,
+                                     ai_fallback=ai_fallback)
+            latencies[name] = (time.perf_counter() - started) * 1000 / max(1, len(descriptions))
+        prefilter.reset_stats()
+        audit_rate, prefilter.audit_rate = prefilter.audit_rate, 1.0
+        process_incidents_batch(descriptions, db_config, faiss_indexer, voting=voting, verbosity=0,
+                                ai_fallback=ai_fallback)
+        prefilter.audit_rate = audit_rate
+    finally:
+        faiss_indexer.prefilter, db_config.duplicate_index = prefilter, duplicate_index
+
+    print("\n" + "="*60)
+    print(f"📊 CATEGORY PREFILTER REPORT ({len(descriptions)} queries)")
+    print("="*60)
+    print(f"Prefilter: {prefilter.describe()}")
+    print(f"Per-query latency: {latencies['full']:.3f} ms full search, "
+          f"{latencies['two_stage']:.3f} ms two-stage")
+    stats = prefilter.stats()
+    print_prefilter_stats(stats)
+    return dict(stats, full_ms=latencies['full'], two_stage_ms=latencies['two_stage'])
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Incident categorization system")
+    parser.add_argument('--input', help="CSV of new incidents to categorize (non-interactive mode)")
+    parser.add_argument('--output', default="results.csv", help="Where to write batch results")
+    parser.add_argument('--voting', choices=sorted(VOTING_STRATEGIES), default=DEFAULT_VOTING)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--index', choices=INDEX_SPECS, default=INDEX_SPEC, help="FAISS index type")
+    parser.add_argument('--nlist', type=int, help="IVF list count (default: ~4*sqrt(n))")
+    parser.add_argument('--nprobe', type=int, help="IVF lists visited per query")
+    parser.add_argument('--ef-search', type=int, help="HNSW efSearch")
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD,
+                        help="Similarity threshold (0-1) below which incidents go to AI")
+    parser.add_argument('--top-k', type=int, default=TOP_K, help="Neighbors voted on per incident")
+    parser.add_argument('--search-mode', choices=SEARCH_MODES, default=SEARCH_MODE,
+                        help="knn: always top k neighbors; range: at most top k above --radius")
+    parser.add_argument('--radius', type=float, help="Similarity radius of range search (default: --threshold)")
+    parser.add_argument('--precision', choices=STORAGE_PRECISIONS, default=STORAGE_PRECISION,
+                        help="How flat / ivf_flat / hnsw indexes store vectors")
+    parser.add_argument('--keep-embeddings', action='store_true',
+                        help="Keep the dense float32 embedding matrix in memory after the index is built")
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Split the index into this many shards searched in parallel (1 = one index)")
+    parser.add_argument('--shard-key', choices=SHARD_KEYS,
+                        help=f"Partition by row id hash, Date range, or --shard-column value (default: {SHARD_KEY})")
+    parser.add_argument('--shard-column', help="Column whose values pick the shard with --shard-key column")
+    parser.add_argument('--partition-by', choices=PERIODS,
+                        help="Split the index into per-period partitions of the Date column")
+    parser.add_argument('--recent-periods', type=int, default=RECENT_PERIODS,
+                        help="With --partition-by, search only the newest N periods")
+    parser.add_argument('--recency-half-life', type=float, default=RECENCY_HALF_LIFE,
+                        help="With --partition-by, halve a neighbor's vote every this many periods of age")
+    parser.add_argument('--resident-mb', type=float, default=MAX_RESIDENT_MB,
+                        help="With --partition-by, partition indexes kept in memory (older ones load on demand)")
+    parser.add_argument('--shard-executor', choices=SHARD_EXECUTORS,
+                        help=f"Search shards from threads in this process or from one process per shard "
+                             f"(default: {SHARD_EXECUTOR})")
+    parser.add_argument('--chroma', choices=CHROMA_MODES,
+                        help=f"ChromaDB collection: in-memory, persistent on disk, or skipped "
+                             f"(default: {CHROMA_MODE}, skip with --stream)")
+    parser.add_argument('--stream', action='store_true',
+                        help="Read and index the CSV in chunks, keeping only the columns used for voting")
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS,
+                        help="Rows per chunk with --stream")
+    parser.add_argument('--embed-workers', type=int, default=EMBED_WORKERS,
+                        help="Processes embedding the corpus on a cold start (0 = one per CPU core)")
+    parser.add_argument('--onnx-threads', type=int, default=ONNX_THREADS,
+                        help="ONNX Runtime intra-op threads per embedding process (0 = cores / workers)")
+    parser.add_argument('--learn', action='store_true',
+                        help="Add each categorized incident to the live index (logged to the WAL)")
+    parser.add_argument('--checkpoint', action='store_true',
+                        help="Fold the write-ahead log into the CSV, then exit")
+    parser.add_argument('--index-report', metavar="SPECS",
+                        help="Comma-separated index specs to compare against the flat index, then exit")
+    parser.add_argument('--precision-report', metavar="PRECISIONS",
+                        help="Comma-separated storage precisions to compare against float32 over the "
+                             "whole corpus, then exit")
+    parser.add_argument('--prefilter', action='store_true',
+                        help="Score queries against per-category centroids first; decide or narrow the search")
+    parser.add_argument('--sub-centroids', type=int, default=SUB_CENTROIDS,
+                        help="Centroids per category with --prefilter")
+    parser.add_argument('--audit-rate', type=float, default=AUDIT_RATE,
+                        help="Share of prefiltered queries also searched in full to count disagreements")
+    parser.add_argument('--prefilter-report', type=int, metavar="N",
+                        help="Compare the prefiltered and full search on N incidents (from --input, else "
+                             "sampled from the corpus), then exit")
+    parser.add_argument('--no-duplicate-index', action='store_true',
+                        help="Always embed and search, even for verbatim repeats of historical incidents")
+    parser.add_argument('--near-duplicates', action='store_true',
+                        help="Also answer near-duplicates from a MinHash index (more memory at load)")
+    parser.add_argument('--no-ai-cache', action='store_true',
+                        help="Call ai_categorization per incident instead of the cached, batched fallback")
+    parser.add_argument('--verbosity', type=int, choices=(0, 1, 2), default=VERBOSITY,
+                        help="0 = silent, 1 = one summary line per incident, 2 = full analysis")
+    parser.add_argument('--quiet', dest='verbosity', action='store_const', const=0,
+                        help="Same as --verbosity 0")
+    parser.add_argument('--jsonl', metavar="PATH",
+                        help="Append one JSON result per incident to PATH ('-' for stdout)")
+    parser.add_argument('--jsonl-neighbors', action='store_true',
+                        help="Include similar incidents and category stats in the JSON lines")
+    args = parser.parse_args(argv)
+    sharded = args.shards > 1 or args.shard_key == "column"
+    if not sharded and (args.shard_key or args.shard_executor):
+        parser.error("--shard-key / --shard-executor need --shards > 1 (or --shard-key column)")
+    if args.shard_column and args.shard_key != "column":
+        parser.error("--shard-column needs --shard-key column")
+    args.shard_key = args.shard_key or SHARD_KEY
+    args.shard_executor = args.shard_executor or SHARD_EXECUTOR
+    if sharded and args.partition_by:
+        parser.error("--partition-by cannot be combined with --shards / --shard-key column")
+    if (args.prefilter or args.prefilter_report) and (sharded or args.partition_by):
+        # The category centroids live on the single index, which sharding and partitioning replace
+        parser.error("--prefilter / --prefilter-report need the single index "
+                     "(not --shards, --shard-key column or --partition-by)")
+    if (args.index_report or args.precision_report) and (sharded or args.partition_by):
+        # Both reports rebuild the single index with other parameters
+        parser.error("--index-report / --precision-report need the single index "
+                     "(not --shards, --shard-key column or --partition-by)")
+    if args.learn and args.shard_executor == "process":
+        parser.error("--learn needs --shard-executor thread (process-served shards are read-only)")
+    return args
+
+
+def read_incidents(verbosity):
+    """Yield descriptions typed at the prompt, or piped in one per line when silent"""
+    if verbosity == 0:
+        for line in sys.stdin:
+            if line.strip():
+                yield line.strip()
+        return
+
+    print("\n\n" + "="*60)
     print("🎯 READY FOR NEW INCIDENT INPUT")
     print("="*60)
-    
-    print("
-Enter new incident description (or 'quit' to exit):")
+
+    print("\nEnter new incident description (or 'quit' to exit):")
     while True:
-        user_input = input("
->>> ").strip()
-        
+        try:
+            user_input = input("\n>>> ").strip()
+        except EOFError:
+            user_input = "quit"
+
         if user_input.lower() in ['quit', 'exit', 'q']:
-            print("
-👋 Exiting system. Goodbye!")
-            break
-        
+            print("\n👋 Exiting system. Goodbye!")
+            return
+
         if not user_input:
             print("⚠️ Please enter a valid description")
             continue
-        
-        result = process_new_incident(user_input, db_config, faiss_indexer)
-        
-        print("
-" + "-"*60)
-        print("Enter another incident description (or 'quit' to exit):")
\ No newline at end of file
+
+        yield user_input
+
+        print("\n" + "-"*60)
+        print("Enter another incident description (or 'quit' to exit):")
+
+
+def main(argv=None):
+    """Command-line entry point: set up the system, then categorize incidents"""
+    args = parse_args(argv)
+    index_params = {name: value for name, value in
+                    (('nlist', args.nlist), ('nprobe', args.nprobe), ('ef_search', args.ef_search))
+                    if value is not None}
+    index_params.update(storage_precision=args.precision, keep_embeddings=args.keep_embeddings,
+                        search_mode=args.search_mode, radius=args.radius)
+
+    # Keep stdout clean for JSON lines: setup messages go to stderr (or nowhere when silent)
+    if args.jsonl == "-" or args.verbosity == 0:
+        setup_output = contextlib.redirect_stdout(open(os.devnull, "w") if args.verbosity == 0 else sys.stderr)
+    else:
+        setup_output = contextlib.nullcontext()
+    with setup_output:
+        if args.verbosity:
+            print_banner()
+        db_config, faiss_indexer = initialize_system(index_spec=args.index, chroma_mode=args.chroma,
+                                                     stream=args.stream, chunk_rows=args.chunk_rows,
+                                                     duplicate_index=not args.no_duplicate_index,
+                                                     minhash=args.near_duplicates,
+                                                     embed_workers=args.embed_workers,
+                                                     onnx_threads=args.onnx_threads,
+                                                     prefilter=args.prefilter or bool(args.prefilter_report),
+                                                     sub_centroids=args.sub_centroids,
+                                                     audit_rate=args.audit_rate,
+                                                     similarity_threshold=args.threshold, top_k=args.top_k,
+                                                     **index_params)
+        if args.shards > 1 or args.shard_key == "column":
+            faiss_indexer = shard_system(db_config, faiss_indexer, n_shards=args.shards, shard_key=args.shard_key,
+                                         key_column=args.shard_column, executor=args.shard_executor)
+        elif args.partition_by:
+            faiss_indexer = partition_system(db_config, faiss_indexer, period=args.partition_by,
+                                             recent_periods=args.recent_periods,
+                                             recency_half_life=args.recency_half_life,
+                                             max_resident_mb=args.resident_mb)
+
+    if args.checkpoint:
+        checkpoint(db_config)
+        return
+
+    if args.index_report:
+        run_index_report(db_config, faiss_indexer, [spec.strip() for spec in args.index_report.split(',')])
+        return
+
+    if args.precision_report:
+        run_precision_report(db_config, faiss_indexer, [p.strip() for p in args.precision_report.split(',')])
+        return
+
+    if args.prefilter_report:
+        if args.input:
+            with open(args.input, newline="", encoding="utf-8") as f:
+                descriptions = [row['Description'] for row in csv.DictReader(f)]
+        else:
+            # Corpus rows find themselves, so this sample flatters both paths equally
+            rows = np.random.default_rng(0).choice(len(db_config.store), size=min(args.prefilter_report,
+                                                                                  len(db_config.store)),
+                                                   replace=False)
+            descriptions = db_config.store.descriptions(rows).tolist()
+        run_prefilter_report(db_config, faiss_indexer, descriptions[:args.prefilter_report], voting=args.voting)
+        return
+
+    sink = JsonLinesSink(args.jsonl, include_neighbors=args.jsonl_neighbors) if args.jsonl else None
+    ai_fallback = None if args.no_ai_cache else AIFallback()
+
+    if args.input:
+        run_batch_file(args.input, args.output, db_config, faiss_indexer, voting=args.voting,
+                       batch_size=args.batch_size, verbosity=args.verbosity, sink=sink,
+                       ai_fallback=ai_fallback)
+    else:
+        for description in read_incidents(args.verbosity):
+            result = process_new_incident(description, db_config, faiss_indexer, voting=args.voting,
+                                          verbosity=args.verbosity, sink=sink, ai_fallback=ai_fallback)
+            if args.learn and result is not None and result.assigned_tag != "Uncategorized":
+                learn_incidents([description], [result.assigned_tag], db_config, faiss_indexer)
+                if args.verbosity:
+                    print(f"🧠 Learned incident as '{result.assigned_tag}'")
+
+    if sink is not None:
+        sink.close()
+    if getattr(faiss_indexer, 'prefilter', None) is not None and args.verbosity:
+        print_prefilter_stats(faiss_indexer.prefilter.stats())
+    if ai_fallback is not None and args.verbosity and ai_fallback.lookups:
+        stats = ai_fallback.stats()
+        print(f"ℹ️ AI fallback cache: {stats['hit_rate']:.1%} hit rate over {stats['lookups']} lookups, "
+              f"{stats['ai_calls']} model calls (mean batch {stats['mean_ai_batch']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,335 @@
+import concurrent.futures
+import multiprocessing
+import os
+import shutil
+
+import numpy as np
+import faiss
+
+from faiss_indexing import FAISSIndexer, SIMILARITY_THRESHOLD, TOP_K, load_faiss_index
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+SHARD_KEYS = ("hash", "date", "column")  # Row id modulo, Date ranges, or one shard per column value
+SHARD_KEY = "hash"
+N_SHARDS = 4  # Shards for the hash and date keys (the column key makes one per value)
+SHARD_EXECUTORS = ("thread", "process")
+SHARD_EXECUTOR = "thread"  # Threads share this process's memory; processes each hold one shard
+SHARD_DIR = "shards"  # Shard index files read by the shard processes (shard_system puts it in the bundle)
+
+
+def shard_keys(db_config, shard_key, key_column=None):
+    """Per-row key values the partition needs: Date for "date", key_column for "column", else None"""
+    if shard_key == "hash":
+        return None
+    name = 'Date' if shard_key == "date" else key_column
+    if not name or not db_config.store.has_column(name):
+        raise ValueError(f"Shard key '{shard_key}' needs a '{name}' column in {db_config.csv_file}")
+    return db_config.store.column(name).tolist()
+
+
+# Shard process state, set by _init_shard_worker
+_worker_indexer = None
+
+
+def _init_shard_worker(path, indexer_params, removed_ids):
+    global _worker_indexer
+    faiss.omp_set_num_threads(1)
+    _worker_indexer = FAISSIndexer(**indexer_params)
+    _worker_indexer.set_index(load_faiss_index(path, mmap=True))
+    if removed_ids:
+        _worker_indexer.remove_ids(removed_ids)
+
+
+def _search_shard(query_array, k):
+    return _worker_indexer.search_normalized(query_array, k)
+
+
+class ShardedIndexer:
+    """Partitions the corpus into several FAISS indexes and searches them in parallel
+
+    Rows are assigned to shards by `shard_key`: "hash" (row id modulo
+    n_shards), "date" (n_shards contiguous Date ranges of about equal size)
+    or "column" (one shard per value of key_column, e.g. a region). Each
+    shard is a FAISSIndexer over its rows; a query is searched on every
+    shard for the top k, and the per-shard results are mapped back to
+    global row ids and merged into one global top k, so voting and
+    lookup_neighbors see exactly what a single index would return.
+    With executor "thread" the shards live in this process and are searched
+    from a thread pool (FAISS releases the GIL while searching); with
+    "process" every shard is written to shard_dir and served from its own
+    process, which memory-maps it. Process shards are read-only.
+    Drop-in for FAISSIndexer on the query and online-learning paths.
+    """
+
+    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD, top_k=TOP_K, n_shards=N_SHARDS,
+                 shard_key=SHARD_KEY, executor=SHARD_EXECUTOR, search_workers=0, shard_dir=SHARD_DIR,
+                 **index_params):
+        if shard_key not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key '{shard_key}' (choose from {', '.join(SHARD_KEYS)})")
+        if executor not in SHARD_EXECUTORS:
+            raise ValueError(f"Unknown shard executor '{executor}' (choose from {', '.join(SHARD_EXECUTORS)})")
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.n_shards = n_shards
+        self.shard_key = shard_key
+        self.executor = executor
+        self.search_workers = search_workers
+        self.shard_dir = shard_dir
+        self.index_params = index_params
+        self.index_spec = index_params.get("index_spec", FAISSIndexer().index_spec)
+        self.embeddings_array = None
+        self.shards = []  # FAISSIndexer per shard (thread executor; unloaded with process)
+        self.row_ids = []  # Global row id of every shard-local id, per shard
+        self.shard_of = np.zeros(0, dtype=np.int32)  # Shard of every global row
+        self.local_of = np.zeros(0, dtype=np.int64)  # Shard-local id of every global row
+        self.date_bounds = None  # Start day of shards 1.. for the date key
+        self.value_to_shard = {}  # Column value -> shard for the column key
+        self.dimension = None
+        self._pool = None
+        self._shard_pools = []
+
+    def indexer_params(self):
+        return dict(similarity_threshold=self.similarity_threshold, top_k=self.top_k, **self.index_params)
+
+    # --------------------------------------------
+    # Partitioning
+    # --------------------------------------------
+    def partition(self, n_rows, keys=None, first_row=0, fit=False):
+        """Shard of each of n_rows rows (global ids first_row..), from their key values
+
+        With fit, the date ranges / column values are (re)derived from these
+        rows; otherwise rows are routed to the existing shards.
+        """
+        row_ids = np.arange(first_row, first_row + n_rows)
+        n_existing = min(self.n_shards, max(1, n_rows)) if fit else len(self.row_ids) or self.n_shards
+        if self.shard_key == "hash":
+            return (row_ids % n_existing).astype(np.int32)
+        if keys is None:
+            if fit:
+                raise ValueError(f"Shard key '{self.shard_key}' needs key values (see shard_keys)")
+            if self.shard_key == "date":
+                # Incidents learned online without a date are the most recent ones
+                return np.full(n_rows, n_existing - 1, dtype=np.int32)
+            return (row_ids % n_existing).astype(np.int32)
+
+        if self.shard_key == "date":
+            import pandas as pd
+            days = pd.to_datetime(pd.Series(list(keys)), errors="coerce").to_numpy(dtype="datetime64[D]")
+            valid = ~np.isnat(days)
+            days = days.astype(np.int64)
+            if fit:
+                bounds = np.zeros(0, dtype=np.int64)
+                if valid.any():
+                    # Bounds are dates present in the data, so no range comes out empty
+                    bounds = np.quantile(days[valid], np.arange(1, self.n_shards) / self.n_shards,
+                                         method="inverted_cdf")
+                    bounds = bounds[bounds > days[valid].min()]
+                self.date_bounds = np.unique(bounds.astype(np.int64))
+            # Unparseable dates go to the first range
+            return np.where(valid, np.searchsorted(self.date_bounds, days, side="right"), 0).astype(np.int32)
+
+        values = [str(key) for key in keys]
+        if fit:
+            self.value_to_shard = {}
+            for value in values:
+                self.value_to_shard.setdefault(value, len(self.value_to_shard))
+        # Values first seen online share the existing shards by row id
+        return np.array([self.value_to_shard.get(value, row % n_existing)
+                         for value, row in zip(values, row_ids.tolist())], dtype=np.int32)
+
+    # --------------------------------------------
+    # Building
+    # --------------------------------------------
+    def create_index(self, embeddings, keys=None, removed_ids=()):
+        """Partition and index the corpus embeddings (row i = incident i); keys as from shard_keys()
+
+        removed_ids are global rows to tombstone from the start (e.g. the
+        single index's tombstones).
+        """
+        print(f"\n[SHARDS] Building {self.shard_key}-partitioned shard indexes...")
+        self.close()
+        vectors = np.array(embeddings, dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        n_rows, self.dimension = vectors.shape
+        self.shards, self.row_ids = [], []
+        shard_of = self.partition(n_rows, keys, fit=True)
+
+        self.local_of = np.zeros(n_rows, dtype=np.int64)
+        for shard in range(int(shard_of.max()) + 1 if n_rows else 0):
+            rows = np.nonzero(shard_of == shard)[0]
+            indexer = FAISSIndexer(**self.indexer_params())
+            indexer.index = indexer.new_index(self.dimension, max(1, len(rows)))
+            if len(rows):
+                shard_vectors = np.ascontiguousarray(vectors[rows])
+                if not indexer.index.is_trained:
+                    indexer.train_index(shard_vectors)
+                indexer.add_normalized(shard_vectors)
+            indexer.apply_search_params()
+            self.local_of[rows] = np.arange(len(rows))
+            self.shards.append(indexer)
+            self.row_ids.append(rows.astype(np.int64))
+        self.shard_of = shard_of
+        del vectors
+        removed_ids = np.asarray(sorted(removed_ids), dtype=np.int64)
+        for shard, indexer in enumerate(self.shards):
+            removed = self.local_of[removed_ids[shard_of[removed_ids] == shard]]
+            if len(removed):
+                indexer.remove_ids(removed)
+
+        if self.executor == "process":
+            self._start_shard_processes()
+        print(f"✅ {len(self.row_ids)} shards built ({', '.join(str(len(r)) for r in self.row_ids)} vectors)")
+        print(f"Index type: {self.describe()}")
+        return self
+
+    def _start_shard_processes(self):
+        """Write every shard to shard_dir and serve it from its own process"""
+        shutil.rmtree(self.shard_dir, ignore_errors=True)
+        os.makedirs(self.shard_dir)
+        context = multiprocessing.get_context("spawn")
+        params = dict(self.indexer_params(), keep_embeddings=False)
+        for number, indexer in enumerate(self.shards):
+            path = os.path.join(self.shard_dir, f"shard-{number}.faiss")
+            faiss.write_index(indexer.index, path)
+            removed = sorted(indexer.tombstones)
+            self._shard_pools.append(concurrent.futures.ProcessPoolExecutor(
+                1, mp_context=context, initializer=_init_shard_worker, initargs=(path, params, removed)))
+        # The processes hold the shards now
+        self.shards = []
+
+    def describe(self):
+        if not self.row_ids:
+            return f"{self.index_spec} sharded by {self.shard_key} (not built)"
+        where = f"{len(self._shard_pools)} shard processes" if self._shard_pools else \
+            f"{self._workers()} search threads"
+        inner = self.shards[0].describe() if self.shards else self.index_spec
+        return f"{len(self.row_ids)} × {inner}, sharded by {self.shard_key}, {where}"
+
+    @property
+    def ntotal(self):
+        return len(self.shard_of)
+
+    @property
+    def date_keyed(self):
+        """Whether add_vectors places rows by their Date (learned incidents then pass their dates)"""
+        return self.shard_key == "date"
+
+    # --------------------------------------------
+    # Search
+    # --------------------------------------------
+    def _workers(self):
+        return self.search_workers or len(self.row_ids) or 1
+
+    def _searched_shards(self):
+        """Shards a search visits and their indexers (all; TimePartitionedIndexer narrows this to a time window)
+
+        There are no indexers with process shards, which their processes search.
+        """
+        return list(range(len(self.row_ids))), list(self.shards)
+
+    def _search_shards(self, query_array, shards, indexers, k=None):
+        # Range mode: each shard returns its top_k within the radius, merged below like kNN results
+        if k is None and self.index_params.get("search_mode") != "range":
+            k = self.top_k
+        if self._shard_pools:
+            futures = [self._shard_pools[shard].submit(_search_shard, query_array, k) for shard in shards]
+            return [future.result() for future in futures]
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(self._workers(), thread_name_prefix="shard")
+        return list(self._pool.map(lambda indexer: indexer.search_normalized(query_array, k), indexers))
+
+    def search_normalized(self, query_array, k=None):
+        """Search already-normalized float32 queries on every shard and merge (no copy, no error handling)
+
+        As FAISSIndexer.search_normalized: an explicit k asks each shard for
+        its k nearest neighbors and keeps the best k overall; otherwise the
+        search follows search_mode and keeps the best top_k.
+        """
+        shards, indexers = self._searched_shards()
+        results = self._search_shards(query_array, shards, indexers, k)
+
+        scores = np.concatenate([shard_scores for shard_scores, _ in results], axis=1)
+        indices = np.concatenate([np.where(local >= 0, self.row_ids[shard][np.clip(local, 0, None)], -1)
+                                  for (_, local), shard in zip(results, shards)], axis=1)
+        # Missing neighbors (-1) rank last, as they do within a single index
+        scores = np.where(indices >= 0, scores, -np.inf).astype(np.float32)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k or self.top_k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        scores[indices < 0] = -np.finfo(np.float32).max
+        return scores, indices
+
+    def search_batch(self, query_embeddings):
+        """Top K neighbors over all shards, as global row ids; same shapes as FAISSIndexer.search_batch"""
+        try:
+            query_array = np.array(query_embeddings).astype('float32')
+            faiss.normalize_L2(query_array)
+            return self.search_normalized(query_array)
+
+        except Exception as e:
+            print(f"❌ Error during search: {e}")
+            return None, None
+
+    def search_similar(self, query_embedding):
+        """Search for similar incidents across all shards"""
+        scores, indices = self.search_batch([query_embedding])
+        if scores is None:
+            return None, None
+        return scores[0], indices[0]
+
+    def get_threshold(self):
+        """Get similarity threshold"""
+        return self.similarity_threshold
+
+    def get_top_k(self):
+        """Get top K value"""
+        return self.top_k
+
+    # --------------------------------------------
+    # Online updates (thread executor)
+    # --------------------------------------------
+    @property
+    def writable(self):
+        """Whether add_vectors / remove_ids work (not with process-served shards)"""
+        return not self._shard_pools
+
+    def _check_writable(self):
+        if not self.writable:
+            raise RuntimeError("Process-served shards are read-only; rebuild them to add or remove incidents")
+
+    def add_vectors(self, embeddings, keys=None):
+        """Append vectors under the next global row ids, each to the shard its key (if any) selects"""
+        self._check_writable()
+        vectors = np.array(embeddings).astype('float32').reshape(-1, self.dimension)
+        start = len(self.shard_of)
+        shard_of = self.partition(len(vectors), keys, first_row=start)
+        local_of = np.zeros(len(vectors), dtype=np.int64)
+        for shard in np.unique(shard_of):
+            rows = np.nonzero(shard_of == shard)[0]
+            local_of[rows] = self.shards[shard].add_vectors(vectors[rows])
+            self.row_ids[shard] = np.concatenate([self.row_ids[shard], start + rows])
+        self.shard_of = np.concatenate([self.shard_of, shard_of])
+        self.local_of = np.concatenate([self.local_of, local_of])
+        return np.arange(start, start + len(vectors), dtype='int64')
+
+    def remove_ids(self, ids):
+        """Tombstone global row ids in their shards"""
+        self._check_writable()
+        ids = np.asarray(list(ids), dtype=np.int64)
+        for shard in np.unique(self.shard_of[ids]):
+            self.shards[shard].remove_ids(self.local_of[ids[self.shard_of[ids] == shard]])
+
+    def release_embeddings(self):
+        self.embeddings_array = None
+
+    def close(self):
+        """Stop the search threads and shard processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for pool in self._shard_pools:
+            pool.shutdown()
+        self._shard_pools = []
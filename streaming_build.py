@@ -0,0 +1,108 @@
+import os
+import resource
+
+import numpy as np
+
+from db_config import STREAM_CHUNK_ROWS
+from duplicate_index import DuplicateIndex
+from incident_store import IncidentStoreBuilder
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+STREAM_TRAIN_ROWS = 100000  # Vectors used to train IVF indexes (raised to what nlist needs)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_rows_hint(csv_file, block_size=1 << 20):
+    """Upper bound on the CSV's data rows (newline count), without parsing it"""
+    lines = 0
+    with open(csv_file, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            lines += block.count(b"\n")
+    return max(1, lines)
+
+
+def stream_build(db_config, faiss_indexer, spool_path, chunk_rows=STREAM_CHUNK_ROWS,
+                 train_rows=STREAM_TRAIN_ROWS):
+    """Build incident store, duplicate index and FAISS index from the CSV in bounded memory
+
+    Each chunk of rows is embedded, L2-normalized in place, appended to the
+    float32 spool file at spool_path and added to the index; only the
+    descriptions and category codes are kept, in the IncidentStore. Indexes that
+    need training (IVF) are trained on the first rows once enough of them
+    are in the spool. Returns the embeddings as a read-only memory map of
+    the spool, shape (n, dimension).
+    """
+    import faiss
+    import pandas as pd
+    print(f"\n[STREAM] Building index from {db_config.csv_file} in chunks of {chunk_rows} rows...")
+    n_hint = count_rows_hint(db_config.csv_file)
+    store_builder, label_to_code = IncidentStoreBuilder(), {}
+    duplicates = DuplicateIndex(minhash=db_config.minhash) if db_config.use_duplicate_index else None
+    n_rows = n_trained_rows = dimension = 0
+
+    def spooled(n):
+        return np.memmap(spool_path, dtype=np.float32, mode="r", shape=(n, dimension))
+
+    with open(spool_path, "wb") as spool:
+        for chunk in db_config.iter_csv_chunks(chunk_rows):
+            descriptions = chunk['Description'].fillna("").astype(str).tolist()
+            embeddings = np.ascontiguousarray(db_config.embed_texts(descriptions), dtype=np.float32)
+            faiss.normalize_L2(embeddings)
+            embeddings.tofile(spool)
+
+            if faiss_indexer.index is None:
+                dimension = embeddings.shape[1]
+                faiss_indexer.begin_index(dimension, n_hint)
+                n_trained_rows = faiss_indexer.training_size(train_rows)
+            n_rows += len(chunk)
+
+            if faiss_indexer.index.is_trained:
+                faiss_indexer.add_normalized(embeddings)
+            elif n_rows >= n_trained_rows:
+                spool.flush()
+                faiss_indexer.train_index(spooled(n_rows)[:n_trained_rows])
+                faiss_indexer.add_normalized(np.ascontiguousarray(spooled(n_rows)))
+
+            labels = chunk[db_config.category_col].astype(str)
+            codes, uniques = pd.factorize(labels)
+            for label in uniques:
+                label_to_code.setdefault(str(label), len(label_to_code))
+            mapping = np.array([label_to_code[str(label)] for label in uniques], dtype=np.int32)
+            store_builder.add(descriptions, mapping[codes])
+            if duplicates is not None:
+                duplicates.add(descriptions, mapping[codes], first_row=n_rows - len(chunk))
+            print(f"✅ Streamed {n_rows} incidents (peak RSS {peak_rss_mb():.0f} MB)")
+
+    if n_rows == 0:
+        print("❌ No incidents found in CSV")
+        exit()
+
+    embeddings = spooled(n_rows)
+    if not faiss_indexer.index.is_trained:
+        # Smaller corpus than the training sample: train on all of it
+        faiss_indexer.train_index(embeddings)
+        faiss_indexer.add_normalized(np.ascontiguousarray(embeddings))
+
+    store = store_builder.finish(list(label_to_code), db_config.csv_file, db_config.category_col)
+    db_config.attach_store(store, duplicate_index=duplicates)
+    if db_config.embedding_cache is not None:
+        print(f"✅ Embedding cache: {db_config.embedding_cache.hits} reused, "
+              f"{db_config.embedding_cache.misses} newly embedded")
+    faiss_indexer.finish_index(embeddings)
+    print(f"📈 Peak RSS: {peak_rss_mb():.0f} MB")
+    return embeddings
+
+
+def remove_spool(spool_path):
+    """Delete a spool file once its vectors live in the artifact bundle"""
+    try:
+        os.remove(spool_path)
+    except OSError:
+        pass
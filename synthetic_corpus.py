@@ -0,0 +1,154 @@
+import argparse
+import csv
+import datetime
+import zlib
+
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+CATEGORY_SKEW = 1.1  # Zipf exponent of category frequencies (a few big queues, a long tail)
+DUPLICATE_RATE = 0.05  # Share of rows that repeat an earlier description verbatim
+START_DATE = datetime.date(2023, 1, 1)
+DATE_SPAN_DAYS = 730
+STUB_DIMENSION = 384  # Same width as the MiniLM model behind DefaultEmbeddingFunction
+STUB_BUCKETS = 4096  # Token hash buckets of the stub embedding table
+WRITE_CHUNK_ROWS = 50000
+
+VOCABULARY = {
+    "IT": "server network database crash software login outage vpn email laptop latency timeout".split(),
+    "Facilities": "power water leak hvac heating cooling elevator lighting roof plumbing door parking".split(),
+    "Security": "breach badge camera theft intrusion unauthorized tailgating alarm phishing lock visitor".split(),
+    "Hardware": "printer monitor keyboard scanner dock projector battery charger mouse headset toner".split(),
+    "Safety": "fire injury spill evacuation hazard slip extinguisher smoke ladder chemical firstaid".split(),
+    "HR": "payroll leave attendance onboarding benefits timesheet contract overtime training badge".split(),
+    "Finance": "invoice expense reimbursement budget purchase vendor payment refund ledger audit".split(),
+    "Network": "switch router wifi dns firewall bandwidth packet cable port dhcp outage".split(),
+}
+SHARED_WORDS = "issue reported urgent again floor office team user since morning please check broken".split()
+LOCATIONS = ["building A", "building B", "warehouse", "head office", "lab", "floor 3", "floor 7", "branch"]
+
+
+class StubEmbeddingFunction:
+    """Deterministic, offline stand-in for DefaultEmbeddingFunction
+
+    Each token is hashed (crc32) into a fixed table of random vectors and a
+    description's embedding is the sum of its tokens' rows, so shared words
+    mean similar vectors, the same text always gives the same vector and
+    nothing is downloaded. Picklable by reference, so it can also be used
+    as an embedding_factory for the bulk embedding workers.
+    """
+
+    MODEL_NAME = f"stub-hash-{STUB_DIMENSION}"
+
+    def __init__(self, dimension=STUB_DIMENSION, buckets=STUB_BUCKETS, seed=0):
+        rng = np.random.default_rng(seed)
+        self.table = rng.standard_normal((buckets, dimension)).astype(np.float32)
+        self.buckets = buckets
+
+    def __call__(self, texts):
+        ids, offsets = [], []
+        for text in texts:
+            offsets.append(len(ids))
+            tokens = str(text).lower().split() or [""]
+            ids.extend(zlib.crc32(token.encode("utf-8")) % self.buckets for token in tokens)
+        if not offsets:
+            return np.zeros((0, self.table.shape[1]), dtype=np.float32)
+        return np.add.reduceat(self.table[np.asarray(ids)], np.asarray(offsets), axis=0)
+
+
+def category_weights(n_categories, skew=CATEGORY_SKEW):
+    """Zipf-like probabilities for categories ranked 1..n"""
+    weights = 1.0 / np.arange(1, n_categories + 1) ** skew
+    return weights / weights.sum()
+
+
+def generate_rows(n_rows, seed=0, skew=CATEGORY_SKEW, duplicate_rate=DUPLICATE_RATE):
+    """Yield (incident_id, date, description, category) rows
+
+    Categories follow a Zipf distribution; a description mixes words of its
+    category with words shared across categories (and occasionally another
+    category's word), plus a location and a ticket number, and a share of
+    rows repeat an earlier description verbatim, as re-filed tickets do.
+    Random draws are made a block of rows at a time.
+    """
+    rng = np.random.default_rng(seed)
+    categories = list(VOCABULARY)
+    weights = category_weights(len(categories), skew)
+    recent = []
+    for block_start in range(0, n_rows, WRITE_CHUNK_ROWS):
+        size = min(WRITE_CHUNK_ROWS, n_rows - block_start)
+        category_ids = rng.choice(len(categories), size=size, p=weights)
+        days = rng.integers(DATE_SPAN_DAYS, size=size)
+        duplicate = rng.random(size) < duplicate_rate
+        picks = rng.integers(1 << 30, size=(size, 10))
+        n_own = rng.integers(3, 6, size=size)
+        n_shared = rng.integers(1, 4, size=size)
+        noise = rng.random(size) < 0.2
+        order = rng.random((size, 9))
+        for i in range(size):
+            incident_id = block_start + i + 1
+            date = (START_DATE + datetime.timedelta(days=int(days[i]))).isoformat()
+            if recent and duplicate[i]:
+                description, category = recent[picks[i, 9] % len(recent)]
+                yield incident_id, date, description, category
+                continue
+            category = categories[category_ids[i]]
+            own = VOCABULARY[category]
+            words = [own[picks[i, j] % len(own)] for j in range(n_own[i])]
+            words += [SHARED_WORDS[picks[i, 5 + j] % len(SHARED_WORDS)] for j in range(n_shared[i])]
+            if noise[i]:
+                other = VOCABULARY[categories[picks[i, 8] % len(categories)]]
+                words.append(other[picks[i, 9] % len(other)])
+            words = [words[j] for j in np.argsort(order[i, :len(words)])]
+            location = LOCATIONS[picks[i, 8] % len(LOCATIONS)]
+            description = f"{' '.join(words)} in {location} ticket {picks[i, 9] % 100000}"
+            recent.append((description, category))
+            if len(recent) > 1000:
+                recent.pop(0)
+            yield incident_id, date, description, category
+
+
+def write_corpus(path, n_rows, seed=0, skew=CATEGORY_SKEW, duplicate_rate=DUPLICATE_RATE):
+    """Write a synthetic incidents CSV (IncidentID, Date, Description, Category)"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["IncidentID", "Date", "Description", "Category"])
+        rows = []
+        for row in generate_rows(n_rows, seed, skew, duplicate_rate):
+            rows.append(row)
+            if len(rows) >= WRITE_CHUNK_ROWS:
+                writer.writerows(rows)
+                rows = []
+        writer.writerows(rows)
+    return path
+
+
+def sample_queries(n_queries, seed=1, corpus_seed=0, duplicate_rate=DUPLICATE_RATE):
+    """Descriptions from the corpus distribution; a duplicate_rate share repeat corpus rows"""
+    queries = [description for _, _, description, _ in generate_rows(n_queries, seed)]
+    rng = np.random.default_rng(seed)
+    repeats = rng.random(n_queries) < duplicate_rate
+    for row, (_, _, description, _) in enumerate(generate_rows(n_queries, corpus_seed)):
+        if repeats[row]:
+            queries[row] = description
+    return queries
+
+
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Generate a synthetic incidents CSV")
+    parser.add_argument('output', help="CSV file to write")
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skew', type=float, default=CATEGORY_SKEW, help="Zipf exponent of category sizes")
+    parser.add_argument('--duplicate-rate', type=float, default=DUPLICATE_RATE)
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    write_corpus(args.output, args.rows, args.seed, args.skew, args.duplicate_rate)
+    print(f"✅ Wrote {args.rows} synthetic incidents to {args.output}")
@@ -0,0 +1,107 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from concurrent_index import ConcurrentIndexer, ReadWriteLock
+from faiss_indexing import FAISSIndexer
+from sharded_index import ShardedIndexer
+
+
+def flat_indexer(n_rows=64, dimension=8, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n_rows, dimension)).astype(np.float32)
+    indexer = FAISSIndexer(index_spec="flat")
+    indexer.create_index(vectors)
+    return indexer, vectors
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def test_waiting_writer_holds_off_new_readers():
+    """A reader that arrives after a waiting writer gets the lock only once the writer is done"""
+    lock = ReadWriteLock()
+    order = []
+    lock.acquire_read()
+
+    def write():
+        with lock.write_locked():
+            order.append("writer")
+
+    def read():
+        with lock.read_locked():
+            order.append("reader")
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    wait_until(lambda: lock._waiting_writers == 1)
+    reader = threading.Thread(target=read)
+    reader.start()
+    time.sleep(0.05)
+    assert order == []  # The writer waits for the first reader, the new reader for the writer
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert order == ["writer", "reader"]
+
+
+def test_swap_returns_previous_indexer():
+    first, _ = flat_indexer(seed=0)
+    second, _ = flat_indexer(seed=1)
+    concurrent = ConcurrentIndexer(first)
+    assert concurrent.swap(second) is first
+    assert concurrent.indexer is second
+    assert concurrent.swaps == 1
+
+
+def test_rebuild_keeps_tombstones():
+    indexer, vectors = flat_indexer()
+    concurrent = ConcurrentIndexer(indexer)
+    concurrent.remove_ids([3, 7])
+    previous = concurrent.rebuild(vectors)
+    assert previous is indexer
+    assert concurrent.indexer is not indexer
+    assert concurrent.indexer.tombstones == {3, 7}
+    assert concurrent.indexer.index.ntotal == len(vectors)
+    _, indices = concurrent.search_normalized(concurrent.indexer.index.reconstruct_n(0, 8), k=4)
+    assert not np.isin(indices, [3, 7]).any()
+
+
+def test_search_wrapped_sharded_indexer():
+    """A ShardedIndexer behind the wrapper returns what one flat index over the same rows does"""
+    indexer, vectors = flat_indexer(n_rows=200)
+    sharded = ShardedIndexer(n_shards=3, index_spec="flat")
+    sharded.create_index(vectors)
+    concurrent = ConcurrentIndexer(sharded, search_threads=2)
+    queries = indexer.index.reconstruct_n(0, 40)
+    expected_scores, expected_indices = indexer.search_normalized(queries)
+    scores, indices = concurrent.search_batch(queries)
+    assert np.array_equal(indices, expected_indices)
+    assert np.allclose(scores, expected_scores, atol=1e-5)
+    scores, indices = concurrent.search_many(queries, k=3, chunk_rows=16)
+    assert np.array_equal(indices, expected_indices[:, :3])
+    concurrent.close()
+    sharded.close()
+
+
+def test_copy_on_write_add():
+    indexer, vectors = flat_indexer()
+    concurrent = ConcurrentIndexer(indexer, copy_on_write=True)
+    ids = concurrent.add_vectors(vectors[:2])
+    assert ids.tolist() == [len(vectors), len(vectors) + 1]
+    assert concurrent.indexer is not indexer  # The copy was swapped in
+    assert indexer.index.ntotal == len(vectors)  # The live index was never touched
+    assert concurrent.indexer.index.ntotal == len(vectors) + 2
+
+
+def test_copy_on_write_needs_faiss_indexer():
+    with pytest.raises(ValueError):
+        ConcurrentIndexer(ShardedIndexer(), copy_on_write=True)
+    indexer, _ = flat_indexer()
+    with pytest.raises(ValueError):
+        ConcurrentIndexer(indexer, copy_on_write=True).swap(ShardedIndexer())
@@ -0,0 +1,30 @@
+import numpy as np
+
+from voting import category_breakdown, neighbor_stats, vote
+
+
+def test_recency_weights_keep_decision_similarity():
+    """Equally similar neighbors report the same similarity whatever their age"""
+    scores = np.full((1, 4), 0.97)
+    codes = np.array([[0, 0, 1, 1]])
+    _, plain = vote(scores, codes, 2, strategies=("frequency", "weighted"))
+    for age in (0, 1, 5):
+        weights = np.full((1, 4), 0.5 ** age)  # Half life of one period
+        _, aged = vote(scores, codes, 2, strategies=("frequency", "weighted"), neighbor_weights=weights)
+        for name in ("frequency", "weighted"):
+            assert np.allclose(aged[name]['decision_similarity'], plain[name]['decision_similarity'])
+        stats = neighbor_stats(scores, codes, 2, neighbor_weights=weights)
+        breakdown = category_breakdown(stats, 0, ["A", "B"])
+        assert np.isclose(breakdown["A"]['weighted_avg_similarity'], 97.0 ** 2 / 100)
+    assert np.allclose(plain['weighted']['decision_similarity'], 97.0 ** 2 / 100)
+
+
+def test_recency_weights_change_the_vote():
+    """Newer neighbors outvote older ones of the same similarity"""
+    scores = np.full((1, 3), 0.9)
+    codes = np.array([[0, 0, 1]])  # Category 0 has more, but older, neighbors
+    weights = np.array([[0.25, 0.25, 1.0]])
+    _, votes = vote(scores, codes, 2, strategies=("frequency",), neighbor_weights=weights)
+    assert votes['frequency']['winner'][0] == 1
+    stats = neighbor_stats(scores, codes, 2, neighbor_weights=weights)
+    assert np.allclose(stats['vote_weight'], [[0.5, 1.0]])
@@ -0,0 +1,265 @@
+import copy
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import faiss
+
+from faiss_indexing import FAISSIndexer, SIMILARITY_THRESHOLD, TOP_K
+from sharded_index import ShardedIndexer
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+PERIODS = ("month", "quarter", "year")
+PERIOD = "month"  # Length of one time partition
+RECENT_PERIODS = None  # Search only the newest N periods (None = all of them)
+RECENCY_HALF_LIFE = None  # Periods after which a neighbor's vote counts half (None = no decay)
+MAX_RESIDENT_MB = 512  # Partition indexes kept in memory; least recently searched ones are evicted beyond this
+PARTITION_DIR = "partitions"  # One index file per period, loaded on demand (partition_system puts it in the bundle)
+MONTHS_PER_PERIOD = {"month": 1, "quarter": 3, "year": 12}
+
+
+def period_ids(dates, period=PERIOD):
+    """Integer period of each date (months / quarters / years since 1970); None where unparseable"""
+    import pandas as pd
+    months = pd.to_datetime(pd.Series(list(dates)), errors="coerce").to_numpy(dtype="datetime64[M]")
+    valid = ~np.isnat(months)
+    periods = np.zeros(len(months), dtype=np.int64)
+    periods[valid] = months[valid].astype(np.int64) // MONTHS_PER_PERIOD[period]
+    return periods, valid
+
+
+def period_label(period_id, period=PERIOD):
+    """'2024-03', '2024-Q1' or '2024' for an integer period"""
+    month = int(period_id) * MONTHS_PER_PERIOD[period]
+    year, month_of_year = 1970 + month // 12, month % 12
+    if period == "month":
+        return f"{year}-{month_of_year + 1:02d}"
+    if period == "quarter":
+        return f"{year}-Q{month_of_year // 3 + 1}"
+    return str(year)
+
+
+class TimePartitionedIndexer(ShardedIndexer):
+    """One FAISS index per time period (month by default) of the Date column
+
+    Searches can be limited to the newest recent_periods partitions, so
+    incidents about long-retired systems stop competing with current ones,
+    and with recency_half_life every neighbor's vote is scaled by
+    0.5 ** (age in periods / half life) (see recency_weights). Every
+    partition is written to partition_dir once built and loaded again only
+    when a search needs it; resident partitions beyond max_resident_mb are
+    evicted, least recently searched first (changed ones are written back
+    first). Rows without a parseable date join the oldest partition;
+    incidents learned online join their date's partition, creating a flat
+    one for a new period. Otherwise a drop-in for FAISSIndexer, like
+    ShardedIndexer, whose merge and id bookkeeping it reuses. Loading,
+    eviction and updates hold one lock, so concurrent searches can share
+    the partitions; an evicted partition gets a fresh indexer, and a
+    search already holding the old one finishes on it.
+    """
+
+    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD, top_k=TOP_K, period=PERIOD,
+                 recent_periods=RECENT_PERIODS, recency_half_life=RECENCY_HALF_LIFE,
+                 max_resident_mb=MAX_RESIDENT_MB, partition_dir=PARTITION_DIR, search_workers=0, **index_params):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown period '{period}' (choose from {', '.join(PERIODS)})")
+        super().__init__(similarity_threshold, top_k, n_shards=1, shard_key="date", executor="thread",
+                         search_workers=search_workers, shard_dir=partition_dir, **index_params)
+        self.period = period
+        self.recent_periods = recent_periods
+        self.recency_half_life = recency_half_life
+        self.max_resident_mb = max_resident_mb
+        self.shard_period = []  # Period id of each partition
+        self.period_to_shard = {}
+        self.row_period = np.zeros(0, dtype=np.int64)  # Period id of every global row
+        self._resident = OrderedDict()  # Loaded partition -> size in bytes, least recently searched first
+        self._dirty = set()  # Loaded partitions changed since they were written
+        self._lock = threading.RLock()  # Guards the partition map and residency
+        self.loads = self.evictions = 0
+
+    # --------------------------------------------
+    # Partitioning
+    # --------------------------------------------
+    def partition(self, n_rows, keys=None, first_row=0, fit=False):
+        """Partition of each row from its date; new periods get new (empty) partitions"""
+        if keys is None:
+            if fit:
+                raise ValueError("Time partitions need the Date column (see shard_keys)")
+            # Incidents learned without a date are today's
+            keys = [np.datetime64("today")] * n_rows
+        periods, valid = period_ids(keys, self.period)
+        if fit:
+            self.shard_period, self.period_to_shard = [], {}
+            # Chronological partition numbers; undated rows go with the oldest period
+            for period in np.unique(periods[valid]).tolist() if valid.any() else [0]:
+                self.period_to_shard[period] = len(self.shard_period)
+                self.shard_period.append(period)
+            periods[~valid] = self.shard_period[0]
+        else:
+            periods[~valid] = min(self.shard_period)
+            for period in np.unique(periods).tolist():
+                if period not in self.period_to_shard:
+                    self._new_partition(period)
+        self.row_period = np.concatenate([self.row_period[:first_row], periods])
+        return np.array([self.period_to_shard[period] for period in periods.tolist()], dtype=np.int32)
+
+    def _new_partition(self, period):
+        """Empty flat partition for a period first seen online (no training needed for a few rows)"""
+        indexer = FAISSIndexer(**dict(self.indexer_params(), index_spec="flat", storage_precision="float32"))
+        indexer.index = indexer.new_index(self.dimension, 1)
+        indexer.apply_search_params()
+        shard = len(self.shards)
+        self.shards.append(indexer)
+        self.row_ids.append(np.zeros(0, dtype=np.int64))
+        self.shard_period.append(period)
+        self.period_to_shard[period] = shard
+        self._resident[shard] = indexer.index.ntotal * self._vector_bytes(shard)
+        self._dirty.add(shard)
+
+    # --------------------------------------------
+    # Building and residency
+    # --------------------------------------------
+    def create_index(self, embeddings, keys=None, removed_ids=()):
+        """Build one index per period, write them all to partition_dir, keep the newest resident"""
+        with self._lock:
+            self.row_period = np.zeros(0, dtype=np.int64)
+            super().create_index(embeddings, keys, removed_ids)
+            shutil.rmtree(self.shard_dir, ignore_errors=True)
+            os.makedirs(self.shard_dir)
+            self._resident, self._dirty = OrderedDict(), set()
+            # Oldest first, so the eviction below keeps the newest partitions
+            for shard in np.argsort(self.shard_period).tolist():
+                self._resident[shard] = self._write(shard)
+            self._evict()
+        print(f"✅ {len(self.shards)} {self.period} partitions "
+              f"({period_label(min(self.shard_period), self.period)} .. "
+              f"{period_label(max(self.shard_period), self.period)}), {len(self._resident)} resident")
+        return self
+
+    def _path(self, shard):
+        return os.path.join(self.shard_dir, f"partition-{period_label(self.shard_period[shard], self.period)}.faiss")
+
+    def _write(self, shard):
+        """Write a partition's index to disk; returns its size in bytes"""
+        path = self._path(shard)
+        faiss.write_index(self.shards[shard].index, path)
+        self._dirty.discard(shard)
+        return os.path.getsize(path)
+
+    def _vector_bytes(self, shard):
+        """Bytes a partition's index grows by per vector (float32 where FAISS cannot tell, as for HNSW)"""
+        try:
+            return self.shards[shard].index.sa_code_size()
+        except RuntimeError:
+            return 4 * self.dimension
+
+    def _load(self, shards):
+        """Make partitions resident (reading evicted ones from disk) and mark them recently used"""
+        for shard in shards:
+            if shard in self._resident:
+                self._resident.move_to_end(shard)
+                continue
+            path = self._path(shard)
+            # set_index re-applies search parameters and the partition's tombstones
+            self.shards[shard].set_index(faiss.read_index(path))
+            self._resident[shard] = os.path.getsize(path)
+            self.loads += 1
+
+    def _evict(self, keep=()):
+        """Evict least recently searched partitions until the resident ones fit max_resident_mb"""
+        if self.max_resident_mb is None:
+            return
+        budget = self.max_resident_mb * 1024 * 1024
+        for shard in list(self._resident):
+            if sum(self._resident.values()) <= budget:
+                break
+            if shard in keep:
+                continue
+            if shard in self._dirty:
+                self._write(shard)
+            # A fresh indexer (same tombstones) without the index, so searches holding the old one finish on it
+            evicted = copy.copy(self.shards[shard])
+            evicted.index = None
+            self.shards[shard] = evicted
+            del self._resident[shard]
+            self.evictions += 1
+
+    def resident_mb(self):
+        with self._lock:
+            return sum(self._resident.values()) / (1024 * 1024)
+
+    # --------------------------------------------
+    # Search
+    # --------------------------------------------
+    def newest_period(self):
+        return max(self.shard_period)
+
+    def _searched_shards(self):
+        """Partitions of the newest recent_periods periods (all when None), loaded on demand, and their indexers"""
+        with self._lock:
+            shards = list(range(len(self.shards)))
+            if self.recent_periods:
+                oldest = self.newest_period() - self.recent_periods + 1
+                shards = [shard for shard in shards if self.shard_period[shard] >= oldest]
+            self._load(shards)
+            self._evict(keep=shards)
+            return shards, [self.shards[shard] for shard in shards]
+
+    def recency_weights(self, indices):
+        """Vote weight 0.5 ** (age / recency_half_life) of each neighbor (None without a half life)
+
+        Age is counted in periods back from the newest partition; missing
+        neighbors (-1) get weight 0.
+        """
+        if not self.recency_half_life:
+            return None
+        indices = np.asarray(indices, dtype=np.int64)
+        age = self.newest_period() - self.row_period[np.clip(indices, 0, None)]
+        return np.where(indices >= 0, 0.5 ** (age / self.recency_half_life), 0.0)
+
+    def set_window(self, recent_periods=None, recency_half_life=None):
+        """Change the searched window and the recency decay (None = all periods / no decay)"""
+        self.recent_periods = recent_periods
+        self.recency_half_life = recency_half_life
+
+    def describe(self):
+        if not self.row_ids:
+            return f"{self.index_spec} partitioned by {self.period} (not built)"
+        window = f"newest {self.recent_periods} searched" if self.recent_periods else "all searched"
+        decay = f", half life {self.recency_half_life} {self.period}s" if self.recency_half_life else ""
+        return (f"{len(self.shards)} {self.period} partitions of {self.index_spec} ({window}{decay}), "
+                f"{len(self._resident)} resident ({self.resident_mb():.1f} MB)")
+
+    # --------------------------------------------
+    # Online updates
+    # --------------------------------------------
+    def add_vectors(self, embeddings, keys=None):
+        """Append vectors under the next global row ids, each to its date's partition"""
+        vectors = np.array(embeddings).astype('float32').reshape(-1, self.dimension)
+        with self._lock:
+            start = len(self.shard_of)
+            shard_of = self.partition(len(vectors), keys, first_row=start)
+            local_of = np.zeros(len(vectors), dtype=np.int64)
+            for shard in np.unique(shard_of).tolist():
+                rows = np.nonzero(shard_of == shard)[0]
+                self._load([shard])
+                local_of[rows] = self.shards[shard].add_vectors(vectors[rows])
+                self.row_ids[shard] = np.concatenate([self.row_ids[shard], start + rows])
+                self._resident[shard] += len(rows) * self._vector_bytes(shard)
+                self._dirty.add(shard)
+            self.shard_of = np.concatenate([self.shard_of, shard_of])
+            self.local_of = np.concatenate([self.local_of, local_of])
+            self._evict(keep=np.unique(shard_of).tolist())
+        return np.arange(start, start + len(vectors), dtype='int64')
+
+    def remove_ids(self, ids):
+        """Tombstone global row ids (kept by each partition across evictions)"""
+        ids = np.asarray(list(ids), dtype=np.int64)
+        with self._lock:
+            for shard in np.unique(self.shard_of[ids]).tolist():
+                self.shards[shard].remove_ids(self.local_of[ids[self.shard_of[ids] == shard]])
@@ -0,0 +1,207 @@
+import numpy as np
+
+
+# ============================================
+# CONFIGURATION
+# ============================================
+WEIGHTED_BLEND = 0.7  # Confidence = 70% weighted avg similarity + 30% max similarity
+TIE_TOLERANCE = 1e-9  # Relative difference below which two category scores count as tied
+
+
+# ============================================
+# NEIGHBOR STATISTICS
+# ============================================
+def neighbor_stats(scores, neighbor_codes, n_categories, neighbor_weights=None):
+    """Reduce a (n_queries, top_k) neighbor block to per-(query, category) statistics
+
+    `scores` are cosine similarities and `neighbor_codes` the integer category
+    code of each neighbor (-1 marks a missing neighbor). Every statistic is a
+    (n_queries, n_categories) array computed with bincount/ufunc.at segment
+    reductions, so the cost does not depend on Python-level loops over hits.
+    Optional `neighbor_weights` (same shape, e.g. recency decay) scale each
+    neighbor's vote: its share of 'vote_weight' (the frequency count) and of
+    'weight_sum' (similarity^2). Weighted voting divides weight_sum by
+    vote_weight, so the weights decide how much each similarity counts,
+    never how similar the neighbors look: equally similar neighbors give
+    the same decision similarity whatever their weights. The plain
+    averages and maxima use the raw similarity.
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+    neighbor_codes = np.atleast_2d(np.asarray(neighbor_codes, dtype=np.int64))
+    n_queries, top_k = neighbor_codes.shape
+    n_cells = n_queries * n_categories
+
+    valid = neighbor_codes >= 0
+    rows = np.broadcast_to(np.arange(n_queries)[:, None], neighbor_codes.shape)
+    ranks = np.broadcast_to(np.arange(top_k)[None, :], neighbor_codes.shape)
+    cells = (rows * n_categories + neighbor_codes)[valid]
+    similarity = scores[valid] * 100
+
+    count = np.bincount(cells, minlength=n_cells)
+    similarity_sum = np.bincount(cells, weights=similarity, minlength=n_cells)
+    # Weighted scoring: weight = similarity^2 (emphasizes high similarity)
+    weights = scores[valid] ** 2
+    vote_weight = count.astype(np.float64)
+    if neighbor_weights is not None:
+        neighbor_weights = np.atleast_2d(np.asarray(neighbor_weights, dtype=np.float64))[valid]
+        weights = weights * neighbor_weights
+        vote_weight = np.bincount(cells, weights=neighbor_weights, minlength=n_cells)
+    weight_sum = np.bincount(cells, weights=weights, minlength=n_cells)
+
+    max_similarity = np.zeros(n_cells)
+    np.maximum.at(max_similarity, cells, similarity)
+    # Rank of the first neighbor carrying each category breaks ties like dict insertion order
+    first_rank = np.full(n_cells, top_k, dtype=np.int64)
+    np.minimum.at(first_rank, cells, ranks[valid])
+
+    shape = (n_queries, n_categories)
+    return {
+        'count': count.reshape(shape),
+        'vote_weight': vote_weight.reshape(shape),
+        'similarity_sum': similarity_sum.reshape(shape),
+        'weight_sum': weight_sum.reshape(shape),
+        'max_similarity': max_similarity.reshape(shape),
+        'first_rank': first_rank.reshape(shape),
+        'n_neighbors': valid.sum(axis=1),
+        'top_k': top_k,
+    }
+
+
+def stats_from_counts(counts, similarity, n_categories):
+    """neighbor_stats() output for one query whose neighbors all have the same similarity
+
+    `counts` maps category code -> number of neighbors; `similarity` is in
+    percent. Used when the neighbors come from an exact/near-duplicate
+    lookup rather than a FAISS search. Codes rank in the order given.
+    """
+    codes = np.fromiter(counts, dtype=np.int64, count=len(counts))
+    count = np.zeros((1, n_categories), dtype=np.int64)
+    count[0, codes] = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    first_rank = np.full((1, n_categories), len(codes), dtype=np.int64)
+    first_rank[0, codes] = np.arange(len(codes))
+    return {
+        'count': count,
+        'vote_weight': count.astype(np.float64),
+        'similarity_sum': count * float(similarity),
+        'weight_sum': count * (similarity / 100) ** 2,
+        'max_similarity': np.where(count > 0, float(similarity), 0.0),
+        'first_rank': first_rank,
+        'n_neighbors': count.sum(axis=1),
+        'top_k': int(count.sum()),
+    }
+
+
+def _argbest(key, stats):
+    """Per-row argmax of key over present categories, ties going to the earliest-ranked category"""
+    present = stats['count'] > 0
+    key = np.where(present, key, -np.inf)
+    best = key.max(axis=1, keepdims=True)
+    tied = present & (key >= best - TIE_TOLERANCE * np.abs(best))
+    tie_rank = np.where(tied, stats['first_rank'], stats['top_k'] + 1)
+    return tie_rank.argmin(axis=1)
+
+
+def _safe_divide(numerator, denominator):
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator, dtype=np.float64),
+                     where=denominator > 0)
+
+
+# ============================================
+# STRATEGIES
+# ============================================
+def frequency_strategy(stats):
+    """Frequency voting: the most common category wins, judged by its average similarity"""
+    rows = np.arange(stats['count'].shape[0])
+    avg_similarity = _safe_divide(stats['similarity_sum'], stats['count'])
+    winner = _argbest(stats['vote_weight'], stats)
+    return {
+        'winner': winner,
+        'decision_similarity': avg_similarity[rows, winner],
+        'count': stats['count'][rows, winner],
+        'method': "Frequency-Based Vector Search",
+    }
+
+
+def weighted_strategy(stats):
+    """Weighted voting: weight = similarity^2, ranked by a 70/30 weighted/max confidence blend
+
+    The average is over vote_weight (the neighbor count unless neighbors
+    carry weights such as recency decay), so it stays a similarity.
+    """
+    rows = np.arange(stats['count'].shape[0])
+    weighted_avg = _safe_divide(stats['weight_sum'], stats['vote_weight']) * 100
+    confidence = weighted_avg * WEIGHTED_BLEND + stats['max_similarity'] * (1 - WEIGHTED_BLEND)
+    winner = _argbest(confidence, stats)
+    return {
+        'winner': winner,
+        'decision_similarity': weighted_avg[rows, winner],
+        'confidence': confidence[rows, winner],
+        'count': stats['count'][rows, winner],
+        'method': "Weighted Similarity Voting",
+    }
+
+
+VOTING_STRATEGIES = {
+    'frequency': frequency_strategy,
+    'weighted': weighted_strategy,
+}
+
+
+def register_strategy(name, strategy):
+    """Register a voting strategy: a function of neighbor_stats() output"""
+    VOTING_STRATEGIES[name] = strategy
+
+
+def get_strategy(name):
+    """Look up a voting strategy by name"""
+    if name not in VOTING_STRATEGIES:
+        raise ValueError(f"Unknown voting method '{name}' (choose from {', '.join(VOTING_STRATEGIES)})")
+    return VOTING_STRATEGIES[name]
+
+
+def vote(scores, neighbor_codes, n_categories, strategies=('weighted',), neighbor_weights=None):
+    """Vote a whole (n_queries, top_k) search block with one or more strategies
+
+    The neighbor statistics are computed once and shared, so evaluating
+    several strategies costs a single pass over the block. Returns
+    (stats, {strategy_name: result}), where each result holds per-query
+    arrays: 'winner' (category code), 'decision_similarity' (percent) and
+    strategy-specific extras. neighbor_weights is as in neighbor_stats.
+    """
+    if isinstance(strategies, str):
+        strategies = (strategies,)
+    functions = {name: get_strategy(name) for name in strategies}
+    stats = neighbor_stats(scores, neighbor_codes, n_categories, neighbor_weights)
+    return stats, {name: fn(stats) for name, fn in functions.items()}
+
+
+# ============================================
+# PER-QUERY BREAKDOWN
+# ============================================
+def category_breakdown(stats, row, category_labels, neighbor_codes=None, scores=None):
+    """Per-category statistics for one query, in first-appearance order
+
+    Used for reporting; pass the query's neighbor_codes and scores to also
+    get the list of individual similarities per category.
+    """
+    count = stats['count'][row]
+    present = np.nonzero(count)[0]
+    present = present[np.argsort(stats['first_rank'][row][present], kind='stable')]
+
+    breakdown = {}
+    for code in present:
+        n = int(count[code])
+        weighted_avg = stats['weight_sum'][row][code] / stats['vote_weight'][row][code] * 100
+        max_similarity = stats['max_similarity'][row][code]
+        entry = {
+            'total_weight': float(stats['weight_sum'][row][code]),
+            'count': n,
+            'max_similarity': float(max_similarity),
+            'weighted_avg_similarity': float(weighted_avg),
+            'simple_avg_similarity': float(stats['similarity_sum'][row][code] / n),
+            'confidence': float(weighted_avg * WEIGHTED_BLEND + max_similarity * (1 - WEIGHTED_BLEND)),
+        }
+        if neighbor_codes is not None and scores is not None:
+            entry['similarities'] = [float(s) * 100 for s in np.asarray(scores)[np.asarray(neighbor_codes) == code]]
+        breakdown[category_labels[code]] = entry
+    return breakdown